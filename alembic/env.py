@@ -51,6 +51,8 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
+            # SQLite cannot ALTER constraints in place; batch mode copies the table.
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,94 @@
+"""usage rollups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:40:37
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+usage_events = sa.table(
+    "usage_events",
+    sa.column("company_id", sa.String),
+    sa.column("agent_id", sa.String),
+    sa.column("event_type", sa.String),
+    sa.column("unit", sa.String),
+    sa.column("quantity", sa.Float),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def _bucket(dialect: str, granularity: str):
+    """``created_at`` truncated to the hour or day, rendered like a stored DateTime."""
+    created_at = usage_events.c.created_at
+    hour = "%H" if granularity == "hour" else "00"
+    if dialect == "sqlite":
+        # SQLAlchemy stores SQLite datetimes with microseconds; match it so range filters compare equal.
+        return sa.func.strftime(f"%Y-%m-%d {hour}:00:00.000000", created_at)
+    if dialect == "mysql":
+        return sa.func.date_format(created_at, f"%Y-%m-%d {hour}:00:00")
+    return sa.func.date_trunc(granularity, created_at)
+
+
+def _backfill(table_name: str, granularity: str) -> None:
+    """Aggregate existing usage events into a rollup table with one INSERT ... SELECT."""
+    bind = op.get_bind()
+    bucket = _bucket(bind.dialect.name, granularity).label("bucket_start")
+    group = (usage_events.c.company_id, usage_events.c.agent_id, usage_events.c.event_type, usage_events.c.unit)
+    source = (
+        sa.select(*group, bucket, sa.func.sum(usage_events.c.quantity), sa.func.count())
+        .where(usage_events.c.created_at.isnot(None))
+        .group_by(*group, bucket)
+    )
+    rollups = sa.table(
+        table_name,
+        *(sa.column(name) for name in ("company_id", "agent_id", "event_type", "unit", "bucket_start")),
+        sa.column("quantity"),
+        sa.column("event_count"),
+    )
+    bind.execute(
+        rollups.insert().from_select(
+            ["company_id", "agent_id", "event_type", "unit", "bucket_start", "quantity", "event_count"], source
+        )
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usage_rollups_daily",
+        sa.Column("company_id", sa.String(length=36), nullable=False),
+        sa.Column("agent_id", sa.String(length=36), nullable=False),
+        sa.Column("event_type", sa.String(length=50), nullable=False),
+        sa.Column("unit", sa.String(length=20), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("company_id", "agent_id", "event_type", "unit", "bucket_start"),
+    )
+    op.create_table(
+        "usage_rollups_hourly",
+        sa.Column("company_id", sa.String(length=36), nullable=False),
+        sa.Column("agent_id", sa.String(length=36), nullable=False),
+        sa.Column("event_type", sa.String(length=50), nullable=False),
+        sa.Column("unit", sa.String(length=20), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("company_id", "agent_id", "event_type", "unit", "bucket_start"),
+    )
+    # Usage recorded before this revision only exists as raw events; summaries now read rollups.
+    _backfill("usage_rollups_hourly", "hour")
+    _backfill("usage_rollups_daily", "day")
+
+
+def downgrade() -> None:
+    op.drop_table("usage_rollups_hourly")
+    op.drop_table("usage_rollups_daily")
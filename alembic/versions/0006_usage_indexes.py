@@ -0,0 +1,30 @@
+"""usage indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 10:40:39
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_usage_events_company_agent_created", "usage_events", ["company_id", "agent_id", "created_at"])
+    op.create_index("ix_usage_events_company_created", "usage_events", ["company_id", "created_at"])
+    op.create_index("ix_usage_rollups_daily_company_bucket", "usage_rollups_daily", ["company_id", "bucket_start"])
+    op.create_index("ix_usage_rollups_hourly_company_bucket", "usage_rollups_hourly", ["company_id", "bucket_start"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_usage_rollups_hourly_company_bucket", table_name="usage_rollups_hourly")
+    op.drop_index("ix_usage_rollups_daily_company_bucket", table_name="usage_rollups_daily")
+    op.drop_index("ix_usage_events_company_created", table_name="usage_events")
+    op.drop_index("ix_usage_events_company_agent_created", table_name="usage_events")
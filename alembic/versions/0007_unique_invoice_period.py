@@ -0,0 +1,71 @@
+"""unique invoice period
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 12:05:11
+"""
+from datetime import datetime
+from itertools import groupby
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+invoices = sa.table(
+    "invoices",
+    sa.column("id", sa.String),
+    sa.column("company_id", sa.String),
+    sa.column("period_start", sa.Date),
+    sa.column("period_end", sa.Date),
+    sa.column("status", sa.String),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def _keeper_rank(row):
+    # An issued invoice always wins over drafts; among drafts the latest one is current.
+    return row.status != "draft", row.created_at or datetime.min, row.id
+
+
+def _dedupe_invoices() -> None:
+    """Keep one invoice per (company, period) before the unique constraint is added.
+
+    Estimates used to write a fresh draft on every summary call, so older
+    databases hold many drafts per period. References from billing run items
+    are repointed to the kept invoice.
+    """
+    bind = op.get_bind()
+    key = (invoices.c.company_id, invoices.c.period_start, invoices.c.period_end)
+    rows = bind.execute(sa.select(invoices).order_by(*key)).all()
+    referencing = [
+        sa.table(name, sa.column("invoice_id", sa.String))
+        for name in ("billing_run_items",)
+        if sa.inspect(bind).has_table(name)
+    ]
+    for _, group in groupby(rows, key=lambda row: (row.company_id, row.period_start, row.period_end)):
+        group = sorted(group, key=_keeper_rank)
+        keeper, duplicates = group[-1], [row.id for row in group[:-1]]
+        if not duplicates:
+            continue
+        for table in referencing:
+            bind.execute(
+                table.update().where(table.c.invoice_id.in_(duplicates)).values(invoice_id=keeper.id)
+            )
+        bind.execute(invoices.delete().where(invoices.c.id.in_(duplicates)))
+
+
+def upgrade() -> None:
+    _dedupe_invoices()
+    with op.batch_alter_table("invoices") as batch_op:
+        batch_op.create_unique_constraint("uq_invoices_company_period", ["company_id", "period_start", "period_end"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("invoices") as batch_op:
+        batch_op.drop_constraint("uq_invoices_company_period", type_="unique")
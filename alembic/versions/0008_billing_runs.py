@@ -0,0 +1,45 @@
+"""billing runs
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 10:40:59
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "billing_run_items",
+        sa.Column("run_id", sa.String(length=36), nullable=False),
+        sa.Column("company_id", sa.String(length=36), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("invoice_id", sa.String(length=36), nullable=True),
+        sa.Column("duration_ms", sa.Float(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("run_id", "company_id"),
+    )
+    op.create_table(
+        "billing_runs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("period", sa.String(length=7), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("report_json", sa.JSON(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("billing_runs")
+    op.drop_table("billing_run_items")
@@ -0,0 +1,35 @@
+"""price books
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 10:41:01
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "price_books",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("plan_id", sa.String(length=50), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("currency", sa.String(length=10), nullable=False),
+        sa.Column("rates_json", sa.JSON(), nullable=False),
+        sa.Column("effective_from", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("plan_id", "version", name="uq_price_books_plan_version"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("price_books")
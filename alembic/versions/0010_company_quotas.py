@@ -0,0 +1,24 @@
+"""company quotas
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 10:41:02
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("companies", sa.Column("quota_json", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("companies", "quota_json")
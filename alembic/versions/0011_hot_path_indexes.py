@@ -0,0 +1,56 @@
+"""hot path indexes
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 10:41:04
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_agents_company_status", "agents", ["company_id", "status"])
+    op.create_index("ix_api_keys_company", "api_keys", ["company_id"])
+    op.create_index("ix_api_keys_key_hash", "api_keys", ["key_hash"])
+    op.create_index("ix_audit_logs_company_created", "audit_logs", ["company_id", "created_at"])
+    op.create_index("ix_billing_runs_period_started", "billing_runs", ["period", "started_at"])
+    op.create_index("ix_chat_sessions_company_agent", "chat_sessions", ["company_id", "agent_id"])
+    op.create_index("ix_idempotency_keys_expires", "idempotency_keys", ["expires_at"])
+    op.create_index("ix_jobs_company_status", "jobs", ["company_id", "status"])
+    op.create_index("ix_jobs_status_lease_expires", "jobs", ["status", "lease_expires_at"])
+    op.create_index("ix_jobs_status_run_after", "jobs", ["status", "run_after"])
+    op.create_index("ix_kb_chunks_doc", "kb_chunks", ["doc_id"])
+    op.create_index("ix_kb_documents_company_agent_status", "kb_documents", ["company_id", "agent_id", "status"])
+    op.create_index("ix_messages_company_session_created", "messages", ["company_id", "session_id", "created_at"])
+    op.create_index("ix_roles_company_name", "roles", ["company_id", "name"])
+    op.create_index("ix_tools_company_status", "tools", ["company_id", "status"])
+    op.create_index("ix_user_roles_company_role", "user_roles", ["company_id", "role_id"])
+    op.create_index("ix_users_company_email", "users", ["company_id", "email"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_company_email", table_name="users")
+    op.drop_index("ix_user_roles_company_role", table_name="user_roles")
+    op.drop_index("ix_tools_company_status", table_name="tools")
+    op.drop_index("ix_roles_company_name", table_name="roles")
+    op.drop_index("ix_messages_company_session_created", table_name="messages")
+    op.drop_index("ix_kb_documents_company_agent_status", table_name="kb_documents")
+    op.drop_index("ix_kb_chunks_doc", table_name="kb_chunks")
+    op.drop_index("ix_jobs_status_run_after", table_name="jobs")
+    op.drop_index("ix_jobs_status_lease_expires", table_name="jobs")
+    op.drop_index("ix_jobs_company_status", table_name="jobs")
+    op.drop_index("ix_idempotency_keys_expires", table_name="idempotency_keys")
+    op.drop_index("ix_chat_sessions_company_agent", table_name="chat_sessions")
+    op.drop_index("ix_billing_runs_period_started", table_name="billing_runs")
+    op.drop_index("ix_audit_logs_company_created", table_name="audit_logs")
+    op.drop_index("ix_api_keys_key_hash", table_name="api_keys")
+    op.drop_index("ix_api_keys_company", table_name="api_keys")
+    op.drop_index("ix_agents_company_status", table_name="agents")
@@ -0,0 +1,25 @@
+"""idempotency key leases
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 12:40:18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("idempotency_keys", sa.Column("locked_until", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("idempotency_keys") as batch_op:
+        batch_op.drop_column("locked_until")
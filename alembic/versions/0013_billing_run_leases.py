@@ -0,0 +1,27 @@
+"""billing run leases
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 13:32:07
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("billing_runs", sa.Column("lease_owner", sa.String(length=128), nullable=True))
+    op.add_column("billing_runs", sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("billing_runs") as batch_op:
+        batch_op.drop_column("lease_expires_at")
+        batch_op.drop_column("lease_owner")
@@ -0,0 +1,111 @@
+"""usage event partitioning
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 15:48:20
+"""
+from datetime import datetime
+from typing import List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0014"
+down_revision: Union[str, None] = "0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months partitioned past the current one; services.usage_partitions adds more at runtime.
+MONTHS_AHEAD = 2
+
+
+def _usage_events(partitioned: bool) -> sa.Table:
+    """``usage_events`` as it is after (``partitioned``) or before this revision."""
+    columns = [
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("company_id", sa.String(length=36), nullable=False),
+        sa.Column("agent_id", sa.String(length=36), nullable=False),
+        sa.Column("session_id", sa.String(length=36), nullable=True),
+        sa.Column("event_type", sa.String(length=50), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("unit", sa.String(length=20), nullable=False),
+        sa.Column("cost", sa.Float(), nullable=True),
+        sa.Column("metadata_json", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), primary_key=partitioned, nullable=not partitioned),
+    ]
+    constraints = [
+        sa.Index("ix_usage_events_company_created", "company_id", "created_at"),
+        sa.Index("ix_usage_events_company_agent_created", "company_id", "agent_id", "created_at"),
+    ]
+    if not partitioned:
+        constraints += [
+            sa.ForeignKeyConstraint(["company_id"], ["companies.id"]),
+            sa.ForeignKeyConstraint(["agent_id"], ["agents.id"]),
+        ]
+    return sa.Table("usage_events", sa.MetaData(), *columns, *constraints)
+
+
+def _next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def _partition_mysql(bind) -> None:
+    """One ``pYYYYMM`` partition per month from the oldest row to ``MONTHS_AHEAD`` ahead, plus ``pmax``."""
+    now = datetime.utcnow()
+    oldest = bind.execute(sa.text("SELECT MIN(created_at) FROM usage_events")).scalar() or now
+    month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    parts: List[str] = []
+    while month <= last:
+        bound = _next_month(month)
+        parts.append(f"PARTITION p{month.year}{month.month:02d} VALUES LESS THAN (TO_DAYS('{bound.date()}'))")
+        month = bound
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    op.execute(f"ALTER TABLE usage_events PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(parts)})")
+
+
+def upgrade() -> None:
+    """Make ``usage_events`` partitionable by month.
+
+    Partitioned InnoDB tables need the partition column in every unique key and
+    cannot have foreign keys, so ``created_at`` joins the primary key and the
+    foreign keys to ``companies`` and ``agents`` are dropped on every backend,
+    keeping one schema. MySQL then gets its monthly partitions; this rebuilds
+    the table, so run it in a maintenance window on large databases.
+    """
+    bind = op.get_bind()
+    op.execute("UPDATE usage_events SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    if bind.dialect.name == "sqlite":
+        # The baseline constraints are unnamed; rebuild the table from its new definition.
+        with op.batch_alter_table("usage_events", recreate="always", copy_from=_usage_events(True)):
+            pass
+        return
+    inspector = sa.inspect(bind)
+    for foreign_key in inspector.get_foreign_keys("usage_events"):
+        op.drop_constraint(foreign_key["name"], "usage_events", type_="foreignkey")
+    op.alter_column("usage_events", "created_at", existing_type=sa.DateTime(), nullable=False)
+    primary_key = inspector.get_pk_constraint("usage_events")["name"] or "PRIMARY"
+    op.drop_constraint(primary_key, "usage_events", type_="primary")
+    op.create_primary_key("pk_usage_events", "usage_events", ["id", "created_at"])
+    if bind.dialect.name == "mysql":
+        _partition_mysql(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        with op.batch_alter_table("usage_events", recreate="always", copy_from=_usage_events(False)):
+            pass
+        return
+    if bind.dialect.name == "mysql":
+        op.execute("ALTER TABLE usage_events REMOVE PARTITIONING")
+    op.drop_constraint("pk_usage_events", "usage_events", type_="primary")
+    op.create_primary_key("pk_usage_events", "usage_events", ["id"])
+    op.alter_column("usage_events", "created_at", existing_type=sa.DateTime(), nullable=True)
+    op.create_foreign_key(None, "usage_events", "companies", ["company_id"], ["id"])
+    op.create_foreign_key(None, "usage_events", "agents", ["agent_id"], ["id"])
@@ -0,0 +1,82 @@
+"""In-process throughput of the HTTP middleware stack.
+
+Drives the app through ``httpx.ASGITransport`` with sequential requests, so the
+numbers measure request context, authentication and routing rather than the
+network or a server's worker model. Run from the repository root:
+
+    PYTHONPATH=src python scripts/bench_middleware.py --requests 3000 --rounds 3
+
+Without ``SATURN_DB_URL`` a throwaway SQLite file is used. Compare the best
+round before and after a change on the same machine; absolute numbers vary.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+
+async def _measure(client, path: str, headers: Dict[str, str], requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        if response.status_code != 200:
+            raise SystemExit(f"GET {path} returned {response.status_code}: {response.text}")
+    return requests / (time.perf_counter() - start)
+
+
+async def _run(requests: int, rounds: int, warmup: int) -> Dict[str, float]:
+    import httpx
+    import jwt
+
+    from app.main import app
+    from common.config import get_settings
+    from db.session import dispose_async_engine, init_db
+
+    init_db()
+    settings = get_settings()
+    token = jwt.encode(
+        {"company_id": "bench-company", "user_id": "bench-user", "role": "admin"},
+        settings.jwt_secret,
+        algorithm=settings.jwt_algorithm,
+    )
+    cases = [("/health", {}), ("/auth/me", {"Authorization": f"Bearer {token}"})]
+    results: Dict[str, float] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path, headers in cases:
+            await _measure(client, path, headers, warmup)
+            rates = [await _measure(client, path, headers, requests) for _ in range(rounds)]
+            results[path] = max(rates)
+    await dispose_async_engine()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the middleware stack in-process")
+    parser.add_argument("--requests", type=int, default=3000, help="requests per round and path")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per path; the best one is reported")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests before the rounds")
+    args = parser.parse_args(argv)
+
+    directory = None
+    if not os.getenv("SATURN_DB_URL"):
+        directory = tempfile.mkdtemp(prefix="saturn-bench-")
+        os.environ["SATURN_DB_URL"] = f"sqlite+pysqlite:///{os.path.join(directory, 'bench.db')}"
+    # Per-request log lines would dominate the timings.
+    logging.disable(logging.INFO)
+    try:
+        results = asyncio.run(_run(args.requests, args.rounds, args.warmup))
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+    for path, rate in results.items():
+        print(f"GET {path:<10} {rate:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
-import time
-import uuid
+import asyncio
+import signal
+import threading
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 
+from app.middleware import AuthMiddleware, RequestContextMiddleware
+from common.config import get_settings, reload_settings
 from common.errors import ERRORS, SaturnError, error_response
-from common.logging import configure_logging, get_logger, set_request_context, clear_request_context
-from common.metrics import record_request
-from db.session import init_db
-from routers import agents, auth, billing, health, kb, metrics, tools
-from services.auth_service import authenticate
+from common.logging import configure_logging, get_logger
+from db.session import dispose_async_engine, init_db
+from routers import agents, auth, billing, exports, health, jobs, kb, metrics, tools
+from services.auth_service import start_last_used_flusher, stop_last_used_flusher
+from services.builtin_tools import close_builtin_pool
+from services.http_tool_runtime import close_http_client
+from services.idempotency_service import start_key_purger, stop_key_purger
+from services.job_worker import start_worker, stop_worker
+from services.spend_counters import seed_counters, start_reconciler, stop_reconciler
+from services.usage_service import flush_usage_buffer, start_usage_buffer, stop_usage_buffer
 
 
 configure_logging()
@@ -20,35 +28,61 @@ app.include_router(health.router)
 app.include_router(auth.router)
 app.include_router(agents.router)
 app.include_router(tools.router)
+app.include_router(jobs.router)
 app.include_router(kb.router)
 app.include_router(billing.router)
+app.include_router(exports.router)
 app.include_router(metrics.router)
+# Added last runs first: the request context wraps authentication.
+app.add_middleware(AuthMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
+
+def _install_reload_signal() -> None:
+    """Reload settings on SIGHUP where the platform and thread allow it.
+
+    Signal handlers can only be set from the main thread, which is not where
+    the app starts under some servers and test clients; there reloading stays
+    available through ``reload_settings``.
+    """
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_settings)
+        return
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+    if threading.current_thread() is not threading.main_thread():
+        logger.warning("sighup_reload_unavailable")
+        return
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload_settings())
 
 
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    settings = get_settings()
+    _install_reload_signal()
+    if settings.usage_buffer_enabled:
+        start_usage_buffer()
+    seed_counters()
+    start_last_used_flusher()
+    start_key_purger()
+    start_reconciler(before=flush_usage_buffer)
+    if settings.job_worker_enabled:
+        start_worker()
 
 
-@app.middleware("http")
-async def request_context_middleware(request: Request, call_next):
-    request_id = request.headers.get("X-Request-Id") or str(uuid.uuid4())
-    request.state.request_id = request_id
-    set_request_context(request_id=request_id)
-    auth = authenticate(request.headers.get("Authorization"))
-    request.state.auth = auth
-    if auth:
-        set_request_context(request_id=request_id, company_id=auth.company_id)
-    logger.info("request_start %s %s", request.method, request.url.path)
-    start = time.perf_counter()
-    try:
-        response = await call_next(request)
-    finally:
-        elapsed_ms = (time.perf_counter() - start) * 1000
-        record_request(elapsed_ms)
-        clear_request_context()
-    response.headers["X-Request-Id"] = request_id
-    return response
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_worker()
+    stop_reconciler()
+    stop_last_used_flusher()
+    stop_key_purger()
+    stop_usage_buffer()
+    close_http_client()
+    close_builtin_pool()
+    await dispose_async_engine()
 
 
 @app.exception_handler(SaturnError)
@@ -0,0 +1,110 @@
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, MutableMapping, Optional
+
+from common.errors import SaturnError, error_response
+from common.logging import clear_request_context, get_logger, set_request_context
+from common.metrics import record_request
+from services.auth_service import authenticate_async
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+logger = get_logger("app.middleware")
+
+PUBLIC_PATHS = frozenset({"/health", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json"})
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _state(scope: Scope) -> Dict[str, Any]:
+    return scope.setdefault("state", {})
+
+
+class RequestContextMiddleware:
+    """Assign the request id, bind the logging context and time the request.
+
+    Plain ASGI: no extra task per request and the response body is passed
+    through untouched, so streaming responses stream.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = _header(scope, b"x-request-id") or str(uuid.uuid4())
+        _state(scope)["request_id"] = request_id
+        set_request_context(request_id=request_id)
+        raw_request_id = request_id.encode("latin-1")
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", raw_request_id)]
+            await send(message)
+
+        logger.info("request_start %s %s", scope["method"], scope["path"])
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            record_request((time.perf_counter() - start) * 1000)
+            clear_request_context()
+
+
+class AuthMiddleware:
+    """Resolve the bearer token into ``request.state.auth``, except on ``public_paths``.
+
+    Invalid credentials are answered here with the standard error envelope;
+    routes still decide whether a missing token is acceptable.
+    """
+
+    def __init__(self, app: ASGIApp, public_paths: Iterable[str] = PUBLIC_PATHS):
+        self.app = app
+        self.public_paths: FrozenSet[str] = frozenset(public_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = _state(scope)
+        if scope["path"] in self.public_paths:
+            state["auth"] = None
+            await self.app(scope, receive, send)
+            return
+        try:
+            auth = await authenticate_async(_header(scope, b"authorization"))
+        except SaturnError as exc:
+            await _send_error(send, exc, state.get("request_id"))
+            return
+        state["auth"] = auth
+        if auth:
+            set_request_context(request_id=state.get("request_id"), company_id=auth.company_id)
+        await self.app(scope, receive, send)
+
+
+async def _send_error(send: Send, exc: SaturnError, request_id: Optional[str]) -> None:
+    payload = error_response(exc.code, exc.message, exc.details)
+    payload["meta"] = {"request_id": request_id}
+    body = json.dumps(payload).encode("utf-8")
+    logger.error("saturn_error %s", exc.code)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": exc.definition.http_status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
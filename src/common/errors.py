@@ -28,7 +28,11 @@ ERRORS: Dict[str, ErrorDefinition] = {
     "LLM_PROVIDER_ERROR": ErrorDefinition(
         "LLM_PROVIDER_ERROR", "LLM provider error", status.HTTP_502_BAD_GATEWAY
     ),
+    "IDEMPOTENCY_CONFLICT": ErrorDefinition(
+        "IDEMPOTENCY_CONFLICT", "Idempotency key conflict", status.HTTP_409_CONFLICT
+    ),
     "RATE_LIMITED": ErrorDefinition("RATE_LIMITED", "Rate limited", status.HTTP_429_TOO_MANY_REQUESTS),
+    "QUOTA_EXCEEDED": ErrorDefinition("QUOTA_EXCEEDED", "Usage quota exceeded", status.HTTP_402_PAYMENT_REQUIRED),
     "BAD_REQUEST": ErrorDefinition("BAD_REQUEST", "Bad request", status.HTTP_400_BAD_REQUEST),
     "NOT_FOUND": ErrorDefinition("NOT_FOUND", "Resource not found", status.HTTP_404_NOT_FOUND),
     "INTERNAL_ERROR": ErrorDefinition("INTERNAL_ERROR", "Internal server error", status.HTTP_500_INTERNAL_SERVER_ERROR),
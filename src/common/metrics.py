@@ -1,7 +1,10 @@
 import time
 from dataclasses import dataclass
 from threading import Lock
-from typing import Dict
+from typing import Dict, List
+
+
+TOOL_LATENCY_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
 
 
 @dataclass
@@ -11,6 +14,19 @@ class MetricsSnapshot:
     llm_calls: int
     tool_calls: int
     tool_failures: int
+    tool_cache_hits: int
+    tool_cache_misses: int
+    builtin_pool_workers: int
+    builtin_pool_busy: int
+    builtin_pool_queued: int
+    usage_buffer_depth: int
+    usage_flushes: int
+    usage_flush_latency_total_ms: float
+    usage_events_flushed: int
+    usage_events_spilled: int
+    usage_events_dropped: int
+    jwt_cache_hits: int
+    jwt_cache_misses: int
 
 
 _lock = Lock()
@@ -19,6 +35,20 @@ _latency_total_ms = 0.0
 _llm_calls = 0
 _tool_calls = 0
 _tool_failures = 0
+_tool_cache_hits = 0
+_tool_cache_misses = 0
+_builtin_pool_workers = 0
+_builtin_pool_busy = 0
+_builtin_pool_queued = 0
+_tool_latency: Dict[str, List[float]] = {}
+_usage_buffer_depth = 0
+_usage_flushes = 0
+_usage_flush_latency_total_ms = 0.0
+_usage_events_flushed = 0
+_usage_events_spilled = 0
+_usage_events_dropped = 0
+_jwt_cache_hits = 0
+_jwt_cache_misses = 0
 
 
 def record_request(latency_ms: float) -> None:
@@ -42,6 +72,100 @@ def record_tool_call(success: bool) -> None:
             _tool_failures += 1
 
 
+def record_tool_cache(hit: bool) -> None:
+    global _tool_cache_hits, _tool_cache_misses
+    with _lock:
+        if hit:
+            _tool_cache_hits += 1
+        else:
+            _tool_cache_misses += 1
+
+
+def record_jwt_cache(hit: bool) -> None:
+    global _jwt_cache_hits, _jwt_cache_misses
+    with _lock:
+        if hit:
+            _jwt_cache_hits += 1
+        else:
+            _jwt_cache_misses += 1
+
+
+def set_builtin_pool_state(workers: int, busy: int, queued: int) -> None:
+    global _builtin_pool_workers, _builtin_pool_busy, _builtin_pool_queued
+    with _lock:
+        _builtin_pool_workers = workers
+        _builtin_pool_busy = busy
+        _builtin_pool_queued = queued
+
+
+def set_usage_buffer_depth(depth: int) -> None:
+    global _usage_buffer_depth
+    with _lock:
+        _usage_buffer_depth = depth
+
+
+def record_usage_flush(latency_ms: float, events: int) -> None:
+    global _usage_flushes, _usage_flush_latency_total_ms, _usage_events_flushed
+    with _lock:
+        _usage_flushes += 1
+        _usage_flush_latency_total_ms += latency_ms
+        _usage_events_flushed += events
+
+
+def record_usage_spilled(events: int) -> None:
+    global _usage_events_spilled
+    with _lock:
+        _usage_events_spilled += events
+
+
+def record_usage_dropped(events: int) -> None:
+    global _usage_events_dropped
+    with _lock:
+        _usage_events_dropped += events
+
+
+def record_tool_latency(tool_id: str, latency_ms: float) -> None:
+    """Add one call to the tool's histogram (per-bucket counts, then total count and sum)."""
+    with _lock:
+        histogram = _tool_latency.get(tool_id)
+        if histogram is None:
+            histogram = [0] * (len(TOOL_LATENCY_BUCKETS_MS) + 3)
+            _tool_latency[tool_id] = histogram
+        for index, bound in enumerate(TOOL_LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(TOOL_LATENCY_BUCKETS_MS)] += 1
+        histogram[-2] += 1
+        histogram[-1] += latency_ms
+
+
+def _histogram_dict(values: List[float]) -> Dict[str, object]:
+    labels = [f"le_{bound}" for bound in TOOL_LATENCY_BUCKETS_MS] + ["le_inf"]
+    return {
+        "buckets": dict(zip(labels, values[: len(labels)])),
+        "count": values[-2],
+        "sum_ms": round(values[-1], 2),
+    }
+
+
+def tool_latency_histograms() -> Dict[str, Dict[str, object]]:
+    """Per-tool histograms; tool ids belong to tenants, so only platform admins see these."""
+    with _lock:
+        histograms = {tool_id: list(values) for tool_id, values in _tool_latency.items()}
+    return {tool_id: _histogram_dict(values) for tool_id, values in histograms.items()}
+
+
+def tool_latency_totals() -> Dict[str, object]:
+    """One histogram over every tool call, safe to expose without authentication."""
+    totals = [0] * (len(TOOL_LATENCY_BUCKETS_MS) + 3)
+    with _lock:
+        for values in _tool_latency.values():
+            totals = [total + value for total, value in zip(totals, values)]
+    return _histogram_dict(totals)
+
+
 def snapshot() -> MetricsSnapshot:
     with _lock:
         avg_latency = (_latency_total_ms / _request_count) if _request_count else 0.0
@@ -51,25 +175,78 @@ def snapshot() -> MetricsSnapshot:
             llm_calls=_llm_calls,
             tool_calls=_tool_calls,
             tool_failures=_tool_failures,
+            tool_cache_hits=_tool_cache_hits,
+            tool_cache_misses=_tool_cache_misses,
+            builtin_pool_workers=_builtin_pool_workers,
+            builtin_pool_busy=_builtin_pool_busy,
+            builtin_pool_queued=_builtin_pool_queued,
+            usage_buffer_depth=_usage_buffer_depth,
+            usage_flushes=_usage_flushes,
+            usage_flush_latency_total_ms=_usage_flush_latency_total_ms,
+            usage_events_flushed=_usage_events_flushed,
+            usage_events_spilled=_usage_events_spilled,
+            usage_events_dropped=_usage_events_dropped,
+            jwt_cache_hits=_jwt_cache_hits,
+            jwt_cache_misses=_jwt_cache_misses,
         )
 
 
 def as_dict() -> Dict[str, float]:
     snap = snapshot()
+    cache_lookups = snap.tool_cache_hits + snap.tool_cache_misses
+    jwt_lookups = snap.jwt_cache_hits + snap.jwt_cache_misses
     return {
         "request_count": snap.request_count,
         "avg_latency_ms": snap.avg_latency_ms,
         "llm_calls": snap.llm_calls,
         "tool_calls": snap.tool_calls,
         "tool_failures": snap.tool_failures,
+        "tool_cache_hits": snap.tool_cache_hits,
+        "tool_cache_misses": snap.tool_cache_misses,
+        "tool_cache_hit_rate": round(snap.tool_cache_hits / cache_lookups, 4) if cache_lookups else 0.0,
+        "builtin_pool_workers": snap.builtin_pool_workers,
+        "builtin_pool_utilization": (
+            round(snap.builtin_pool_busy / snap.builtin_pool_workers, 4) if snap.builtin_pool_workers else 0.0
+        ),
+        "builtin_pool_queue_depth": snap.builtin_pool_queued,
+        "usage_buffer_depth": snap.usage_buffer_depth,
+        "usage_flushes": snap.usage_flushes,
+        "usage_flush_avg_latency_ms": (
+            round(snap.usage_flush_latency_total_ms / snap.usage_flushes, 2) if snap.usage_flushes else 0.0
+        ),
+        "usage_events_flushed": snap.usage_events_flushed,
+        "usage_events_spilled": snap.usage_events_spilled,
+        "usage_events_dropped": snap.usage_events_dropped,
+        "jwt_cache_hits": snap.jwt_cache_hits,
+        "jwt_cache_misses": snap.jwt_cache_misses,
+        "jwt_cache_hit_rate": round(snap.jwt_cache_hits / jwt_lookups, 4) if jwt_lookups else 0.0,
     }
 
 
 def reset_metrics() -> None:
     global _request_count, _latency_total_ms, _llm_calls, _tool_calls, _tool_failures
+    global _tool_cache_hits, _tool_cache_misses, _usage_buffer_depth
+    global _usage_flushes, _usage_flush_latency_total_ms, _usage_events_flushed
+    global _usage_events_spilled, _usage_events_dropped
+    global _jwt_cache_hits, _jwt_cache_misses
+    global _builtin_pool_workers, _builtin_pool_busy, _builtin_pool_queued
     with _lock:
         _request_count = 0
         _latency_total_ms = 0.0
         _llm_calls = 0
         _tool_calls = 0
         _tool_failures = 0
+        _tool_cache_hits = 0
+        _tool_cache_misses = 0
+        _tool_latency.clear()
+        _usage_buffer_depth = 0
+        _usage_flushes = 0
+        _usage_flush_latency_total_ms = 0.0
+        _usage_events_flushed = 0
+        _usage_events_spilled = 0
+        _usage_events_dropped = 0
+        _jwt_cache_hits = 0
+        _jwt_cache_misses = 0
+        _builtin_pool_workers = 0
+        _builtin_pool_busy = 0
+        _builtin_pool_queued = 0
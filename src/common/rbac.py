@@ -1,17 +1,199 @@
-from typing import Iterable
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 
 from common.auth import AuthContext
-from common.config import get_settings
+from common.config import Settings, get_settings, on_settings_reload
 from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import async_engine_available, async_session_scope, session_scope
+from models.core import Role as RoleModel
+
+logger = get_logger("common.rbac")
+
+
+@dataclass(frozen=True)
+class PermissionSet:
+    """A role's permissions compiled for O(1) checks.
+
+    ``resource:action`` patterns are split into exact grants, ``resource:*``
+    grants and ``*:action`` grants; ``*`` grants everything.
+    """
+
+    grants_all: bool
+    exact: FrozenSet[str]
+    resources: FrozenSet[str]
+    actions: FrozenSet[str]
+
+    def allows(self, permission: str) -> bool:
+        if self.grants_all or permission in self.exact:
+            return True
+        resource, _, action = permission.partition(":")
+        return resource in self.resources or action in self.actions
+
+
+EMPTY = PermissionSet(False, frozenset(), frozenset(), frozenset())
+
+
+def compile_permissions(patterns: Iterable[str]) -> PermissionSet:
+    grants_all = False
+    exact, resources, actions = set(), set(), set()
+    for pattern in patterns:
+        if not isinstance(pattern, str):
+            raise SaturnError("BAD_REQUEST", "Permissions must be strings")
+        if pattern == "*":
+            grants_all = True
+            continue
+        resource, separator, action = pattern.partition(":")
+        if not separator or not resource or not action or (resource == "*" and action == "*"):
+            raise SaturnError("BAD_REQUEST", f"Invalid permission pattern: {pattern}")
+        if action == "*":
+            resources.add(resource)
+        elif resource == "*":
+            actions.add(action)
+        else:
+            exact.add(pattern)
+    return PermissionSet(grants_all, frozenset(exact), frozenset(resources), frozenset(actions))
+
+
+def role_patterns(permissions) -> Iterable[str]:
+    """Patterns from a ``roles.permissions`` value: a list, or a ``{pattern: bool}`` map."""
+    if isinstance(permissions, dict):
+        return [pattern for pattern, granted in permissions.items() if granted]
+    return permissions or []
+
+
+_lock = Lock()
+_defaults: Optional[Dict[str, PermissionSet]] = None
+_company_roles: Dict[str, Tuple[int, float, Dict[str, PermissionSet]]] = {}
+_versions: Dict[str, int] = {}
+
+
+def _default_roles(settings: Settings) -> Dict[str, PermissionSet]:
+    global _defaults
+    if _defaults is None:
+        _defaults = {role: compile_permissions(perms) for role, perms in settings.role_permissions.items()}
+    return _defaults
+
+
+def _load_company_roles(company_id: str) -> Dict[str, PermissionSet]:
+    with session_scope() as session:
+        rows = (
+            session.query(RoleModel.name, RoleModel.permissions).filter(RoleModel.company_id == company_id).all()
+        )
+    return {row.name: _compile_stored(company_id, row.name, row.permissions) for row in rows}
+
+
+async def _load_company_roles_async(company_id: str) -> Dict[str, PermissionSet]:
+    if not async_engine_available():
+        return await run_in_threadpool(_load_company_roles, company_id)
+    async with async_session_scope() as session:
+        rows = (
+            await session.execute(
+                select(RoleModel.name, RoleModel.permissions).where(RoleModel.company_id == company_id)
+            )
+        ).all()
+    return {row.name: _compile_stored(company_id, row.name, row.permissions) for row in rows}
+
+
+def _compile_stored(company_id: str, role: str, permissions) -> PermissionSet:
+    """Compile a stored role, skipping patterns that no longer validate.
+
+    Patterns are checked when a role is written; one that slipped in some other
+    way must not lock the whole company out on every request, so it is logged
+    and ignored here instead.
+    """
+    valid = []
+    for pattern in role_patterns(permissions):
+        try:
+            compile_permissions([pattern])
+        except SaturnError:
+            logger.warning("rbac_invalid_pattern %s %s %r", company_id, role, pattern)
+            continue
+        valid.append(pattern)
+    return compile_permissions(valid)
+
+
+def _cached_roles(
+    company_id: str, settings: Settings, now: float
+) -> Tuple[int, Optional[Dict[str, PermissionSet]], Dict[str, PermissionSet]]:
+    """``(version, company roles or None if they must be loaded, built-in roles)``."""
+    with _lock:
+        version = _versions.get(company_id, 0)
+        cached = _company_roles.get(company_id)
+        defaults = _default_roles(settings)
+    if cached is None or cached[0] != version or now - cached[1] > settings.rbac_cache_ttl_seconds:
+        return version, None, defaults
+    return version, cached[2], defaults
+
+
+def _store_roles(company_id: str, version: int, now: float, roles: Dict[str, PermissionSet]) -> None:
+    with _lock:
+        if _versions.get(company_id, 0) == version:
+            _company_roles[company_id] = (version, now, roles)
+
+
+def permission_set(company_id: str, role: str) -> PermissionSet:
+    """The compiled permissions of ``role`` in ``company_id``.
+
+    Company roles stored in ``roles`` override the built-in ones of the same
+    name. They are loaded with one query per company and kept until
+    ``invalidate_roles`` bumps the company's version, or for at most
+    ``rbac_cache_ttl_seconds`` so other workers pick up role changes too.
+    """
+    now = time.monotonic()
+    version, roles, defaults = _cached_roles(company_id, get_settings(), now)
+    if roles is None:
+        roles = _load_company_roles(company_id)
+        _store_roles(company_id, version, now, roles)
+    return roles.get(role) or defaults.get(role, EMPTY)
+
+
+async def permission_set_async(company_id: str, role: str) -> PermissionSet:
+    """``permission_set`` for coroutines: a cache miss awaits the async engine."""
+    now = time.monotonic()
+    version, roles, defaults = _cached_roles(company_id, get_settings(), now)
+    if roles is None:
+        roles = await _load_company_roles_async(company_id)
+        _store_roles(company_id, version, now, roles)
+    return roles.get(role) or defaults.get(role, EMPTY)
+
+
+def invalidate_roles(company_id: str) -> None:
+    """Drop the company's compiled roles; called whenever one of its roles changes."""
+    with _lock:
+        _versions[company_id] = _versions.get(company_id, 0) + 1
+        _company_roles.pop(company_id, None)
+
+
+def reset_rbac_cache() -> None:
+    global _defaults
+    with _lock:
+        _defaults = None
+        _company_roles.clear()
+
+
+on_settings_reload(lambda settings: reset_rbac_cache())
 
 
 def require_permission(auth: AuthContext, permission: str) -> None:
-    settings = get_settings()
-    role = auth.role or "viewer"
-    allowed = settings.role_permissions.get(role, [])
-    if "*" in allowed:
-        return
-    if permission not in allowed:
+    if not permission_set(auth.company_id, auth.role or "viewer").allows(permission):
+        raise SaturnError("AUTH_FORBIDDEN")
+
+
+async def require_permission_async(auth: AuthContext, permission: str) -> None:
+    if not (await permission_set_async(auth.company_id, auth.role or "viewer")).allows(permission):
+        raise SaturnError("AUTH_FORBIDDEN")
+
+
+def require_platform_admin(auth: AuthContext) -> None:
+    """Cross-tenant operations are reserved for admins of the configured platform company."""
+    platform_company_id = get_settings().platform_company_id
+    if not platform_company_id or auth.company_id != platform_company_id or auth.role != "admin":
         raise SaturnError("AUTH_FORBIDDEN")
 
 
@@ -1,31 +1,87 @@
-from contextlib import contextmanager
-from typing import Generator
+import asyncio
+import functools
+import inspect
+import time
+from contextlib import asynccontextmanager, contextmanager
+from threading import Lock
+from typing import AsyncGenerator, Callable, Generator, Optional, TypeVar
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from common.config import get_database_url
+from common.config import Settings, get_async_database_url, get_database_url, get_settings
+from common.logging import get_logger
 from models.base import Base
 
+logger = get_logger("db.session")
+
+F = TypeVar("F", bound=Callable)
+
 
 def _database_url() -> str:
     return get_database_url()
 
 
+def _is_memory_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in url
+
+
+def _apply_sqlite_pragmas(target: Engine, settings: Settings) -> None:
+    """Tune every new SQLite connection of ``target`` for concurrent use.
+
+    WAL lets readers proceed while a writer commits; ``synchronous=NORMAL`` is
+    durable under WAL except for the last commits on power loss; the busy
+    timeout makes writers queue instead of failing at once.
+    """
+    pragmas = (
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA cache_size={-settings.sqlite_cache_size_mb * 1024}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}",
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
 def _create_engine():
     url = _database_url()
+    settings = get_settings()
     if url.startswith("sqlite"):
-        return create_engine(
+        if _is_memory_sqlite(url):
+            # One shared connection, or every checkout would see its own empty database.
+            return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        sqlite_engine = create_engine(
             url,
-            connect_args={"check_same_thread": False},
-            poolclass=StaticPool,
+            connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000},
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
         )
-    return create_engine(url, pool_pre_ping=True, pool_recycle=3600)
+        _apply_sqlite_pragmas(sqlite_engine, settings)
+        return sqlite_engine
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+    )
 
 
 engine = _create_engine()
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 
 
 def init_db() -> None:
@@ -43,3 +99,134 @@ def session_scope() -> Generator:
         raise
     finally:
         session.close()
+
+
+def _create_async_engine() -> AsyncEngine:
+    url = get_async_database_url()
+    settings = get_settings()
+    if url.startswith("sqlite"):
+        if _is_memory_sqlite(url):
+            raise RuntimeError("An in-memory SQLite database cannot be shared with the async engine; use a file")
+        async_engine = create_async_engine(
+            url,
+            connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000},
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+        )
+        _apply_sqlite_pragmas(async_engine.sync_engine, settings)
+        return async_engine
+    return create_async_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+    )
+
+
+def async_engine_available() -> bool:
+    """False for in-memory SQLite, which the async engine cannot share.
+
+    Async services then run their sync variant in the threadpool instead.
+    """
+    return not _is_memory_sqlite(get_async_database_url())
+
+
+_async_lock = Lock()
+_async_engine: Optional[AsyncEngine] = None
+_async_sessions: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """The asyncio engine over the same database, created on first use.
+
+    Its driver (aiosqlite, aiomysql) is only imported here, so processes that
+    never touch the async layer do not need it installed.
+    """
+    global _async_engine, _async_sessions
+    with _async_lock:
+        if _async_engine is None:
+            _async_engine = _create_async_engine()
+            _async_sessions = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+        return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessions
+    with _async_lock:
+        async_engine, _async_engine, _async_sessions = _async_engine, None, None
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncGenerator[AsyncSession, None]:
+    """``session_scope`` for coroutines: awaits on the pool instead of holding a thread."""
+    get_async_engine()
+    session = _async_sessions()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def is_locked_error(exc: BaseException) -> bool:
+    """True for SQLite's ``database is locked`` / ``busy``, which succeed when retried."""
+    if not isinstance(exc, OperationalError):
+        return False
+    message = str(exc.orig).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def retry_on_locked(func: F) -> F:
+    """Re-run ``func`` when SQLite reports the database locked.
+
+    The busy timeout already queues writers; this covers the cases SQLite
+    refuses to wait on, such as a read transaction upgrading to a write after
+    another connection committed. ``func`` must open its own ``session_scope``
+    so each attempt starts a fresh transaction. Sync and async functions are
+    both supported.
+    """
+
+    def _delay(attempt: int) -> Optional[float]:
+        settings = get_settings()
+        if attempt >= settings.sqlite_lock_retries:
+            return None
+        logger.warning("sqlite_locked_retry %s %d", func.__qualname__, attempt + 1)
+        return settings.sqlite_lock_retry_delay_seconds * (2**attempt)
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except OperationalError as exc:
+                    delay = _delay(attempt) if is_locked_error(exc) else None
+                    if delay is None:
+                        raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                delay = _delay(attempt) if is_locked_error(exc) else None
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    return wrapper
@@ -4,15 +4,22 @@ from models.core import (
     AgentTool,
     ApiKey,
     AuditLog,
+    BillingRun,
+    BillingRunItem,
     ChatSession,
     Company,
+    IdempotencyKey,
     Invoice,
+    Job,
     KbChunk,
     KbDocument,
     Message,
+    PriceBook,
     Role,
     Tool,
     UsageEvent,
+    UsageRollupDaily,
+    UsageRollupHourly,
     User,
     UserRole,
 )
@@ -23,15 +30,22 @@ __all__ = [
     "AgentTool",
     "ApiKey",
     "AuditLog",
+    "BillingRun",
+    "BillingRunItem",
     "ChatSession",
     "Company",
+    "IdempotencyKey",
     "Invoice",
+    "Job",
     "KbChunk",
     "KbDocument",
     "Message",
+    "PriceBook",
     "Role",
     "Tool",
     "UsageEvent",
+    "UsageRollupDaily",
+    "UsageRollupHourly",
     "User",
     "UserRole",
 ]
@@ -7,9 +7,11 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    UniqueConstraint,
 )
 
 from models.base import Base
@@ -21,6 +23,7 @@ class Company(Base):
     name = Column(String(255), nullable=False)
     plan_id = Column(String(50), nullable=True)
     status = Column(String(20), nullable=False, default="active")
+    quota_json = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -33,6 +36,8 @@ class User(Base):
     status = Column(String(20), nullable=False, default="active")
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_users_company_email", "company_id", "email"),)
+
 
 class Role(Base):
     __tablename__ = "roles"
@@ -42,6 +47,8 @@ class Role(Base):
     permissions = Column(JSON, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_roles_company_name", "company_id", "name"),)
+
 
 class UserRole(Base):
     __tablename__ = "user_roles"
@@ -49,6 +56,8 @@ class UserRole(Base):
     user_id = Column(String(36), ForeignKey("users.id"), primary_key=True)
     role_id = Column(String(36), ForeignKey("roles.id"), primary_key=True)
 
+    __table_args__ = (Index("ix_user_roles_company_role", "company_id", "role_id"),)
+
 
 class ApiKey(Base):
     __tablename__ = "api_keys"
@@ -62,6 +71,11 @@ class ApiKey(Base):
     rotated_from = Column(String(36), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_api_keys_key_hash", "key_hash"),
+        Index("ix_api_keys_company", "company_id"),
+    )
+
 
 class Agent(Base):
     __tablename__ = "agents"
@@ -80,6 +94,8 @@ class Agent(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_agents_company_status", "company_id", "status"),)
+
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
@@ -92,6 +108,8 @@ class ChatSession(Base):
     started_at = Column(DateTime, default=datetime.utcnow)
     ended_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (Index("ix_chat_sessions_company_agent", "company_id", "agent_id"),)
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -109,6 +127,8 @@ class Message(Base):
     latency_ms = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_messages_company_session_created", "company_id", "session_id", "created_at"),)
+
 
 class KbDocument(Base):
     __tablename__ = "kb_documents"
@@ -122,6 +142,8 @@ class KbDocument(Base):
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_kb_documents_company_agent_status", "company_id", "agent_id", "status"),)
+
 
 class KbChunk(Base):
     __tablename__ = "kb_chunks"
@@ -131,6 +153,8 @@ class KbChunk(Base):
     agent_id = Column(String(36), ForeignKey("agents.id"), nullable=False)
     content = Column(Text, nullable=False)
 
+    __table_args__ = (Index("ix_kb_chunks_doc", "doc_id"),)
+
 
 class Tool(Base):
     __tablename__ = "tools"
@@ -143,8 +167,11 @@ class Tool(Base):
     output_schema_json = Column(JSON, nullable=True)
     config_json = Column(JSON, nullable=False)
     status = Column(String(20), nullable=False, default="active")
+    version = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_tools_company_status", "company_id", "status"),)
+
 
 class AgentTool(Base):
     __tablename__ = "agent_tools"
@@ -157,15 +184,49 @@ class AgentTool(Base):
 class UsageEvent(Base):
     __tablename__ = "usage_events"
     id = Column(String(36), primary_key=True)
-    company_id = Column(String(36), ForeignKey("companies.id"), nullable=False)
-    agent_id = Column(String(36), ForeignKey("agents.id"), nullable=False)
+    # No foreign keys: MySQL cannot partition a table that has them (migration 0014).
+    company_id = Column(String(36), nullable=False)
+    agent_id = Column(String(36), nullable=False)
     session_id = Column(String(36), nullable=True)
     event_type = Column(String(50), nullable=False)
     quantity = Column(Float, nullable=False)
     unit = Column(String(20), nullable=False)
+    # NULL until a draft invoice prices the period (see billing_service.generate_invoice).
     cost = Column(Float, nullable=True)
     metadata_json = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Part of the primary key because it is the partitioning column.
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_usage_events_company_created", "company_id", "created_at"),
+        Index("ix_usage_events_company_agent_created", "company_id", "agent_id", "created_at"),
+    )
+
+
+class UsageRollupHourly(Base):
+    __tablename__ = "usage_rollups_hourly"
+    company_id = Column(String(36), primary_key=True)
+    agent_id = Column(String(36), primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    unit = Column(String(20), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    quantity = Column(Float, nullable=False, default=0)
+    event_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_usage_rollups_hourly_company_bucket", "company_id", "bucket_start"),)
+
+
+class UsageRollupDaily(Base):
+    __tablename__ = "usage_rollups_daily"
+    company_id = Column(String(36), primary_key=True)
+    agent_id = Column(String(36), primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    unit = Column(String(20), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    quantity = Column(Float, nullable=False, default=0)
+    event_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_usage_rollups_daily_company_bucket", "company_id", "bucket_start"),)
 
 
 class Invoice(Base):
@@ -182,6 +243,48 @@ class Invoice(Base):
     line_items_json = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        UniqueConstraint("company_id", "period_start", "period_end", name="uq_invoices_company_period"),
+    )
+
+
+class PriceBook(Base):
+    __tablename__ = "price_books"
+    id = Column(String(36), primary_key=True)
+    plan_id = Column(String(50), nullable=False)
+    version = Column(Integer, nullable=False)
+    currency = Column(String(10), nullable=False)
+    rates_json = Column(JSON, nullable=False)
+    effective_from = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("plan_id", "version", name="uq_price_books_plan_version"),)
+
+
+class BillingRun(Base):
+    __tablename__ = "billing_runs"
+    id = Column(String(36), primary_key=True)
+    period = Column(String(7), nullable=False)
+    status = Column(String(20), nullable=False, default="running")
+    report_json = Column(JSON, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    lease_owner = Column(String(128), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_billing_runs_period_started", "period", "started_at"),)
+
+
+class BillingRunItem(Base):
+    __tablename__ = "billing_run_items"
+    run_id = Column(String(36), primary_key=True)
+    company_id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False)
+    invoice_id = Column(String(36), nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    error_message = Column(Text, nullable=True)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -194,3 +297,44 @@ class AuditLog(Base):
     resource_id = Column(String(255), nullable=False)
     metadata_json = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_audit_logs_company_created", "company_id", "created_at"),)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    company_id = Column(String(36), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False, default="in_progress")
+    response_json = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_idempotency_keys_expires", "expires_at"),)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(String(36), primary_key=True)
+    company_id = Column(String(36), ForeignKey("companies.id"), nullable=False)
+    tool_id = Column(String(36), ForeignKey("tools.id"), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")
+    input_json = Column(JSON, nullable=False)
+    result_json = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+        Index("ix_jobs_status_lease_expires", "status", "lease_expires_at"),
+        Index("ix_jobs_company_status", "company_id", "status"),
+    )
@@ -1,18 +1,19 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Header, Request
 
 from common.auth import AuthContext
 from common.errors import SaturnError
 from common.logging import get_logger, set_request_context
-from common.rbac import has_scope, require_permission
+from common.rbac import has_scope, require_permission, require_permission_async
 from routers.auth import require_auth, require_jwt
 from schemas.agent import AgentCreate, AgentUpdate
 from schemas.chat import ChatRequest
-from schemas.tool import ToolAttachRequest, ToolDetachRequest
+from schemas.tool import ToolAttachRequest, ToolBatchRequest, ToolDetachRequest
+from services.idempotency_service import request_fingerprint, run_idempotent
 from services.orchestrator_service import execute_turn
-from services.tool_service import attach_tool, detach_tool
-from services.agent_service import create_agent, disable_agent, get_agent, list_agents, update_agent
+from services.tool_service import attach_tool, detach_tool, update_attachments
+from services.agent_service import create_agent, disable_agent, get_agent_async, list_agents_async, update_agent
 
 router = APIRouter(prefix="/agents")
 logger = get_logger("routers.agents")
@@ -24,23 +25,33 @@ def _envelope(data: dict, request: Request) -> dict:
 
 @router.post("")
 def create_agent_endpoint(
-    request: Request, payload: AgentCreate, auth: AuthContext = Depends(require_jwt)
+    request: Request,
+    payload: AgentCreate,
+    auth: AuthContext = Depends(require_jwt),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ) -> dict:
     require_permission(auth, "agents:write")
-    record = create_agent(auth.company_id, payload.model_dump(by_alias=True), auth)
-    logger.info("agent_created %s", record.id)
-    return _envelope({"agent_id": record.id, "version": record.version}, request)
+    body = payload.model_dump(by_alias=True)
+
+    def _create() -> dict:
+        record = create_agent(auth.company_id, body, auth)
+        logger.info("agent_created %s", record.id)
+        return {"agent_id": record.id, "version": record.version}
+
+    fingerprint = request_fingerprint(request.method, request.url.path, body)
+    data = run_idempotent(auth.company_id, idempotency_key, fingerprint, _create)
+    return _envelope(data, request)
 
 
 @router.get("")
-def list_agents_endpoint(
+async def list_agents_endpoint(
     request: Request,
     type: Optional[str] = None,
     status: Optional[str] = None,
     auth: AuthContext = Depends(require_jwt),
 ) -> dict:
-    require_permission(auth, "agents:read")
-    records = list_agents(auth.company_id, type, status)
+    await require_permission_async(auth, "agents:read")
+    records = await list_agents_async(auth.company_id, type, status)
     data = [
         {
             "agent_id": record.id,
@@ -62,11 +73,11 @@ def list_agents_endpoint(
 
 
 @router.get("/{agent_id}")
-def get_agent_endpoint(
+async def get_agent_endpoint(
     request: Request, agent_id: str, auth: AuthContext = Depends(require_jwt)
 ) -> dict:
-    require_permission(auth, "agents:read")
-    record = get_agent(auth.company_id, agent_id)
+    await require_permission_async(auth, "agents:read")
+    record = await get_agent_async(auth.company_id, agent_id)
     data = {
         "agent_id": record.id,
         "company_id": record.company_id,
@@ -109,7 +120,11 @@ def disable_agent_endpoint(
 
 @router.post("/{agent_id}/chat")
 def chat_agent_endpoint(
-    request: Request, agent_id: str, payload: ChatRequest, auth: AuthContext = Depends(require_auth)
+    request: Request,
+    agent_id: str,
+    payload: ChatRequest,
+    auth: AuthContext = Depends(require_auth),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ) -> dict:
     if auth.auth_type == "jwt":
         require_permission(auth, "chat:write")
@@ -121,15 +136,20 @@ def chat_agent_endpoint(
         company_id=auth.company_id,
         agent_id=agent_id,
     )
-    session_id, reply, usage, citations = execute_turn(
-        auth.company_id, agent_id, payload.session_id, payload.message, payload.metadata, auth
-    )
-    data = {
-        "session_id": session_id,
-        "reply": reply,
-        "citations": citations,
-        "usage": usage,
-    }
+
+    def _turn() -> dict:
+        session_id, reply, usage, citations = execute_turn(
+            auth.company_id, agent_id, payload.session_id, payload.message, payload.metadata, auth
+        )
+        return {
+            "session_id": session_id,
+            "reply": reply,
+            "citations": citations,
+            "usage": usage,
+        }
+
+    fingerprint = request_fingerprint(request.method, request.url.path, payload.model_dump())
+    data = run_idempotent(auth.company_id, idempotency_key, fingerprint, _turn)
     return _envelope(data, request)
 
 
@@ -155,3 +175,20 @@ def detach_tool_endpoint(
     require_permission(auth, "tools:write")
     detach_tool(auth.company_id, agent_id, payload.tool_id)
     return _envelope({"agent_id": agent_id, "tool_id": payload.tool_id}, request)
+
+
+@router.post("/{agent_id}/tools/batch")
+def batch_tools_endpoint(
+    request: Request,
+    agent_id: str,
+    payload: ToolBatchRequest,
+    auth: AuthContext = Depends(require_jwt),
+) -> dict:
+    require_permission(auth, "tools:write")
+    tool_ids = update_attachments(
+        auth.company_id,
+        agent_id,
+        [item.model_dump() for item in payload.attach],
+        payload.detach,
+    )
+    return _envelope({"agent_id": agent_id, "tool_ids": tool_ids}, request)
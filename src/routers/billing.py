@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, Request
+from dataclasses import asdict
+
+from fastapi import APIRouter, Body, Depends, Request
 
 from common.auth import AuthContext
+from common.errors import SaturnError
 from common.logging import get_logger
-from common.rbac import require_permission
-from routers.auth import require_jwt
-from services.billing_service import generate_invoice, get_invoice, list_invoices
+from common.rbac import has_scope, require_permission, require_platform_admin
+from routers.auth import require_auth, require_jwt
+from schemas.billing import PriceBookCreate, QuotaUpdate, RepricingPreviewRequest
+from services.billing_run import BillingRunRecord, get_run, start_billing_run
+from services.billing_service import (
+    estimate_cost,
+    generate_invoice,
+    get_invoice,
+    list_invoices,
+    preview_repricing,
+)
+from services.company_service import set_company_quota
+from services.pricing import create_price_book
+from services.spend_counters import spend_snapshot, spend_snapshots
+from services.usage_ingest import ingest_usage_ndjson
 from services.usage_service import summarize_usage
 
 router = APIRouter()
@@ -20,15 +35,42 @@ def usage_summary(
     request: Request, period: str, auth: AuthContext = Depends(require_jwt)
 ) -> dict:
     require_permission(auth, "billing:read")
-    invoice = generate_invoice(auth.company_id, period)
-    usage = summarize_usage(auth.company_id)
+    estimate = estimate_cost(auth.company_id, period)
+    usage = summarize_usage(auth.company_id, period)
     data = {
         "period": period,
         "tokens_in": usage["tokens_in"],
         "tokens_out": usage["tokens_out"],
         "tool_calls": usage["tool_calls"],
         "kb_queries": usage["kb_queries"],
-        "estimated_cost": invoice.total,
+        "estimated_cost": estimate.total,
+        "unpriced_usage": estimate.unpriced_usage,
+    }
+    return _envelope(data, request)
+
+
+@router.get("/usage/counters")
+def usage_counters(request: Request, auth: AuthContext = Depends(require_jwt)) -> dict:
+    require_permission(auth, "billing:read")
+    return _envelope(asdict(spend_snapshot(auth.company_id)), request)
+
+
+@router.post("/usage/events/bulk")
+def ingest_usage_endpoint(
+    request: Request,
+    body: bytes = Body(..., media_type="application/x-ndjson"),
+    auth: AuthContext = Depends(require_auth),
+) -> dict:
+    if auth.auth_type == "jwt":
+        require_permission(auth, "usage:write")
+    elif not has_scope(auth, ["usage:write"]):
+        raise SaturnError("AUTH_FORBIDDEN")
+    results = ingest_usage_ndjson(auth.company_id, body)
+    data = {
+        "accepted": sum(result.accepted for result in results),
+        "duplicates": sum(result.duplicates for result in results),
+        "rejected": sum(len(result.rejected) for result in results),
+        "batches": [asdict(result) for result in results],
     }
     return _envelope(data, request)
 
@@ -64,6 +106,7 @@ def get_invoice_endpoint(
         "currency": invoice.currency,
         "total": invoice.total,
         "line_items": invoice.line_items,
+        "unpriced_usage": invoice.unpriced_usage,
     }
     return _envelope(data, request)
 
@@ -80,6 +123,77 @@ def generate_invoice_endpoint(
         "period_end": invoice.period_end.isoformat(),
         "status": invoice.status,
         "total": invoice.total,
+        "unpriced_usage": invoice.unpriced_usage,
     }
     logger.info("invoice_draft_created %s", invoice.id)
     return _envelope(data, request)
+
+
+def _run_data(run: BillingRunRecord) -> dict:
+    return {
+        "run_id": run.id,
+        "period": run.period,
+        "status": run.status,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "report": run.report,
+    }
+
+
+@router.post("/admin/billing/runs")
+def start_billing_run_endpoint(
+    request: Request, period: str, auth: AuthContext = Depends(require_jwt)
+) -> dict:
+    require_platform_admin(auth)
+    run = start_billing_run(period)
+    logger.info("billing_run_requested %s", run.id)
+    return _envelope(_run_data(run), request)
+
+
+@router.get("/admin/billing/runs/{run_id}")
+def get_billing_run_endpoint(
+    request: Request, run_id: str, auth: AuthContext = Depends(require_jwt)
+) -> dict:
+    require_platform_admin(auth)
+    return _envelope(_run_data(get_run(run_id)), request)
+
+
+@router.post("/admin/price-books")
+def create_price_book_endpoint(
+    request: Request, payload: PriceBookCreate, auth: AuthContext = Depends(require_jwt)
+) -> dict:
+    require_platform_admin(auth)
+    book = create_price_book(payload.plan_id, payload.rates, payload.currency, payload.effective_from)
+    data = {
+        "price_book_id": book.id,
+        "plan_id": book.plan_id,
+        "version": book.version,
+        "currency": book.currency,
+        "effective_from": book.effective_from,
+    }
+    return _envelope(data, request)
+
+
+@router.post("/admin/billing/preview")
+def preview_repricing_endpoint(
+    request: Request, payload: RepricingPreviewRequest, auth: AuthContext = Depends(require_jwt)
+) -> dict:
+    require_platform_admin(auth)
+    totals = preview_repricing(payload.period, payload.plan_id, payload.rates, payload.currency)
+    return _envelope({"period": payload.period, "plan_id": payload.plan_id, "companies": totals}, request)
+
+
+@router.get("/admin/usage/counters")
+def all_usage_counters(request: Request, auth: AuthContext = Depends(require_jwt)) -> dict:
+    require_platform_admin(auth)
+    return _envelope({"counters": [asdict(snapshot) for snapshot in spend_snapshots()]}, request)
+
+
+@router.put("/admin/companies/{company_id}/quota")
+def set_quota_endpoint(
+    request: Request, company_id: str, payload: QuotaUpdate, auth: AuthContext = Depends(require_jwt)
+) -> dict:
+    require_platform_admin(auth)
+    quota = set_company_quota(company_id, payload.model_dump(exclude_none=True))
+    logger.info("company_quota_updated %s", company_id)
+    return _envelope({"company_id": company_id, "quota": quota}, request)
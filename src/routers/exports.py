@@ -0,0 +1,57 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from common.auth import AuthContext
+from common.logging import get_logger
+from common.rbac import require_permission
+from routers.auth import require_jwt
+from services.export_service import AUDIT, MEDIA_TYPES, USAGE, export_stream, parse_timestamp
+
+router = APIRouter()
+logger = get_logger("routers.exports")
+
+
+def _export_response(
+    kind: str,
+    company_id: str,
+    format: str,
+    start: Optional[str],
+    end: Optional[str],
+    agent_id: Optional[str],
+    gzip: bool,
+) -> StreamingResponse:
+    body = export_stream(kind, format, company_id, parse_timestamp(start), parse_timestamp(end), agent_id, gzip)
+    filename = f"{kind}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/usage/export")
+def export_usage(
+    format: str = "ndjson",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    gzip: bool = True,
+    auth: AuthContext = Depends(require_jwt),
+) -> StreamingResponse:
+    require_permission(auth, "billing:read")
+    return _export_response(USAGE, auth.company_id, format, start, end, agent_id, gzip)
+
+
+@router.get("/audit-logs/export")
+def export_audit_logs(
+    format: str = "ndjson",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    gzip: bool = True,
+    auth: AuthContext = Depends(require_jwt),
+) -> StreamingResponse:
+    require_permission(auth, "audit:read")
+    return _export_response(AUDIT, auth.company_id, format, start, end, agent_id, gzip)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Query, Request
+
+from common.auth import AuthContext
+from common.errors import SaturnError
+from common.logging import get_logger
+from common.rbac import has_scope, require_permission
+from routers.auth import require_auth
+from services.job_service import get_job, wait_for_job
+
+router = APIRouter(prefix="/jobs")
+logger = get_logger("routers.jobs")
+
+
+def _envelope(data: dict, request: Request) -> dict:
+    return {"data": data, "meta": {"request_id": request.state.request_id}}
+
+
+@router.get("/{job_id}")
+def get_job_endpoint(
+    request: Request,
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60),
+    auth: AuthContext = Depends(require_auth),
+) -> dict:
+    if auth.auth_type == "jwt":
+        require_permission(auth, "tools:read")
+    else:
+        if not has_scope(auth, ["tools:read"]):
+            raise SaturnError("AUTH_FORBIDDEN")
+    job = wait_for_job(auth.company_id, job_id, wait) if wait else get_job(auth.company_id, job_id)
+    data = {
+        "job_id": job.id,
+        "tool_id": job.tool_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "result": job.result,
+        "error_message": job.error_message,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+    return _envelope(data, request)
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
 
 from common.auth import AuthContext
 from common.logging import get_logger
@@ -6,6 +8,7 @@ from common.rbac import require_permission
 from routers.auth import require_jwt
 from schemas.kb import KbDeleteResponse, KbDocumentResponse, KbReindexResponse, KbUploadRequest, KbUploadResponse
 from services.agent_service import get_agent
+from services.idempotency_service import request_fingerprint, run_idempotent
 from services.kb_service import delete_document, list_documents, reindex_document, upload_document
 
 router = APIRouter(prefix="/agents/{agent_id}/kb")
@@ -22,13 +25,19 @@ def upload_kb_document(
     agent_id: str,
     payload: KbUploadRequest,
     auth: AuthContext = Depends(require_jwt),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ) -> dict:
     require_permission(auth, "kb:write")
     get_agent(auth.company_id, agent_id)
-    doc = upload_document(auth.company_id, agent_id, payload.filename, payload.content)
-    logger.info("kb_upload %s", doc.id)
-    response = KbUploadResponse(doc_id=doc.id, status=doc.status)
-    return _envelope(response.model_dump(), request)
+
+    def _upload() -> dict:
+        doc = upload_document(auth.company_id, agent_id, payload.filename, payload.content)
+        logger.info("kb_upload %s", doc.id)
+        return KbUploadResponse(doc_id=doc.id, status=doc.status).model_dump()
+
+    fingerprint = request_fingerprint(request.method, request.url.path, payload.model_dump())
+    data = run_idempotent(auth.company_id, idempotency_key, fingerprint, _upload)
+    return _envelope(data, request)
 
 
 @router.get("")
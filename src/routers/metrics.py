@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 
+from common.auth import AuthContext
 from common.logging import get_logger
-from common.metrics import as_dict
+from common.metrics import as_dict, tool_latency_histograms, tool_latency_totals
+from common.rbac import require_platform_admin
+from routers.auth import require_jwt
+from services.jwt_cache import token_cache_size
+from services.tool_guard import breaker_state_counts, breaker_states
 
 router = APIRouter()
 logger = get_logger("routers.metrics")
@@ -10,4 +15,16 @@ logger = get_logger("routers.metrics")
 @router.get("/metrics")
 def metrics(request: Request) -> dict:
     logger.info("metrics")
-    return {"data": as_dict(), "meta": {"request_id": request.state.request_id}}
+    data = as_dict()
+    data["tool_breakers"] = breaker_state_counts()
+    data["tool_latency_ms"] = tool_latency_totals()
+    data["jwt_cache_size"] = token_cache_size()
+    return {"data": data, "meta": {"request_id": request.state.request_id}}
+
+
+@router.get("/admin/metrics/tools")
+def tool_metrics(request: Request, auth: AuthContext = Depends(require_jwt)) -> dict:
+    """Per-tool breaker states and latency across tenants; ``/metrics`` only shows totals."""
+    require_platform_admin(auth)
+    data = {"tool_breakers": breaker_states(), "tool_latency_ms": tool_latency_histograms()}
+    return {"data": data, "meta": {"request_id": request.state.request_id}}
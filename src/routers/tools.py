@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
 
 from common.auth import AuthContext
 from common.logging import get_logger
 from common.rbac import require_permission
 from routers.auth import require_jwt
-from schemas.tool import ToolCreate, ToolTestRequest
-from services.tool_service import create_tool, execute_tool, list_tools
+from schemas.tool import ToolCreate, ToolTestRequest, ToolUpdate
+from services.idempotency_service import request_fingerprint, run_idempotent
+from services.tool_service import create_tool, execute_tool, list_tools, update_tool
 
 router = APIRouter(prefix="/tools")
 logger = get_logger("routers.tools")
@@ -17,11 +20,21 @@ def _envelope(data: dict, request: Request) -> dict:
 
 @router.post("")
 def create_tool_endpoint(
-    request: Request, payload: ToolCreate, auth: AuthContext = Depends(require_jwt)
+    request: Request,
+    payload: ToolCreate,
+    auth: AuthContext = Depends(require_jwt),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ) -> dict:
     require_permission(auth, "tools:write")
-    record = create_tool(auth.company_id, payload.model_dump(), auth)
-    return _envelope({"tool_id": record.id}, request)
+    body = payload.model_dump()
+
+    def _create() -> dict:
+        record = create_tool(auth.company_id, body, auth)
+        return {"tool_id": record.id}
+
+    fingerprint = request_fingerprint(request.method, request.url.path, body)
+    data = run_idempotent(auth.company_id, idempotency_key, fingerprint, _create)
+    return _envelope(data, request)
 
 
 @router.get("")
@@ -41,6 +54,15 @@ def list_tools_endpoint(request: Request, auth: AuthContext = Depends(require_jw
     return _envelope({"tools": data}, request)
 
 
+@router.patch("/{tool_id}")
+def update_tool_endpoint(
+    request: Request, tool_id: str, payload: ToolUpdate, auth: AuthContext = Depends(require_jwt)
+) -> dict:
+    require_permission(auth, "tools:write")
+    record = update_tool(auth.company_id, tool_id, payload.model_dump(exclude_unset=True), auth)
+    return _envelope({"tool_id": record.id, "version": record.version}, request)
+
+
 @router.post("/{tool_id}/test")
 def test_tool_endpoint(
     request: Request,
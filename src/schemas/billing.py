@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class PriceBookCreate(BaseModel):
+    plan_id: str
+    rates: List[Dict[str, Any]]
+    currency: Optional[str] = None
+    effective_from: Optional[datetime] = None
+
+
+class RepricingPreviewRequest(BaseModel):
+    period: str
+    plan_id: str
+    rates: List[Dict[str, Any]]
+    currency: Optional[str] = None
+
+
+class QuotaUpdate(BaseModel):
+    tokens: Optional[float] = None
+    calls: Optional[float] = None
+    seconds: Optional[float] = None
+    cost: Optional[float] = None
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -13,6 +13,14 @@ class ToolCreate(BaseModel):
     status: str = Field("active", pattern="^(active|disabled)$")
 
 
+class ToolUpdate(BaseModel):
+    description: Optional[str] = None
+    input_schema: Optional[Dict[str, Any]] = None
+    output_schema: Optional[Dict[str, Any]] = None
+    config: Optional[Dict[str, Any]] = None
+    status: Optional[str] = Field(None, pattern="^(active|disabled)$")
+
+
 class ToolTestRequest(BaseModel):
     input: Dict[str, Any]
 
@@ -24,3 +32,8 @@ class ToolAttachRequest(BaseModel):
 
 class ToolDetachRequest(BaseModel):
     tool_id: str
+
+
+class ToolBatchRequest(BaseModel):
+    attach: List[ToolAttachRequest] = Field(default_factory=list)
+    detach: List[str] = Field(default_factory=list)
@@ -3,10 +3,13 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from sqlalchemy import Select, select
+from starlette.concurrency import run_in_threadpool
+
 from common.auth import AuthContext
 from common.errors import SaturnError
 from common.logging import get_logger
-from db.session import session_scope
+from db.session import async_engine_available, async_session_scope, session_scope
 from models.core import Agent as AgentModel
 from services.audit_service import record_audit_log
 
@@ -78,23 +81,45 @@ def create_agent(company_id: str, payload: Dict, actor: AuthContext) -> AgentRec
     return get_agent(company_id, agent_id)
 
 
+def _agents_query(company_id: str, agent_type: Optional[str], status: Optional[str]) -> Select:
+    query = select(AgentModel).where(AgentModel.company_id == company_id)
+    if agent_type:
+        query = query.where(AgentModel.type == agent_type)
+    if status:
+        query = query.where(AgentModel.status == status)
+    return query
+
+
+def _agent_query(company_id: str, agent_id: str) -> Select:
+    return select(AgentModel).where(AgentModel.company_id == company_id, AgentModel.id == agent_id)
+
+
 def list_agents(company_id: str, agent_type: Optional[str], status: Optional[str]) -> List[AgentRecord]:
     with session_scope() as session:
-        query = session.query(AgentModel).filter(AgentModel.company_id == company_id)
-        if agent_type:
-            query = query.filter(AgentModel.type == agent_type)
-        if status:
-            query = query.filter(AgentModel.status == status)
-        return [_to_record(row) for row in query.all()]
+        return [_to_record(row) for row in session.scalars(_agents_query(company_id, agent_type, status))]
+
+
+async def list_agents_async(company_id: str, agent_type: Optional[str], status: Optional[str]) -> List[AgentRecord]:
+    if not async_engine_available():
+        return await run_in_threadpool(list_agents, company_id, agent_type, status)
+    async with async_session_scope() as session:
+        rows = await session.scalars(_agents_query(company_id, agent_type, status))
+        return [_to_record(row) for row in rows]
 
 
 def get_agent(company_id: str, agent_id: str) -> AgentRecord:
     with session_scope() as session:
-        model = (
-            session.query(AgentModel)
-            .filter(AgentModel.company_id == company_id, AgentModel.id == agent_id)
-            .first()
-        )
+        model = session.scalars(_agent_query(company_id, agent_id)).first()
+        if not model:
+            raise SaturnError("AGENT_NOT_FOUND")
+        return _to_record(model)
+
+
+async def get_agent_async(company_id: str, agent_id: str) -> AgentRecord:
+    if not async_engine_available():
+        return await run_in_threadpool(get_agent, company_id, agent_id)
+    async with async_session_scope() as session:
+        model = (await session.scalars(_agent_query(company_id, agent_id))).first()
         if not model:
             raise SaturnError("AGENT_NOT_FOUND")
         return _to_record(model)
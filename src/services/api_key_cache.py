@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Optional, Set, Tuple
+
+from common.auth import AuthContext
+
+_lock = Lock()
+_entries: "OrderedDict[str, Tuple[float, Optional[str], AuthContext]]" = OrderedDict()
+_hashes_by_key_id: Dict[str, Set[str]] = {}
+_last_used: Dict[str, datetime] = {}
+_last_recorded: Dict[str, float] = {}
+
+
+def lookup_api_key(key_hash: str) -> Optional[Tuple[Optional[str], AuthContext]]:
+    """``(key_id, auth)`` of a recently verified key hash, or ``None`` if absent or expired."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key_hash)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            _drop(key_hash)
+            return None
+        _entries.move_to_end(key_hash)
+        return entry[1], entry[2]
+
+
+def store_api_key(
+    key_hash: str, key_id: Optional[str], auth: AuthContext, ttl_seconds: float, max_entries: int
+) -> None:
+    if ttl_seconds <= 0 or max_entries <= 0:
+        return
+    with _lock:
+        _drop(key_hash)
+        _entries[key_hash] = (time.monotonic() + ttl_seconds, key_id, auth)
+        if key_id is not None:
+            _hashes_by_key_id.setdefault(key_id, set()).add(key_hash)
+        while len(_entries) > max_entries:
+            _drop(next(iter(_entries)))
+
+
+def _drop(key_hash: str) -> None:
+    entry = _entries.pop(key_hash, None)
+    if entry is None or entry[1] is None:
+        return
+    hashes = _hashes_by_key_id.get(entry[1])
+    if hashes is not None:
+        hashes.discard(key_hash)
+        if not hashes:
+            del _hashes_by_key_id[entry[1]]
+            _last_recorded.pop(entry[1], None)
+
+
+def invalidate_api_key(key_id: str) -> None:
+    """Forget a key at once, e.g. when it is revoked."""
+    with _lock:
+        for key_hash in list(_hashes_by_key_id.get(key_id, ())):
+            _drop(key_hash)
+        _last_used.pop(key_id, None)
+        _last_recorded.pop(key_id, None)
+
+
+def mark_used(key_id: str, granularity_seconds: float) -> None:
+    """Note a use of ``key_id`` for the next flush, at most once per ``granularity_seconds``."""
+    now = time.monotonic()
+    with _lock:
+        if now - _last_recorded.get(key_id, float("-inf")) < granularity_seconds:
+            return
+        _last_recorded[key_id] = now
+        _last_used[key_id] = datetime.utcnow()
+
+
+def drain_last_used() -> Dict[str, datetime]:
+    with _lock:
+        pending = dict(_last_used)
+        _last_used.clear()
+    return pending
+
+
+def requeue_last_used(pending: Dict[str, datetime]) -> None:
+    """Put back drained uses whose write failed, unless a newer use was noted meanwhile."""
+    with _lock:
+        for key_id, used_at in pending.items():
+            _last_used.setdefault(key_id, used_at)
+
+
+def reset_api_key_cache() -> None:
+    with _lock:
+        _entries.clear()
+        _hashes_by_key_id.clear()
+        _last_used.clear()
+        _last_recorded.clear()
@@ -7,6 +7,7 @@ from typing import List
 from common.errors import SaturnError
 from db.session import session_scope
 from models.core import ApiKey as ApiKeyModel
+from services.api_key_cache import invalidate_api_key
 
 
 @dataclass
@@ -64,3 +65,4 @@ def revoke_api_key(company_id: str, key_id: str) -> None:
         )
     if not updated:
         raise SaturnError("NOT_FOUND", "API key not found")
+    invalidate_api_key(key_id)
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Dict, List
 
 from common.logging import get_logger
-from db.session import session_scope
+from db.session import retry_on_locked, session_scope
 from models.core import AuditLog as AuditLogModel
 
 logger = get_logger("services.audit")
@@ -19,6 +19,7 @@ class AuditLog:
     metadata: Dict[str, str]
 
 
+@retry_on_locked
 def record_audit_log(
     company_id: str,
     actor_id: str,
@@ -1,15 +1,21 @@
 import hashlib
-from datetime import datetime, timezone
-from typing import Optional
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Optional, Tuple
 
 import jwt
+from sqlalchemy import Select, bindparam, select, update
+from starlette.concurrency import run_in_threadpool
 
 from common.auth import AuthContext
-from common.config import ApiKeyRecord, get_settings
+from common.config import ApiKeyRecord, Settings, get_settings, on_settings_reload
 from common.errors import SaturnError
 from common.logging import get_logger
-from db.session import session_scope
+from common.metrics import record_jwt_cache
+from db.session import async_engine_available, async_session_scope, session_scope
 from models.core import ApiKey as ApiKeyModel
+from services.api_key_cache import drain_last_used, lookup_api_key, mark_used, requeue_last_used, store_api_key
+from services.jwt_cache import lookup_token, reset_token_cache, store_token
 
 logger = get_logger("services.auth")
 
@@ -18,47 +24,188 @@ def _hash_api_key(token: str) -> str:
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
-def _find_api_key_record(token: str) -> Optional[ApiKeyRecord]:
-    settings = get_settings()
-    token_hash = _hash_api_key(token)
-    with session_scope() as session:
-        row = (
-            session.query(ApiKeyModel)
-            .filter(ApiKeyModel.key_hash == token_hash, ApiKeyModel.status == "active")
-            .first()
+def _api_key_query(token_hash: str) -> Select:
+    return select(ApiKeyModel).where(ApiKeyModel.key_hash == token_hash, ApiKeyModel.status == "active")
+
+
+def _api_key_record(row: Optional[ApiKeyModel], token_hash: str) -> Tuple[Optional[str], Optional[ApiKeyRecord]]:
+    if row:
+        return row.id, ApiKeyRecord(
+            key_hash=row.key_hash,
+            company_id=row.company_id,
+            scopes=row.scopes or [],
+            status=row.status,
         )
-        if row:
-            row.last_used_at = datetime.now(timezone.utc)
-            return ApiKeyRecord(
-                key_hash=row.key_hash,
-                company_id=row.company_id,
-                scopes=row.scopes or [],
-                status=row.status,
-            )
-    for record in settings.api_keys:
+    for record in get_settings().api_keys:
         if record.key_hash == token_hash:
-            return record
-    return None
+            return None, record
+    return None, None
 
 
-def verify_api_key(token: str) -> AuthContext:
-    record = _find_api_key_record(token)
+def _find_api_key_record(token_hash: str) -> Tuple[Optional[str], Optional[ApiKeyRecord]]:
+    with session_scope() as session:
+        return _api_key_record(session.scalars(_api_key_query(token_hash)).first(), token_hash)
+
+
+async def _find_api_key_record_async(token_hash: str) -> Tuple[Optional[str], Optional[ApiKeyRecord]]:
+    if not async_engine_available():
+        return await run_in_threadpool(_find_api_key_record, token_hash)
+    async with async_session_scope() as session:
+        return _api_key_record((await session.scalars(_api_key_query(token_hash))).first(), token_hash)
+
+
+def _cache_api_key(
+    token_hash: str, key_id: Optional[str], record: Optional[ApiKeyRecord]
+) -> Tuple[Optional[str], AuthContext]:
     if not record or record.status != "active":
         raise SaturnError("AUTH_INVALID")
-    logger.info("api_key_verified")
-    return AuthContext(
+    settings = get_settings()
+    auth = AuthContext(
         auth_type="api_key",
         company_id=record.company_id,
         user_id=None,
         role="admin",
         scopes=record.scopes,
     )
+    store_api_key(token_hash, key_id, auth, settings.api_key_cache_ttl_seconds, settings.api_key_cache_size)
+    logger.info("api_key_verified")
+    return key_id, auth
+
+
+def _api_key_used(key_id: Optional[str], auth: AuthContext) -> AuthContext:
+    if key_id is not None:
+        mark_used(key_id, get_settings().api_key_last_used_granularity_seconds)
+    return auth
+
+
+def verify_api_key(token: str) -> AuthContext:
+    """Resolve an API key, from the verification cache when it was seen recently.
+
+    A cache hit costs the SHA-256 and a dictionary lookup. ``last_used_at`` is
+    not written here: uses are collected in memory and written in batches by
+    ``flush_last_used``.
+    """
+    token_hash = _hash_api_key(token)
+    cached = lookup_api_key(token_hash)
+    if cached is None:
+        cached = _cache_api_key(token_hash, *_find_api_key_record(token_hash))
+    return _api_key_used(*cached)
+
+
+async def verify_api_key_async(token: str) -> AuthContext:
+    token_hash = _hash_api_key(token)
+    cached = lookup_api_key(token_hash)
+    if cached is None:
+        cached = _cache_api_key(token_hash, *await _find_api_key_record_async(token_hash))
+    return _api_key_used(*cached)
+
+
+def flush_last_used() -> int:
+    """Write pending ``last_used_at`` values in one bulk UPDATE; returns the keys updated.
+
+    If the write fails the values are queued again for the next flush.
+    """
+    pending = drain_last_used()
+    if not pending:
+        return 0
+    table = ApiKeyModel.__table__
+    statement = update(table).where(table.c.id == bindparam("key_id")).values(last_used_at=bindparam("used_at"))
+    try:
+        with session_scope() as session:
+            session.execute(
+                statement, [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()]
+            )
+    except Exception:
+        requeue_last_used(pending)
+        raise
+    return len(pending)
+
+
+class _LastUsedFlusher:
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._stop = Event()
+        self._thread = Thread(target=self._loop, name="saturn-api-key-last-used", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._flush()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._flush()
+
+    def _flush(self) -> None:
+        try:
+            flush_last_used()
+        except Exception as exc:
+            logger.error("api_key_last_used_flush_failed", exc_info=exc)
+
+
+_flusher: Optional[_LastUsedFlusher] = None
+
+
+def start_last_used_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    _flusher = _LastUsedFlusher(get_settings().api_key_last_used_granularity_seconds)
+    _flusher.start()
+
+
+def stop_last_used_flusher() -> None:
+    global _flusher
+    flusher, _flusher = _flusher, None
+    if flusher is not None:
+        flusher.stop()
+
+
+_key_lock = Lock()
+_signing_key: Optional[Tuple[Settings, Any]] = None
+
+
+def _verification_key(settings: Settings) -> Any:
+    """The JWT key prepared once per settings load instead of on every decode.
+
+    The key is cached together with the settings it came from, so a request
+    still holding settings from before a reload can neither reuse a stale key
+    nor leave one behind for requests on the new settings.
+    """
+    global _signing_key
+    with _key_lock:
+        if _signing_key is None or _signing_key[0] is not settings:
+            algorithm = jwt.get_algorithm_by_name(settings.jwt_algorithm)
+            _signing_key = (settings, algorithm.prepare_key(settings.jwt_secret))
+        return _signing_key[1]
+
+
+def _on_settings_reload(settings: Settings) -> None:
+    # A rotated secret must not keep honouring tokens verified with the old one.
+    reset_token_cache()
+
+
+on_settings_reload(_on_settings_reload)
 
 
 def verify_jwt(token: str) -> AuthContext:
+    """Verify a bearer JWT, skipping the signature check for tokens verified recently.
+
+    Verified contexts are cached by token digest until the token's ``exp``
+    (capped at ``jwt_cache_max_ttl_seconds``), so the cache never outlives a token.
+    """
     settings = get_settings()
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = lookup_token(digest)
+    if cached is not None:
+        record_jwt_cache(True)
+        return cached
+    record_jwt_cache(False)
     try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+        payload = jwt.decode(token, _verification_key(settings), algorithms=[settings.jwt_algorithm])
     except jwt.PyJWTError as exc:
         logger.error("jwt_invalid", exc_info=exc)
         raise SaturnError("AUTH_INVALID")
@@ -66,13 +213,18 @@ def verify_jwt(token: str) -> AuthContext:
     if not company_id:
         raise SaturnError("TENANT_NOT_FOUND")
     logger.info("jwt_verified")
-    return AuthContext(
+    auth = AuthContext(
         auth_type="jwt",
         company_id=company_id,
         user_id=payload.get("user_id"),
         role=payload.get("role", "viewer"),
         scopes=payload.get("scopes", []),
     )
+    expires_at = time.time() + settings.jwt_cache_max_ttl_seconds
+    if "exp" in payload:
+        expires_at = min(expires_at, float(payload["exp"]))
+    store_token(digest, auth, expires_at, settings.jwt_cache_size)
+    return auth
 
 
 def parse_bearer_token(authorization: Optional[str]) -> Optional[str]:
@@ -91,3 +243,16 @@ def authenticate(authorization: Optional[str]) -> Optional[AuthContext]:
     if token.startswith("sk_"):
         return verify_api_key(token)
     return verify_jwt(token)
+
+
+async def authenticate_async(authorization: Optional[str]) -> Optional[AuthContext]:
+    """``authenticate`` without blocking the event loop on an API key lookup.
+
+    JWTs are verified inline: that is CPU work, and usually a cache hit.
+    """
+    token = parse_bearer_token(authorization)
+    if not token:
+        return None
+    if token.startswith("sk_"):
+        return await verify_api_key_async(token)
+    return verify_jwt(token)
@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import BillingRun as BillingRunModel
+from models.core import BillingRunItem as BillingRunItemModel
+from services.billing_service import generate_invoice
+from services.company_service import list_companies
+from services.usage_service import parse_period
+
+logger = get_logger("services.billing_run")
+
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class BillingRunRecord:
+    id: str
+    period: str
+    status: str
+    report: Optional[Dict[str, Any]]
+    started_at: str
+    finished_at: Optional[str]
+
+
+def _to_record(model: BillingRunModel) -> BillingRunRecord:
+    return BillingRunRecord(
+        id=model.id,
+        period=model.period,
+        status=model.status,
+        report=model.report_json,
+        started_at=model.started_at.isoformat(),
+        finished_at=model.finished_at.isoformat() if model.finished_at else None,
+    )
+
+
+def new_owner_id() -> str:
+    """Identifies one execution of a run across processes and hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _lease_until(now: datetime) -> datetime:
+    return now + timedelta(seconds=get_settings().billing_run_lease_seconds)
+
+
+def create_run(period: str, owner: Optional[str] = None) -> BillingRunRecord:
+    """Record a new run of ``period``, leased to ``owner`` when given."""
+    parse_period(period)
+    now = datetime.utcnow()
+    with session_scope() as session:
+        model = BillingRunModel(
+            id=str(uuid.uuid4()),
+            period=period,
+            status=RUNNING,
+            started_at=now,
+            lease_owner=owner,
+            lease_expires_at=_lease_until(now) if owner else None,
+        )
+        session.add(model)
+        record = _to_record(model)
+    logger.info("billing_run_created %s %s", record.id, period)
+    return record
+
+
+def get_run(run_id: str) -> BillingRunRecord:
+    with session_scope() as session:
+        model = session.query(BillingRunModel).filter(BillingRunModel.id == run_id).first()
+        if not model:
+            raise SaturnError("NOT_FOUND", "Billing run not found")
+        return _to_record(model)
+
+
+def find_resumable_run(period: str) -> Optional[str]:
+    """Latest run of ``period`` that did not finish cleanly, if any.
+
+    It may still be executing elsewhere; ``claim_run`` decides whether the
+    caller can take it over.
+    """
+    with session_scope() as session:
+        model = (
+            session.query(BillingRunModel)
+            .filter(BillingRunModel.period == period, BillingRunModel.status != SUCCEEDED)
+            .order_by(BillingRunModel.started_at.desc())
+            .first()
+        )
+        return model.id if model else None
+
+
+def _lease_free(now: datetime):
+    return or_(BillingRunModel.lease_expires_at.is_(None), BillingRunModel.lease_expires_at < now)
+
+
+def claim_run(run_id: str, owner: str) -> bool:
+    """Lease an unfinished run to ``owner`` unless another executor still holds it.
+
+    The conditional UPDATE makes concurrent claimers race in the database, so
+    exactly one of them resumes a run whose previous owner died.
+    """
+    now = datetime.utcnow()
+    with session_scope() as session:
+        claimed = (
+            session.query(BillingRunModel)
+            .filter(BillingRunModel.id == run_id, BillingRunModel.status != SUCCEEDED, _lease_free(now))
+            .update(
+                {"status": RUNNING, "lease_owner": owner, "lease_expires_at": _lease_until(now)},
+                synchronize_session=False,
+            )
+        )
+    if claimed:
+        logger.info("billing_run_claimed %s %s", run_id, owner)
+    return claimed == 1
+
+
+def _renew_lease(run_id: str, owner: str) -> None:
+    with session_scope() as session:
+        session.query(BillingRunModel).filter(
+            BillingRunModel.id == run_id, BillingRunModel.lease_owner == owner
+        ).update({"lease_expires_at": _lease_until(datetime.utcnow())}, synchronize_session=False)
+
+
+class _LeaseKeeper:
+    """Renews a run's lease while it executes, so only a dead owner's run can be taken over."""
+
+    def __init__(self, run_id: str, owner: str):
+        self._run_id = run_id
+        self._owner = owner
+        self._interval = get_settings().billing_run_lease_seconds / 3
+        self._stop = Event()
+        self._thread = Thread(target=self._loop, name="saturn-billing-lease", daemon=True)
+
+    def __enter__(self) -> "_LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                _renew_lease(self._run_id, self._owner)
+            except Exception as exc:
+                logger.error("billing_run_lease_renew_failed %s", self._run_id, exc_info=exc)
+
+
+def _checkpoint(run_id: str, company_id: str, item: Dict[str, Any]) -> None:
+    with session_scope() as session:
+        session.merge(
+            BillingRunItemModel(
+                run_id=run_id,
+                company_id=company_id,
+                status=item["status"],
+                invoice_id=item.get("invoice_id"),
+                duration_ms=item["duration_ms"],
+                error_message=item.get("error"),
+                finished_at=datetime.utcnow(),
+            )
+        )
+
+
+def _bill_company(run_id: str, period: str, company_id: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        invoice = generate_invoice(company_id, period)
+        item = {"status": SUCCEEDED, "invoice_id": invoice.id}
+    except Exception as exc:
+        logger.error("billing_run_company_failed %s %s", run_id, company_id, exc_info=exc)
+        message = exc.message if isinstance(exc, SaturnError) else str(exc) or type(exc).__name__
+        item = {"status": FAILED, "error": message}
+    item["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    _checkpoint(run_id, company_id, item)
+    return item
+
+
+def _completed_companies(run_id: str) -> Set[str]:
+    with session_scope() as session:
+        rows = session.query(BillingRunItemModel.company_id).filter(
+            BillingRunItemModel.run_id == run_id, BillingRunItemModel.status == SUCCEEDED
+        )
+        return {row.company_id for row in rows}
+
+
+def _report(run_id: str, period: str, resumed: int, elapsed_ms: float) -> Dict[str, Any]:
+    with session_scope() as session:
+        rows = session.query(BillingRunItemModel).filter(BillingRunItemModel.run_id == run_id).all()
+        items: List[Dict[str, Any]] = [
+            {
+                "company_id": row.company_id,
+                "status": row.status,
+                "invoice_id": row.invoice_id,
+                "duration_ms": row.duration_ms,
+                "error": row.error_message,
+            }
+            for row in rows
+        ]
+    durations = sorted(item["duration_ms"] or 0.0 for item in items)
+    return {
+        "run_id": run_id,
+        "period": period,
+        "companies": len(items),
+        "succeeded": sum(1 for item in items if item["status"] == SUCCEEDED),
+        "failed": sum(1 for item in items if item["status"] == FAILED),
+        "resumed_from_checkpoint": resumed,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "tenant_ms_p50": durations[len(durations) // 2] if durations else 0.0,
+        "tenant_ms_max": durations[-1] if durations else 0.0,
+        "items": sorted(items, key=lambda item: item["company_id"]),
+    }
+
+
+def execute_run(run_id: str, owner: str, workers: Optional[int] = None) -> Dict[str, Any]:
+    """Invoice every active company for the run's period, skipping ones already checkpointed.
+
+    ``owner`` must hold the run's lease (``create_run`` or ``claim_run``); it is
+    renewed while the run executes. Invoices are generated on a thread pool of
+    ``workers`` threads, which also caps how many tenants hit the database at once.
+    """
+    run = get_run(run_id)
+    workers = workers or get_settings().billing_run_workers
+    start = time.perf_counter()
+    done = _completed_companies(run_id)
+    pending = [
+        company.id for company in list_companies() if company.status == "active" and company.id not in done
+    ]
+    logger.info("billing_run_started %s pending=%d resumed=%d", run_id, len(pending), len(done))
+    with _LeaseKeeper(run_id, owner), ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="saturn-billing"
+    ) as pool:
+        results = list(pool.map(lambda company_id: _bill_company(run_id, run.period, company_id), pending))
+    report = _report(run_id, run.period, len(done), (time.perf_counter() - start) * 1000)
+    status = FAILED if any(item["status"] == FAILED for item in results) else SUCCEEDED
+    with session_scope() as session:
+        session.query(BillingRunModel).filter(
+            BillingRunModel.id == run_id, BillingRunModel.lease_owner == owner
+        ).update(
+            {
+                "status": status,
+                "report_json": report,
+                "finished_at": datetime.utcnow(),
+                "lease_owner": None,
+                "lease_expires_at": None,
+            },
+            synchronize_session=False,
+        )
+    logger.info("billing_run_finished %s %s", run_id, status)
+    return report
+
+
+def _acquire_run(period: str, owner: str, resume: bool) -> Tuple[str, bool]:
+    """The period's run for ``owner`` and whether ``owner`` now holds its lease."""
+    run_id = find_resumable_run(period) if resume else None
+    if run_id is None:
+        return create_run(period, owner).id, True
+    return run_id, claim_run(run_id, owner)
+
+
+def run_billing(period: str, resume: bool = True, workers: Optional[int] = None) -> Dict[str, Any]:
+    owner = new_owner_id()
+    run_id, acquired = _acquire_run(period, owner, resume)
+    if not acquired:
+        raise SaturnError("BAD_REQUEST", "A billing run for this period is in progress", {"run_id": run_id})
+    return execute_run(run_id, owner, workers)
+
+
+def _execute_in_background(run_id: str, owner: str) -> None:
+    try:
+        execute_run(run_id, owner)
+    except Exception as exc:
+        logger.error("billing_run_crashed %s", run_id, exc_info=exc)
+
+
+def start_billing_run(period: str) -> BillingRunRecord:
+    """Start (or resume) the period's run on a background thread and return it immediately.
+
+    A run still leased by a live executor, in this process or another, is
+    returned as is rather than started twice.
+    """
+    owner = new_owner_id()
+    run_id, acquired = _acquire_run(period, owner, resume=True)
+    if not acquired:
+        return get_run(run_id)
+    Thread(target=_execute_in_background, args=(run_id, owner), name="saturn-billing-run", daemon=True).start()
+    return get_run(run_id)
+
+
+def reset_billing_runs() -> None:
+    with session_scope() as session:
+        session.query(BillingRunItemModel).delete()
+        session.query(BillingRunModel).delete()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate invoices for every active company")
+    parser.add_argument("--period", required=True, help="YYYY-MM")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--no-resume", action="store_true", help="start a fresh run instead of resuming")
+    args = parser.parse_args()
+    report = run_billing(args.period, resume=not args.no_resume, workers=args.workers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
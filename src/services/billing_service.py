@@ -1,14 +1,20 @@
 import uuid
 from dataclasses import dataclass
-from datetime import date, datetime, timezone
-from typing import Dict, List, Tuple
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
 
 from common.config import get_settings
 from common.errors import SaturnError
 from common.logging import get_logger
 from db.session import session_scope
 from models.core import Invoice as InvoiceModel
-from services.usage_service import list_usage_events
+from services.cost_estimate_cache import lookup_estimate, reset_cost_estimates, store_estimate
+from services.company_service import get_company, list_companies
+from services.pricing import active_price_book, compile_price_book, price_by_plan
+from services.usage_rollups import rollup_breakdown
+from services.usage_service import apply_event_costs, parse_period
 
 logger = get_logger("services.billing")
 
@@ -26,41 +32,92 @@ class InvoiceDraft:
     line_items: List[Dict[str, str]]
     created_at: str
 
+    @property
+    def unpriced_usage(self) -> List[Dict[str, str]]:
+        return _unpriced_usage(self.line_items)
+
+
+@dataclass(frozen=True)
+class PricedPeriod:
+    currency: str
+    subtotal: float
+    line_items: List[Dict[str, str]]
+    unit_costs: Dict[Tuple[str, str], float]
+    price_book_version: int
+    unpriced: List[Tuple[str, str]]
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    company_id: str
+    period: str
+    currency: str
+    subtotal: float
+    total: float
+    line_items: List[Dict[str, str]]
+
+    @property
+    def unpriced_usage(self) -> List[Dict[str, str]]:
+        return _unpriced_usage(self.line_items)
+
+
+def _unpriced_usage(line_items: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [
+        {"item": item["item"], "unit": item["unit"], "quantity": item["quantity"]}
+        for item in line_items
+        if item.get("unpriced") == "true"
+    ]
+
 
 def _now() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _parse_period(period: str) -> Tuple[date, date]:
-    try:
-        year, month = period.split("-")
-        start = date(int(year), int(month), 1)
-    except ValueError as exc:
-        raise SaturnError("BAD_REQUEST", "Invalid period format, expected YYYY-MM") from exc
-    if start.month == 12:
-        end = date(start.year + 1, 1, 1)
-    else:
-        end = date(start.year, start.month + 1, 1)
-    return start, end
-
-
-def _aggregate_usage(company_id: str, start: date, end: date) -> Dict[str, float]:
-    totals = {"tokens": 0.0, "calls": 0.0, "seconds": 0.0}
-    for event in list_usage_events(company_id):
-        created = datetime.fromisoformat(event.created_at).date()
-        if not (start <= created < end):
-            continue
-        if event.unit == "tokens":
-            totals["tokens"] += event.quantity
-        elif event.unit == "calls":
-            totals["calls"] += event.quantity
-        elif event.unit == "seconds":
-            totals["seconds"] += event.quantity
-    return totals
-
-
-def _pricing() -> Dict[str, float]:
-    return {"tokens": 0.000002, "calls": 0.01, "seconds": 0.02}
+def _bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(start, time.min), datetime.combine(end, time.min)
+
+
+def _price(company_id: str, start: date, end: date) -> PricedPeriod:
+    """Price the period's usage with the company plan's price book.
+
+    Usage comes from one ``GROUP BY event_type, unit`` over the daily rollups and
+    is priced in a single vectorized call. Usage no rate covers is kept as a
+    zero line item flagged ``"unpriced": "true"`` rather than silently billed at 0.
+    """
+    period_start, period_end = _bounds(start, end)
+    plan_id = get_company(company_id).plan_id
+    book = active_price_book(plan_id, min(period_end, datetime.utcnow()))
+    rows = sorted(rollup_breakdown(period_start, period_end, company_id), key=lambda row: (row[1], row[2]))
+    keys = [(row[1], row[2]) for row in rows]
+    amounts = book.price(keys, [row[3] for row in rows])
+    unpriced = set(book.unpriced(keys))
+    line_items: List[Dict[str, str]] = []
+    unit_costs: Dict[Tuple[str, str], float] = {}
+    for (_, event_type, unit, quantity), amount in zip(rows, amounts):
+        unit_cost = float(amount) / quantity if quantity else 0.0
+        item = {
+            "item": event_type,
+            "unit": unit,
+            "quantity": str(int(quantity)),
+            "unit_price": str(round(unit_cost, 8)),
+            "amount": str(round(float(amount), 2)),
+        }
+        if (event_type, unit) in unpriced:
+            item["unpriced"] = "true"
+        else:
+            # Unpriced events keep cost NULL instead of a misleading 0.
+            unit_costs[(event_type, unit)] = unit_cost
+        line_items.append(item)
+    if unpriced:
+        logger.warning("usage_unpriced %s plan=%s %s", company_id, plan_id, sorted(unpriced))
+    return PricedPeriod(
+        currency=book.currency,
+        subtotal=round(float(amounts.sum()), 2),
+        line_items=line_items,
+        unit_costs=unit_costs,
+        price_book_version=book.record.version,
+        unpriced=sorted(unpriced),
+    )
 
 
 def _to_draft(model: InvoiceModel) -> InvoiceDraft:
@@ -78,40 +135,111 @@ def _to_draft(model: InvoiceModel) -> InvoiceDraft:
     )
 
 
-def generate_invoice(company_id: str, period: str) -> InvoiceDraft:
-    start, end = _parse_period(period)
-    totals = _aggregate_usage(company_id, start, end)
-    pricing = _pricing()
-    subtotal = (
-        totals["tokens"] * pricing["tokens"]
-        + totals["calls"] * pricing["calls"]
-        + totals["seconds"] * pricing["seconds"]
+def estimate_cost(company_id: str, period: str) -> CostEstimate:
+    """Price ``period`` without writing anything; cached until new usage arrives or the TTL lapses."""
+    estimate = lookup_estimate(company_id, period)
+    if estimate is not None:
+        return estimate
+    start, end = parse_period(period)
+    priced = _price(company_id, start, end)
+    estimate = CostEstimate(
+        company_id=company_id,
+        period=period,
+        currency=priced.currency,
+        subtotal=priced.subtotal,
+        total=priced.subtotal,
+        line_items=priced.line_items,
     )
-    line_items = [
-        {"item": "tokens", "quantity": str(int(totals["tokens"])), "unit_price": str(pricing["tokens"])},
-        {"item": "calls", "quantity": str(int(totals["calls"])), "unit_price": str(pricing["calls"])},
-        {"item": "seconds", "quantity": str(int(totals["seconds"])), "unit_price": str(pricing["seconds"])},
-    ]
-    invoice_id = str(uuid.uuid4())
-    with session_scope() as session:
-        session.add(
-            InvoiceModel(
-                id=invoice_id,
-                company_id=company_id,
-                period_start=start,
-                period_end=end,
-                currency=get_settings().billing_currency,
-                subtotal=round(subtotal, 2),
-                total=round(subtotal, 2),
-                status="draft",
-                line_items_json=line_items,
-                created_at=_now(),
-            )
+    settings = get_settings()
+    store_estimate(
+        company_id, period, estimate, settings.billing_estimate_ttl_seconds, settings.billing_estimate_cache_size
+    )
+    return estimate
+
+
+def _find_invoice(session, company_id: str, start: date, end: date) -> Optional[InvoiceModel]:
+    return (
+        session.query(InvoiceModel)
+        .filter(
+            InvoiceModel.company_id == company_id,
+            InvoiceModel.period_start == start,
+            InvoiceModel.period_end == end,
         )
-    logger.info("invoice_generated %s", invoice_id)
+        .first()
+    )
+
+
+def generate_invoice(company_id: str, period: str) -> InvoiceDraft:
+    """Create the period's draft invoice, or refresh it if one exists.
+
+    There is at most one invoice per company and period. Issued, paid or void
+    invoices are returned untouched.
+    """
+    start, end = parse_period(period)
+    priced = _price(company_id, start, end)
+    try:
+        with session_scope() as session:
+            model = _find_invoice(session, company_id, start, end)
+            if model is None:
+                model = InvoiceModel(
+                    id=str(uuid.uuid4()),
+                    company_id=company_id,
+                    period_start=start,
+                    period_end=end,
+                    status="draft",
+                    created_at=_now(),
+                )
+                session.add(model)
+            refreshed = model.status == "draft"
+            if refreshed:
+                model.currency = priced.currency
+                model.subtotal = priced.subtotal
+                model.total = priced.subtotal
+                model.line_items_json = priced.line_items
+            invoice_id = model.id
+    except IntegrityError:
+        refreshed = False
+        with session_scope() as session:
+            invoice_id = _find_invoice(session, company_id, start, end).id
+    if refreshed:
+        apply_event_costs(company_id, *_bounds(start, end), priced.unit_costs)
+    logger.info("invoice_generated %s price_book=v%d", invoice_id, priced.price_book_version)
     return get_invoice(company_id, invoice_id)
 
 
+def preview_repricing(
+    period: str, plan_id: str, rates: List[Dict[str, Any]], currency: Optional[str] = None
+) -> Dict[str, Dict[str, float]]:
+    """Current and proposed totals for every company on ``plan_id`` if ``rates`` applied to ``period``.
+
+    Proposed rates that leave any of the period's usage unpriced are rejected:
+    the preview would otherwise show those units as free.
+    """
+    start, end = parse_period(period)
+    period_start, period_end = _bounds(start, end)
+    companies = sorted(company.id for company in list_companies() if company.plan_id == plan_id)
+    members = set(companies)
+    rows = [
+        (company_id, plan_id, event_type, unit, quantity)
+        for company_id, event_type, unit, quantity in rollup_breakdown(period_start, period_end)
+        if company_id in members
+    ]
+    proposed_book = compile_price_book(rates, plan_id, currency)
+    unpriced = proposed_book.unpriced(sorted({(row[2], row[3]) for row in rows}))
+    if unpriced:
+        raise SaturnError(
+            "BAD_REQUEST",
+            "Proposed rates leave usage unpriced",
+            {"unpriced": [f"{event_type}:{unit}" for event_type, unit in unpriced]},
+        )
+    current = price_by_plan(rows, {plan_id: active_price_book(plan_id, min(period_end, datetime.utcnow()))})
+    proposed = price_by_plan(rows, {plan_id: proposed_book})
+    return {
+        company_id: {"current": current.get(company_id, 0.0), "proposed": proposed.get(company_id, 0.0)}
+        for company_id in companies
+    }
+
+
 def list_invoices(company_id: str) -> List[InvoiceDraft]:
     with session_scope() as session:
         rows = session.query(InvoiceModel).filter(InvoiceModel.company_id == company_id).all()
@@ -133,3 +261,4 @@ def get_invoice(company_id: str, invoice_id: str) -> InvoiceDraft:
 def reset_invoices() -> None:
     with session_scope() as session:
         session.query(InvoiceModel).delete()
+    reset_cost_estimates()
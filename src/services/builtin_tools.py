@@ -0,0 +1,221 @@
+import multiprocessing
+import os
+import signal
+import uuid
+from dataclasses import dataclass
+from multiprocessing.pool import Pool
+from queue import Empty
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Set
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from common.metrics import set_builtin_pool_state
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+logger = get_logger("services.builtin_tools")
+
+BuiltinFunction = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+DEFAULT_BUILTIN = "echo"
+
+
+@dataclass(frozen=True)
+class BuiltinTool:
+    name: str
+    function: BuiltinFunction
+    cpu_bound: bool
+    timeout_seconds: Optional[float]
+
+
+_registry: Dict[str, BuiltinTool] = {}
+
+_pool_lock = Lock()
+_pool: Optional[Pool] = None
+_pool_workers = 0
+_pool_in_flight = 0
+# Workers report (call_id, pid) here when they start a call, so a timed-out
+# call can be stopped by killing only the worker running it.
+_call_started: Optional[Any] = None
+_call_pids: Dict[str, int] = {}
+_in_flight_calls: Set[str] = set()
+_abandoned_calls: Set[str] = set()
+_worker_call_started: Optional[Any] = None
+
+
+def register_builtin(
+    name: str,
+    function: BuiltinFunction,
+    cpu_bound: bool = False,
+    timeout_seconds: Optional[float] = None,
+) -> None:
+    """Register ``function(tool_input) -> result`` as the builtin ``name``.
+
+    CPU-bound functions run in a separate process, so they must be defined at
+    module level to be picklable.
+    """
+    _registry[name] = BuiltinTool(name, function, cpu_bound, timeout_seconds)
+
+
+def unregister_builtin(name: str) -> None:
+    _registry.pop(name, None)
+
+
+def get_builtin(name: str) -> BuiltinTool:
+    builtin = _registry.get(name)
+    if builtin is None:
+        raise SaturnError("TOOL_EXECUTION_FAILED", f"Unknown builtin tool: {name}")
+    return builtin
+
+
+def _limit_memory(limit_bytes: int) -> None:
+    if resource is None or limit_bytes <= 0:
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+
+
+def _init_worker(limit_bytes: int, call_started: Any) -> None:
+    global _worker_call_started
+    _limit_memory(limit_bytes)
+    _worker_call_started = call_started
+
+
+def _tracked_call(call_id: str, function: BuiltinFunction, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    _worker_call_started.put((call_id, os.getpid()))
+    return function(tool_input)
+
+
+def _publish_pool_state() -> None:
+    busy = min(_pool_in_flight, _pool_workers)
+    set_builtin_pool_state(_pool_workers, busy, _pool_in_flight - busy)
+
+
+def _get_pool() -> Pool:
+    global _pool, _pool_workers, _call_started
+    with _pool_lock:
+        if _pool is None:
+            settings = get_settings()
+            context = multiprocessing.get_context("spawn")
+            _pool_workers = settings.builtin_pool_workers
+            _call_started = context.Queue()
+            # multiprocessing.Pool replaces a worker that dies, so killing one
+            # leaves the other workers and their calls untouched.
+            _pool = context.Pool(
+                processes=_pool_workers,
+                initializer=_init_worker,
+                initargs=(settings.builtin_memory_limit_mb * 1024 * 1024, _call_started),
+                maxtasksperchild=settings.builtin_pool_max_tasks_per_child,
+            )
+            _publish_pool_state()
+        return _pool
+
+
+def _kill_worker(pid: int) -> None:
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except ProcessLookupError:
+        return
+    logger.info("builtin_worker_killed %d", pid)
+
+
+def _collect_started_calls() -> None:
+    """Drain worker start reports; kill workers that picked up an already abandoned call.
+
+    Caller holds ``_pool_lock``.
+    """
+    while _call_started is not None:
+        try:
+            call_id, pid = _call_started.get_nowait()
+        except Empty:
+            return
+        if call_id in _abandoned_calls:
+            _abandoned_calls.discard(call_id)
+            _kill_worker(pid)
+        elif call_id in _in_flight_calls:
+            _call_pids[call_id] = pid
+
+
+def _abandon_call(call_id: str) -> None:
+    """Stop a call that overran its timeout by killing only the worker running it.
+
+    A call still queued behind busy workers is killed as soon as a worker
+    reports picking it up.
+    """
+    with _pool_lock:
+        _collect_started_calls()
+        pid = _call_pids.pop(call_id, None)
+        if pid is None:
+            _abandoned_calls.add(call_id)
+    if pid is not None:
+        _kill_worker(pid)
+
+
+def _run_in_pool(builtin: BuiltinTool, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    global _pool_in_flight
+    timeout = builtin.timeout_seconds or get_settings().builtin_timeout_seconds
+    pool = _get_pool()
+    call_id = uuid.uuid4().hex
+    with _pool_lock:
+        _pool_in_flight += 1
+        _in_flight_calls.add(call_id)
+        _publish_pool_state()
+    try:
+        pending = pool.apply_async(_tracked_call, (call_id, builtin.function, tool_input))
+        return pending.get(timeout=timeout)
+    except multiprocessing.TimeoutError as exc:
+        # A worker that crashed is replaced by the pool; its call surfaces here too.
+        _abandon_call(call_id)
+        raise SaturnError(
+            "TOOL_EXECUTION_FAILED", "Builtin tool timed out", {"timeout_seconds": timeout}
+        ) from exc
+    except MemoryError as exc:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "Builtin tool exceeded memory limit") from exc
+    finally:
+        with _pool_lock:
+            _pool_in_flight -= 1
+            _in_flight_calls.discard(call_id)
+            _call_pids.pop(call_id, None)
+            _collect_started_calls()
+            _publish_pool_state()
+
+
+def execute_builtin(config: Dict[str, Any], tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    builtin = get_builtin(config.get("builtin", DEFAULT_BUILTIN))
+    try:
+        if builtin.cpu_bound:
+            result = _run_in_pool(builtin, tool_input)
+        else:
+            result = builtin.function(tool_input)
+    except SaturnError:
+        raise
+    except Exception as exc:
+        logger.error("builtin_failed %s", builtin.name, exc_info=exc)
+        raise SaturnError("TOOL_EXECUTION_FAILED", "Builtin tool failed", {"error": type(exc).__name__}) from exc
+    logger.info("builtin_executed %s", builtin.name)
+    return result
+
+
+def close_builtin_pool() -> None:
+    global _pool, _call_started
+    with _pool_lock:
+        pool, _pool = _pool, None
+        call_started, _call_started = _call_started, None
+        _call_pids.clear()
+        _abandoned_calls.clear()
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    if call_started is not None:
+        call_started.close()
+
+
+def _echo(tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    return {"status": "ok", "echo": tool_input}
+
+
+register_builtin(DEFAULT_BUILTIN, _echo)
@@ -1,11 +1,12 @@
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 
 from common.errors import SaturnError
 from db.session import session_scope
 from models.core import Company as CompanyModel
+from services.spend_counters import QUOTA_KEYS, update_quota
 
 
 @dataclass
@@ -46,3 +47,19 @@ def list_companies() -> List[CompanyRecord]:
         CompanyRecord(id=row.id, name=row.name, plan_id=row.plan_id or "", status=row.status)
         for row in rows
     ]
+
+
+def set_company_quota(company_id: str, quota: Dict[str, float]) -> Dict[str, float]:
+    """Replace the company's monthly limits; an empty dict removes them."""
+    unknown = sorted(set(quota) - set(QUOTA_KEYS))
+    if unknown:
+        raise SaturnError("BAD_REQUEST", "Unknown quota keys", {"keys": unknown})
+    if any(limit < 0 for limit in quota.values()):
+        raise SaturnError("BAD_REQUEST", "Quota limits must be non-negative")
+    with session_scope() as session:
+        row = session.query(CompanyModel).filter(CompanyModel.id == company_id).first()
+        if not row:
+            raise SaturnError("TENANT_NOT_FOUND")
+        row.quota_json = dict(quota) or None
+    update_quota(company_id, quota)
+    return dict(quota)
@@ -0,0 +1,45 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Optional, Tuple
+
+EstimateKey = Tuple[str, str]
+
+_lock = Lock()
+_entries: "OrderedDict[EstimateKey, Tuple[float, Any]]" = OrderedDict()
+
+
+def lookup_estimate(company_id: str, period: str) -> Optional[Any]:
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get((company_id, period))
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _entries[(company_id, period)]
+            return None
+        _entries.move_to_end((company_id, period))
+        return entry[1]
+
+
+def store_estimate(company_id: str, period: str, estimate: Any, ttl_seconds: float, max_entries: int) -> None:
+    """Cache ``estimate``, evicting the least recently used entries beyond ``max_entries``."""
+    if ttl_seconds <= 0 or max_entries <= 0:
+        return
+    with _lock:
+        _entries[(company_id, period)] = (time.monotonic() + ttl_seconds, estimate)
+        _entries.move_to_end((company_id, period))
+        while len(_entries) > max_entries:
+            _entries.popitem(last=False)
+
+
+def invalidate_estimates(company_id: str) -> None:
+    """Drop every cached period of ``company_id``; called whenever its usage changes."""
+    with _lock:
+        for key in [key for key in _entries if key[0] == company_id]:
+            del _entries[key]
+
+
+def reset_cost_estimates() -> None:
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import AuditLog as AuditLogModel
+from models.core import UsageEvent as UsageEventModel
+
+logger = get_logger("services.export")
+
+USAGE = "usage"
+AUDIT = "audit"
+NDJSON = "ndjson"
+CSV = "csv"
+
+_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    USAGE: ("id", "company_id", "agent_id", "session_id", "event_type", "quantity", "unit", "cost", "created_at"),
+    AUDIT: (
+        "id",
+        "company_id",
+        "actor_type",
+        "actor_id",
+        "action",
+        "resource_type",
+        "resource_id",
+        "metadata_json",
+        "created_at",
+    ),
+}
+_MODELS = {USAGE: UsageEventModel, AUDIT: AuditLogModel}
+MEDIA_TYPES = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """ISO date or datetime as naive UTC; ``None`` passes through."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise SaturnError("BAD_REQUEST", "Timestamps must be ISO 8601") from exc
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def iter_export_rows(
+    kind: str,
+    company_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[str] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield a company's usage or audit rows ordered by ``(created_at, id)``.
+
+    Rows are read in keyset pages of ``batch_size``: each page is a fresh
+    ``WHERE (created_at, id) > last`` query on its own short session, so no
+    transaction or cursor stays open while a slow client drains the response
+    and memory stays flat at one page however large the export is. For audit
+    logs, ``agent_id`` selects the entries whose resource is that agent.
+    """
+    model = _MODELS[kind]
+    columns = [getattr(model, name) for name in _COLUMNS[kind]]
+    batch_size = batch_size or get_settings().export_batch_size
+    last: Optional[Tuple[datetime, str]] = None
+    while True:
+        with session_scope() as session:
+            query = session.query(*columns).filter(model.company_id == company_id)
+            if start is not None:
+                query = query.filter(model.created_at >= start)
+            if end is not None:
+                query = query.filter(model.created_at < end)
+            if agent_id and kind == USAGE:
+                query = query.filter(model.agent_id == agent_id)
+            elif agent_id:
+                query = query.filter(model.resource_type == "agent", model.resource_id == agent_id)
+            if last is not None:
+                query = query.filter(
+                    or_(model.created_at > last[0], and_(model.created_at == last[0], model.id > last[1]))
+                )
+            rows = [row._asdict() for row in query.order_by(model.created_at, model.id).limit(batch_size)]
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def _jsonable(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def ndjson_chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for row in rows:
+        yield (json.dumps(_jsonable(row), separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def csv_chunks(rows: Iterable[Dict[str, Any]], columns: Iterable[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(columns))
+    writer.writeheader()
+    for row in rows:
+        row = _jsonable(row)
+        if isinstance(row.get("metadata_json"), dict):
+            row["metadata_json"] = json.dumps(row["metadata_json"], separators=(",", ":"))
+        writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _batched(chunks: Iterable[bytes], size: int = 64 * 1024) -> Iterator[bytes]:
+    pending: List[bytes] = []
+    length = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(pending)
+            pending, length = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream into a single gzip member as it is produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(
+    kind: str,
+    fmt: str,
+    company_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[str] = None,
+    compress: bool = True,
+) -> Iterator[bytes]:
+    """The encoded (and optionally gzip'd) export body, produced lazily in ~64 KiB chunks."""
+    if fmt not in MEDIA_TYPES:
+        raise SaturnError("BAD_REQUEST", "Export format must be ndjson or csv")
+    if start is not None and end is not None and start >= end:
+        raise SaturnError("BAD_REQUEST", "Export start must be before end")
+    rows = iter_export_rows(kind, company_id, start, end, agent_id)
+    encoded = ndjson_chunks(rows) if fmt == NDJSON else csv_chunks(rows, _COLUMNS[kind])
+    logger.info("export_started %s %s %s", kind, fmt, company_id)
+    body = _batched(encoded)
+    return gzip_chunks(body) if compress else body
@@ -0,0 +1,231 @@
+import ipaddress
+import json
+import re
+import socket
+from threading import BoundedSemaphore, Lock
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+
+logger = get_logger("services.http_tools")
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z0-9_.]+)\}")
+_BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+DEFAULT_TIMEOUT_SECONDS = 10.0
+DEFAULT_MAX_RESPONSE_BYTES = 1024 * 1024
+
+_client_lock = Lock()
+_client: Optional[httpx.Client] = None
+_host_slots: Dict[str, BoundedSemaphore] = {}
+
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                settings = get_settings()
+                _client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=settings.http_tool_max_connections,
+                        max_keepalive_connections=settings.http_tool_max_connections,
+                    ),
+                    follow_redirects=False,
+                )
+    return _client
+
+
+def _host_slot(host: str) -> BoundedSemaphore:
+    slot = _host_slots.get(host)
+    if slot is None:
+        with _client_lock:
+            slot = _host_slots.get(host)
+            if slot is None:
+                slot = BoundedSemaphore(get_settings().http_tool_max_per_host)
+                _host_slots[host] = slot
+    return slot
+
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _host_slots.clear()
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _operator_allowed(host: str, addresses: List[str], allowed: List[str]) -> bool:
+    for entry in allowed:
+        if entry == host:
+            return True
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            continue
+        if addresses and all(ipaddress.ip_address(address.split("%", 1)[0]) in network for address in addresses):
+            return True
+    return False
+
+
+def _check_destination(url: str) -> str:
+    """Return the host of ``url`` once it is safe to call from inside the platform.
+
+    Tool URLs are tenant configuration, so every address the host resolves to
+    must be public: loopback, private, link-local (cloud metadata), shared and
+    reserved ranges are refused unless the host, or a network containing all of
+    its addresses, is listed in ``SATURN_HTTP_TOOL_ALLOWED_HOSTS``.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool url must be an absolute http(s) url")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError) as exc:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool host cannot be resolved", {"host": host}) from exc
+    addresses = sorted({info[4][0] for info in infos})
+    if _operator_allowed(host, addresses, get_settings().http_tool_allowed_hosts):
+        return host
+    if not addresses or not all(_is_public(address) for address in addresses):
+        logger.warning("http_tool_destination_blocked %s", host)
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool host is not allowed", {"host": host})
+    return host
+
+
+def _lookup(values: Dict[str, Any], path: str) -> Any:
+    current: Any = values
+    for part in path.split("."):
+        if not isinstance(current, dict) or part not in current:
+            raise SaturnError("TOOL_EXECUTION_FAILED", f"Missing template value: {path}")
+        current = current[part]
+    return current
+
+
+def _render_string(template: str, values: Dict[str, Any], url_encode: bool = False) -> Any:
+    whole = _PLACEHOLDER.fullmatch(template)
+    if whole and not url_encode:
+        return _lookup(values, whole.group(1))
+
+    def _substitute(match: "re.Match[str]") -> str:
+        value = _lookup(values, match.group(1))
+        text = value if isinstance(value, str) else json.dumps(value)
+        return quote(text, safe="") if url_encode else text
+
+    return _PLACEHOLDER.sub(_substitute, template)
+
+
+def _render(template: Any, values: Dict[str, Any]) -> Any:
+    if isinstance(template, str):
+        return _render_string(template, values)
+    if isinstance(template, dict):
+        return {key: _render(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_render(item, values) for item in template]
+    return template
+
+
+def _read_capped(response: httpx.Response, max_bytes: int, truncate: bool) -> bytes:
+    declared = response.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes and not truncate:
+        raise SaturnError(
+            "TOOL_EXECUTION_FAILED",
+            "Tool response exceeds size limit",
+            {"max_response_bytes": max_bytes},
+        )
+    buffer = bytearray()
+    for chunk in response.iter_bytes():
+        remaining = max_bytes - len(buffer)
+        if len(chunk) > remaining:
+            if not truncate:
+                raise SaturnError(
+                    "TOOL_EXECUTION_FAILED",
+                    "Tool response exceeds size limit",
+                    {"max_response_bytes": max_bytes},
+                )
+            buffer.extend(chunk[:remaining])
+            break
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def _decode_body(raw: bytes, content_type: str) -> Any:
+    text = raw.decode("utf-8", errors="replace")
+    if "json" in content_type:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+    return text
+
+
+def execute_http_tool(config: Dict[str, Any], tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    """Call the endpoint described by an ``http`` tool's ``config_json``.
+
+    Supported config keys: ``url`` and ``headers`` (``{field}`` placeholders are
+    filled from the tool input), ``method``, ``query``, ``body``,
+    ``timeout_seconds``, ``max_response_bytes`` and ``truncate_response``.
+    Only public destinations are called (see ``_check_destination``) and
+    redirects are never followed.
+    """
+    url_template = config.get("url")
+    if not url_template:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool has no url configured")
+    method = str(config.get("method", "POST")).upper()
+    url = _render_string(url_template, tool_input, url_encode=True)
+    headers = {key: str(value) for key, value in _render(config.get("headers") or {}, tool_input).items()}
+    params = _render(config["query"], tool_input) if "query" in config else None
+    body = _render(config["body"], tool_input) if "body" in config else tool_input
+    if method not in _BODY_METHODS:
+        if params is None and "body" not in config:
+            params = tool_input
+        body = None
+    timeout = float(config.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS))
+    max_bytes = int(config.get("max_response_bytes", DEFAULT_MAX_RESPONSE_BYTES))
+    truncate = bool(config.get("truncate_response", False))
+
+    _check_destination(url)
+    host = urlsplit(url).netloc
+    slot = _host_slot(host)
+    if not slot.acquire(timeout=timeout):
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool host is saturated", {"host": host})
+    try:
+        with _get_client().stream(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            json=body,
+            timeout=timeout,
+        ) as response:
+            raw = _read_capped(response, max_bytes, truncate)
+            status_code = response.status_code
+            content_type = response.headers.get("content-type", "")
+    except httpx.TimeoutException as exc:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool timed out", {"timeout_seconds": timeout}) from exc
+    except httpx.HTTPError as exc:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "HTTP tool request failed") from exc
+    finally:
+        slot.release()
+    logger.info("http_tool_call %s %s %s", method, host, status_code)
+    if status_code >= 400:
+        raise SaturnError(
+            "TOOL_EXECUTION_FAILED",
+            "HTTP tool returned an error status",
+            {"status_code": status_code},
+        )
+    return {"status": "ok", "status_code": status_code, "body": _decode_body(raw, content_type)}
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import IdempotencyKey as IdempotencyKeyModel
+
+logger = get_logger("services.idempotency")
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+_POLL_INTERVAL_SECONDS = 0.05
+_WAIT_TIMEOUT_SECONDS = 30.0
+
+
+def request_fingerprint(method: str, path: str, payload: Optional[Dict[str, Any]]) -> str:
+    body = json.dumps(payload or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{method.upper()} {path}\n{body}".encode("utf-8")).hexdigest()
+
+
+def _new_lease(now: datetime) -> datetime:
+    # Whole seconds: the lease doubles as the owner token and MySQL DATETIME drops microseconds.
+    return (now + timedelta(seconds=get_settings().idempotency_lock_seconds)).replace(microsecond=0)
+
+
+def _key_filter(company_id: str, key: str):
+    return IdempotencyKeyModel.company_id == company_id, IdempotencyKeyModel.key == key
+
+
+def _take_over(session, company_id: str, key: str, row: IdempotencyKeyModel, lease: datetime) -> bool:
+    """Move an expired lease to the caller; only one of several concurrent retries wins."""
+    held = (
+        IdempotencyKeyModel.locked_until.is_(None)
+        if row.locked_until is None
+        else IdempotencyKeyModel.locked_until == row.locked_until
+    )
+    taken = (
+        session.query(IdempotencyKeyModel)
+        .filter(*_key_filter(company_id, key), IdempotencyKeyModel.status == IN_PROGRESS, held)
+        .update({"locked_until": lease}, synchronize_session=False)
+    )
+    return taken == 1
+
+
+def _claim(company_id: str, key: str, request_hash: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[datetime]]:
+    """Return ``("claimed", None, lease)`` when the caller now owns the key, otherwise the stored state.
+
+    An in-progress key whose ``locked_until`` has passed belongs to a request
+    that crashed or stalled; the first retry to swap the lease takes it over
+    instead of waiting out the whole TTL.
+    """
+    now = datetime.utcnow()
+    lease = _new_lease(now)
+    try:
+        with session_scope() as session:
+            row = session.query(IdempotencyKeyModel).filter(*_key_filter(company_id, key)).first()
+            if row and row.expires_at > now:
+                if row.request_hash != request_hash:
+                    raise SaturnError(
+                        "IDEMPOTENCY_CONFLICT",
+                        "Idempotency key was used with a different request",
+                        {"idempotency_key": key},
+                    )
+                if row.status == IN_PROGRESS and (row.locked_until is None or row.locked_until <= now):
+                    if _take_over(session, company_id, key, row, lease):
+                        logger.warning("idempotency_lease_taken_over %s", key)
+                        return "claimed", None, lease
+                    return IN_PROGRESS, None, None
+                return row.status, row.response_json, None
+            if row:
+                session.delete(row)
+                session.flush()
+            session.add(
+                IdempotencyKeyModel(
+                    company_id=company_id,
+                    key=key,
+                    request_hash=request_hash,
+                    status=IN_PROGRESS,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=get_settings().idempotency_ttl_seconds),
+                    locked_until=lease,
+                )
+            )
+    except IntegrityError:
+        return IN_PROGRESS, None, None
+    return "claimed", None, lease
+
+
+def _owned(company_id: str, key: str, lease: datetime):
+    return (
+        *_key_filter(company_id, key),
+        IdempotencyKeyModel.status == IN_PROGRESS,
+        IdempotencyKeyModel.locked_until == lease,
+    )
+
+
+def _complete(company_id: str, key: str, lease: datetime, response: Dict[str, Any]) -> None:
+    with session_scope() as session:
+        stored = (
+            session.query(IdempotencyKeyModel)
+            .filter(*_owned(company_id, key, lease))
+            .update({"status": COMPLETED, "response_json": response, "locked_until": None})
+        )
+    if not stored:
+        logger.warning("idempotency_lease_lost %s", key)
+
+
+def _release(company_id: str, key: str, lease: datetime) -> None:
+    with session_scope() as session:
+        session.query(IdempotencyKeyModel).filter(*_owned(company_id, key, lease)).delete()
+
+
+def run_idempotent(
+    company_id: str,
+    key: Optional[str],
+    request_hash: str,
+    handler: Callable[[], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Run ``handler`` at most once per (company_id, key) within the TTL.
+
+    Repeats receive the stored response. A repeat arriving while the first request
+    is still running waits for it to finish, or takes over once its lease
+    (``SATURN_IDEMPOTENCY_LOCK_SECONDS``) has expired. Failed requests release
+    the key so the client can retry.
+    """
+    if not key:
+        return handler()
+    deadline = time.monotonic() + _WAIT_TIMEOUT_SECONDS
+    while True:
+        state, response, lease = _claim(company_id, key, request_hash)
+        if state == "claimed":
+            break
+        if state == COMPLETED:
+            logger.info("idempotent_replay %s", key)
+            return response or {}
+        if time.monotonic() >= deadline:
+            raise SaturnError(
+                "IDEMPOTENCY_CONFLICT",
+                "Request with this idempotency key is still in progress",
+                {"idempotency_key": key},
+            )
+        time.sleep(_POLL_INTERVAL_SECONDS)
+    try:
+        response = handler()
+    except Exception:
+        _release(company_id, key, lease)
+        raise
+    _complete(company_id, key, lease, response)
+    return response
+
+
+def purge_expired_keys() -> int:
+    with session_scope() as session:
+        return (
+            session.query(IdempotencyKeyModel)
+            .filter(IdempotencyKeyModel.expires_at <= datetime.utcnow())
+            .delete()
+        )
+
+
+class _KeyPurger:
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._stop = Event()
+        self._thread = Thread(target=self._loop, name="saturn-idempotency-purge", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                purged = purge_expired_keys()
+                if purged:
+                    logger.info("idempotency_keys_purged %d", purged)
+            except Exception as exc:
+                logger.error("idempotency_purge_failed", exc_info=exc)
+
+
+_purger: Optional[_KeyPurger] = None
+
+
+def start_key_purger() -> None:
+    """Delete expired keys every ``idempotency_purge_interval_seconds``."""
+    global _purger
+    if _purger is not None:
+        return
+    _purger = _KeyPurger(get_settings().idempotency_purge_interval_seconds)
+    _purger.start()
+
+
+def stop_key_purger() -> None:
+    global _purger
+    purger, _purger = _purger, None
+    if purger is not None:
+        purger.stop()
+
+
+def reset_idempotency_keys() -> None:
+    with session_scope() as session:
+        session.query(IdempotencyKeyModel).delete()
@@ -0,0 +1,283 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Condition
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import retry_on_locked, session_scope
+from models.core import Job as JobModel
+
+logger = get_logger("services.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+DEAD = "dead"
+TERMINAL_STATUSES = (SUCCEEDED, DEAD)
+
+_MAX_BACKOFF_SECONDS = 300
+
+_job_events = Condition()
+
+
+@dataclass
+class JobRecord:
+    id: str
+    company_id: str
+    tool_id: str
+    status: str
+    input: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error_message: Optional[str]
+    attempts: int
+    max_attempts: int
+    created_at: str
+    updated_at: str
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+def _to_record(model: JobModel) -> JobRecord:
+    return JobRecord(
+        id=model.id,
+        company_id=model.company_id,
+        tool_id=model.tool_id,
+        status=model.status,
+        input=model.input_json or {},
+        result=model.result_json,
+        error_message=model.error_message,
+        attempts=model.attempts,
+        max_attempts=model.max_attempts,
+        created_at=model.created_at.isoformat(),
+        updated_at=model.updated_at.isoformat(),
+    )
+
+
+def _notify() -> None:
+    with _job_events:
+        _job_events.notify_all()
+
+
+def enqueue_job(
+    company_id: str, tool_id: str, job_input: Dict[str, Any], max_attempts: Optional[int] = None
+) -> JobRecord:
+    job_id = str(uuid.uuid4())
+    now = _now()
+    with session_scope() as session:
+        model = JobModel(
+            id=job_id,
+            company_id=company_id,
+            tool_id=tool_id,
+            status=QUEUED,
+            input_json=job_input,
+            attempts=0,
+            max_attempts=max_attempts or get_settings().job_max_attempts,
+            run_after=now,
+            created_at=now,
+            updated_at=now,
+        )
+        session.add(model)
+        record = _to_record(model)
+    logger.info("job_enqueued %s %s", job_id, tool_id)
+    return record
+
+
+def get_job(company_id: str, job_id: str) -> JobRecord:
+    with session_scope() as session:
+        row = (
+            session.query(JobModel)
+            .filter(JobModel.company_id == company_id, JobModel.id == job_id)
+            .first()
+        )
+        if not row:
+            raise SaturnError("NOT_FOUND", "Job not found")
+        return _to_record(row)
+
+
+def wait_for_job(company_id: str, job_id: str, timeout_seconds: float) -> JobRecord:
+    """Long-poll until the job reaches a terminal state or ``timeout_seconds`` elapse."""
+    deadline = _now() + timedelta(seconds=timeout_seconds)
+    poll = get_settings().job_poll_interval_seconds
+    record = get_job(company_id, job_id)
+    while record.status not in TERMINAL_STATUSES:
+        remaining = (deadline - _now()).total_seconds()
+        if remaining <= 0:
+            break
+        with _job_events:
+            _job_events.wait(timeout=min(poll, remaining))
+        record = get_job(company_id, job_id)
+    return record
+
+
+def _lease_expired(now: datetime):
+    return (JobModel.status == RUNNING) & (JobModel.lease_expires_at < now)
+
+
+def _claimable(now: datetime):
+    return or_(
+        (JobModel.status == QUEUED) & (JobModel.run_after <= now),
+        _lease_expired(now) & (JobModel.attempts < JobModel.max_attempts),
+    )
+
+
+def _dead_letter_abandoned(session, now: datetime) -> int:
+    """Dead-letter running jobs whose lease expired on their last allowed attempt.
+
+    A worker that crashes mid-job never calls ``fail_job``; without this the
+    job would be retried past ``max_attempts`` or left running forever.
+    """
+    return (
+        session.query(JobModel)
+        .filter(_lease_expired(now), JobModel.attempts >= JobModel.max_attempts)
+        .update(
+            {
+                "status": DEAD,
+                "error_message": "Lease expired on the final attempt",
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "updated_at": now,
+            },
+            synchronize_session=False,
+        )
+    )
+
+
+@retry_on_locked
+def claim_jobs(worker_id: str, limit: int) -> List[JobRecord]:
+    """Lease up to ``limit`` runnable jobs for ``worker_id``.
+
+    MySQL uses ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers never
+    block on each other. SQLite has no row locks, so each candidate is claimed
+    with a conditional UPDATE on the lease columns and skipped if another worker
+    won the race. Running jobs whose lease expired are reclaimed on both while
+    they have attempts left, and dead-lettered otherwise.
+    """
+    now = _now()
+    lease_until = now + timedelta(seconds=get_settings().job_lease_seconds)
+    lease = {
+        "status": RUNNING,
+        "lease_owner": worker_id,
+        "lease_expires_at": lease_until,
+        "heartbeat_at": now,
+        "attempts": JobModel.attempts + 1,
+        "updated_at": now,
+    }
+    claimed: List[JobRecord] = []
+    with session_scope() as session:
+        abandoned = _dead_letter_abandoned(session, now)
+        query = session.query(JobModel).filter(_claimable(now)).order_by(JobModel.run_after).limit(limit)
+        if session.get_bind().dialect.name == "mysql":
+            rows = query.with_for_update(skip_locked=True).all()
+            ids = [row.id for row in rows]
+            if ids:
+                session.query(JobModel).filter(JobModel.id.in_(ids)).update(lease, synchronize_session=False)
+        else:
+            ids = []
+            for row in query.all():
+                updated = (
+                    session.query(JobModel)
+                    .filter(JobModel.id == row.id, _claimable(now))
+                    .update(lease, synchronize_session=False)
+                )
+                if updated:
+                    ids.append(row.id)
+        if ids:
+            session.expire_all()
+            rows = session.query(JobModel).filter(JobModel.id.in_(ids)).all()
+            claimed = [_to_record(row) for row in rows]
+    if abandoned:
+        logger.info("jobs_dead_lettered_on_lease_expiry %d", abandoned)
+        _notify()
+    for record in claimed:
+        logger.info("job_claimed %s %s", record.id, worker_id)
+    return claimed
+
+
+def heartbeat(job_ids: List[str], worker_id: str) -> None:
+    if not job_ids:
+        return
+    now = _now()
+    with session_scope() as session:
+        session.query(JobModel).filter(
+            JobModel.id.in_(job_ids),
+            JobModel.lease_owner == worker_id,
+            JobModel.status == RUNNING,
+        ).update(
+            {
+                "heartbeat_at": now,
+                "lease_expires_at": now + timedelta(seconds=get_settings().job_lease_seconds),
+            },
+            synchronize_session=False,
+        )
+
+
+def complete_job(job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+    """Record the result; False when ``worker_id`` lost the lease and another worker owns the job."""
+    now = _now()
+    with session_scope() as session:
+        updated = session.query(JobModel).filter(JobModel.id == job_id, JobModel.lease_owner == worker_id).update(
+            {
+                "status": SUCCEEDED,
+                "result_json": result,
+                "error_message": None,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "updated_at": now,
+            },
+            synchronize_session=False,
+        )
+    if not updated:
+        logger.warning("job_lease_lost %s %s", job_id, worker_id)
+        return False
+    logger.info("job_succeeded %s", job_id)
+    _notify()
+    return True
+
+
+def fail_job(job_id: str, worker_id: str, error_message: str) -> Optional[str]:
+    """Record a failed attempt; requeue with backoff or dead-letter when attempts run out."""
+    now = _now()
+    with session_scope() as session:
+        row = (
+            session.query(JobModel)
+            .filter(JobModel.id == job_id, JobModel.lease_owner == worker_id)
+            .first()
+        )
+        if not row:
+            logger.warning("job_lease_lost %s %s", job_id, worker_id)
+            return None
+        if row.attempts >= row.max_attempts:
+            row.status = DEAD
+        else:
+            row.status = QUEUED
+            row.run_after = now + timedelta(seconds=min(2 ** row.attempts, _MAX_BACKOFF_SECONDS))
+        row.error_message = error_message
+        row.lease_owner = None
+        row.lease_expires_at = None
+        row.updated_at = now
+        status = row.status
+    logger.info("job_failed %s %s", job_id, status)
+    _notify()
+    return status
+
+
+def list_dead_jobs(company_id: str) -> List[JobRecord]:
+    with session_scope() as session:
+        rows = (
+            session.query(JobModel)
+            .filter(JobModel.company_id == company_id, JobModel.status == DEAD)
+            .all()
+        )
+        return [_to_record(row) for row in rows]
+
+
+def reset_jobs() -> None:
+    with session_scope() as session:
+        session.query(JobModel).delete()
@@ -0,0 +1,167 @@
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Optional, Set
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from services.http_tool_runtime import execute_http_tool
+from services.job_service import JobRecord, claim_jobs, complete_job, fail_job, heartbeat
+from services.tool_service import get_tool
+
+logger = get_logger("services.job_worker")
+
+WorkflowHandler = Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+_handlers: Dict[str, WorkflowHandler] = {}
+
+
+def register_workflow(name: str, handler: WorkflowHandler) -> None:
+    """Register ``handler(job_input, tool_config)`` for tools whose config names ``workflow``."""
+    _handlers[name] = handler
+
+
+def unregister_workflow(name: str) -> None:
+    _handlers.pop(name, None)
+
+
+def run_workflow(config: Dict[str, Any], job_input: Dict[str, Any]) -> Dict[str, Any]:
+    name = config.get("workflow")
+    if name:
+        handler = _handlers.get(name)
+        if handler is None:
+            raise SaturnError("TOOL_EXECUTION_FAILED", f"Unknown workflow: {name}")
+        return handler(job_input, config)
+    if config.get("url"):
+        return execute_http_tool(config, job_input)
+    raise SaturnError("TOOL_EXECUTION_FAILED", "Workflow tool has no workflow or url configured")
+
+
+class JobWorker:
+    """Claims workflow jobs and runs them on a bounded thread pool.
+
+    A poll loop leases as many jobs as there are free slots, and a heartbeat loop
+    extends the lease of every in-flight job so that only jobs of crashed workers
+    are ever reclaimed.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None):
+        settings = get_settings()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency or settings.job_worker_concurrency
+        self._poll_interval = settings.job_poll_interval_seconds
+        self._heartbeat_interval = max(settings.job_lease_seconds / 3, 0.1)
+        self._in_flight: Set[str] = set()
+        self._lock = Lock()
+        self._stop = Event()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._threads = []
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="saturn-job")
+        self._threads = [
+            Thread(target=self._poll_loop, name="saturn-job-poll", daemon=True),
+            Thread(target=self._heartbeat_loop, name="saturn-job-heartbeat", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("job_worker_started %s", self.worker_id)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        logger.info("job_worker_stopped %s", self.worker_id)
+
+    def run_once(self) -> int:
+        """Claim and run one batch of jobs in the calling thread; returns the number run."""
+        jobs = claim_jobs(self.worker_id, self.concurrency)
+        for job in jobs:
+            self._track(job.id)
+            self._run(job)
+        return len(jobs)
+
+    def _free_slots(self) -> int:
+        with self._lock:
+            return self.concurrency - len(self._in_flight)
+
+    def _track(self, job_id: str) -> None:
+        with self._lock:
+            self._in_flight.add(job_id)
+
+    def _poll_loop(self) -> None:
+        while not self._stop.is_set():
+            jobs = []
+            free = self._free_slots()
+            if free > 0:
+                try:
+                    jobs = claim_jobs(self.worker_id, free)
+                except Exception as exc:
+                    logger.error("job_claim_failed", exc_info=exc)
+            for job in jobs:
+                self._track(job.id)
+                self._pool.submit(self._run, job)
+            if not jobs:
+                self._stop.wait(self._poll_interval)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self._heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._in_flight)
+            try:
+                heartbeat(job_ids, self.worker_id)
+            except Exception as exc:
+                logger.error("job_heartbeat_failed", exc_info=exc)
+
+    def _run(self, job: JobRecord) -> None:
+        try:
+            tool = get_tool(job.company_id, job.tool_id)
+            result = run_workflow(tool.config, job.input)
+        except Exception as exc:
+            message = exc.message if isinstance(exc, SaturnError) else str(exc) or type(exc).__name__
+            logger.error("job_attempt_failed %s", job.id, exc_info=exc)
+            fail_job(job.id, self.worker_id, message)
+        else:
+            complete_job(job.id, self.worker_id, result)
+        finally:
+            with self._lock:
+                self._in_flight.discard(job.id)
+
+
+_worker: Optional[JobWorker] = None
+
+
+def start_worker() -> None:
+    global _worker
+    if _worker is None:
+        _worker = JobWorker()
+        _worker.start()
+
+
+def stop_worker() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+
+def main() -> None:
+    worker = JobWorker()
+    worker.start()
+    try:
+        Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
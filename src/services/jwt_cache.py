@@ -0,0 +1,43 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+from common.auth import AuthContext
+
+_lock = Lock()
+_entries: "OrderedDict[str, Tuple[float, AuthContext]]" = OrderedDict()
+
+
+def lookup_token(digest: str) -> Optional[AuthContext]:
+    """The context of a token verified earlier, unless it has expired since."""
+    now = time.time()
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _entries[digest]
+            return None
+        _entries.move_to_end(digest)
+        return entry[1]
+
+
+def store_token(digest: str, auth: AuthContext, expires_at: float, max_entries: int) -> None:
+    if max_entries <= 0 or expires_at <= time.time():
+        return
+    with _lock:
+        _entries[digest] = (expires_at, auth)
+        _entries.move_to_end(digest)
+        while len(_entries) > max_entries:
+            _entries.popitem(last=False)
+
+
+def token_cache_size() -> int:
+    with _lock:
+        return len(_entries)
+
+
+def reset_token_cache() -> None:
+    with _lock:
+        _entries.clear()
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from common.logging import get_logger
 from common.metrics import record_llm_call
@@ -19,7 +19,7 @@ class LlmResponse:
     usage: LlmUsage
 
 
-def call_llm(messages: List[Dict], model_config: Dict) -> LlmResponse:
+def call_llm(messages: List[Dict], model_config: Dict, tools: Optional[List[Dict]] = None) -> LlmResponse:
     last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
     reply = f"Echo: {last_user}"
     tokens_in = max(1, len(last_user.split()))
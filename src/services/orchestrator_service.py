@@ -6,6 +6,8 @@ from services.agent_service import get_agent
 from services.kb_service import retrieve
 from services.llm_provider import call_llm
 from services.session_service import add_message, create_session, get_session, list_messages
+from services.spend_counters import check_budget
+from services.tool_service import get_tool_manifest
 from services.usage_service import record_usage_event
 
 logger = get_logger("services.orchestrator")
@@ -19,6 +21,7 @@ def execute_turn(
     metadata: Optional[Dict],
     actor: AuthContext,
 ) -> Tuple[str, str, Dict, List[Dict[str, str]]]:
+    check_budget(company_id)
     agent = get_agent(company_id, agent_id)
     metadata = metadata or {}
     if session_id:
@@ -40,7 +43,8 @@ def execute_turn(
                 llm_input.append({"role": "system", "content": citation["snippet"]})
         record_usage_event(company_id, agent_id, session_id, "kb_query", 1, "calls")
         did_kb_query = True
-    response = call_llm(llm_input, agent.model_config)
+    manifest = get_tool_manifest(company_id, agent_id, agent.version)
+    response = call_llm(llm_input, agent.model_config, tools=manifest.functions or None)
     add_message(company_id, session_id, "assistant", response.content)
     record_usage_event(company_id, agent_id, session_id, "llm_tokens_in", response.usage.tokens_in, "tokens")
     record_usage_event(company_id, agent_id, session_id, "llm_tokens_out", response.usage.tokens_out, "tokens")
@@ -0,0 +1,240 @@
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import PriceBook as PriceBookModel
+
+logger = get_logger("services.pricing")
+
+FLAT = "flat"
+TIERED = "tiered"
+VOLUME = "volume"
+
+DEFAULT_PLAN = "default"
+DEFAULT_RATES: List[Dict[str, Any]] = [
+    {"unit": "tokens", "mode": FLAT, "price": 0.000002},
+    {"unit": "calls", "mode": FLAT, "price": 0.01},
+    {"unit": "seconds", "mode": FLAT, "price": 0.02},
+]
+
+UsageKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class PriceBookRecord:
+    id: str
+    plan_id: str
+    version: int
+    currency: str
+    rates: List[Dict[str, Any]]
+    effective_from: str
+
+
+@dataclass(frozen=True)
+class _Rate:
+    event_type: Optional[str]
+    unit: str
+    mode: str
+    included: float
+    lower: np.ndarray
+    upper: np.ndarray
+    prices: np.ndarray
+
+    def amounts(self, quantities: np.ndarray) -> np.ndarray:
+        billable = np.maximum(quantities - self.included, 0.0)
+        if self.mode == FLAT:
+            return billable * self.prices[0]
+        if self.mode == VOLUME:
+            tier = np.searchsorted(self.upper, billable, side="left")
+            return billable * self.prices[np.minimum(tier, len(self.prices) - 1)]
+        in_tier = np.clip(billable[:, None] - self.lower[None, :], 0.0, (self.upper - self.lower)[None, :])
+        return in_tier @ self.prices
+
+
+class CompiledPriceBook:
+    """A price book turned into NumPy tier arrays.
+
+    ``price`` takes usage aggregated by ``(event_type, unit)`` and prices all rows
+    sharing a rate in one array operation, so repricing thousands of tenants is
+    a handful of vector ops per rate rather than a Python loop per row.
+    """
+
+    def __init__(self, record: PriceBookRecord):
+        self.record = record
+        self._rates = [_compile_rate(spec) for spec in record.rates]
+        self._by_event = {(rate.event_type, rate.unit): index for index, rate in enumerate(self._rates)}
+
+    @property
+    def currency(self) -> str:
+        return self.record.currency
+
+    def rate_index(self, event_type: str, unit: str) -> int:
+        index = self._by_event.get((event_type, unit))
+        if index is None:
+            index = self._by_event.get((None, unit), -1)
+        return index
+
+    def unpriced(self, keys: Iterable[UsageKey]) -> List[UsageKey]:
+        """The keys no rate covers; ``price`` returns 0 for them, so callers must flag them."""
+        return [key for key in keys if self.rate_index(*key) < 0]
+
+    def price(self, keys: Sequence[UsageKey], quantities: Sequence[float]) -> np.ndarray:
+        quantities = np.asarray(quantities, dtype=float)
+        indexes = np.fromiter((self.rate_index(*key) for key in keys), dtype=int, count=len(keys))
+        amounts = np.zeros(len(quantities))
+        for index, rate in enumerate(self._rates):
+            mask = indexes == index
+            if mask.any():
+                amounts[mask] = rate.amounts(quantities[mask])
+        return amounts
+
+
+def _invalid(message: str) -> SaturnError:
+    return SaturnError("BAD_REQUEST", f"Invalid price book: {message}")
+
+
+def _compile_rate(spec: Dict[str, Any]) -> _Rate:
+    unit = spec.get("unit")
+    if not unit:
+        raise _invalid("every rate needs a unit")
+    mode = spec.get("mode", FLAT)
+    included = float(spec.get("included", 0))
+    if mode == FLAT:
+        if "price" not in spec:
+            raise _invalid(f"flat rate for {unit} needs a price")
+        tiers = [{"up_to": None, "price": spec["price"]}]
+    elif mode in (TIERED, VOLUME):
+        tiers = spec.get("tiers") or []
+        if not tiers:
+            raise _invalid(f"{mode} rate for {unit} needs tiers")
+    else:
+        raise _invalid(f"unknown mode {mode}")
+    upper = np.array([np.inf if tier.get("up_to") is None else float(tier["up_to"]) for tier in tiers])
+    if np.any(np.diff(upper) <= 0) or not np.isinf(upper[-1]):
+        raise _invalid(f"tiers for {unit} must ascend and end with an open tier")
+    return _Rate(
+        event_type=spec.get("event_type"),
+        unit=unit,
+        mode=mode,
+        included=included,
+        lower=np.concatenate(([0.0], upper[:-1])),
+        upper=upper,
+        prices=np.array([float(tier["price"]) for tier in tiers]),
+    )
+
+
+def compile_price_book(
+    rates: List[Dict[str, Any]], plan_id: str = DEFAULT_PLAN, currency: Optional[str] = None
+) -> CompiledPriceBook:
+    record = PriceBookRecord(
+        id="",
+        plan_id=plan_id,
+        version=0,
+        currency=currency or get_settings().billing_currency,
+        rates=rates,
+        effective_from="",
+    )
+    return CompiledPriceBook(record)
+
+
+def _to_record(model: PriceBookModel) -> PriceBookRecord:
+    return PriceBookRecord(
+        id=model.id,
+        plan_id=model.plan_id,
+        version=model.version,
+        currency=model.currency,
+        rates=model.rates_json,
+        effective_from=model.effective_from.isoformat(),
+    )
+
+
+_compiled_lock = Lock()
+_compiled: Dict[str, CompiledPriceBook] = {}
+
+
+def create_price_book(
+    plan_id: str,
+    rates: List[Dict[str, Any]],
+    currency: Optional[str] = None,
+    effective_from: Optional[datetime] = None,
+) -> PriceBookRecord:
+    """Store the next version of ``plan_id``'s price book; earlier versions stay for history."""
+    compile_price_book(rates, plan_id, currency)
+    with session_scope() as session:
+        latest = (
+            session.query(PriceBookModel.version)
+            .filter(PriceBookModel.plan_id == plan_id)
+            .order_by(PriceBookModel.version.desc())
+            .first()
+        )
+        model = PriceBookModel(
+            id=str(uuid.uuid4()),
+            plan_id=plan_id,
+            version=(latest.version if latest else 0) + 1,
+            currency=currency or get_settings().billing_currency,
+            rates_json=rates,
+            effective_from=effective_from or datetime.utcnow(),
+            created_at=datetime.utcnow(),
+        )
+        session.add(model)
+        record = _to_record(model)
+    logger.info("price_book_created %s v%d", plan_id, record.version)
+    return record
+
+
+def active_price_book(plan_id: Optional[str], at: Optional[datetime] = None) -> CompiledPriceBook:
+    """Latest version of the plan's book in effect at ``at``; the built-in default if none."""
+    at = at or datetime.utcnow()
+    with session_scope() as session:
+        model = (
+            session.query(PriceBookModel)
+            .filter(PriceBookModel.plan_id == (plan_id or DEFAULT_PLAN), PriceBookModel.effective_from <= at)
+            .order_by(PriceBookModel.version.desc())
+            .first()
+        )
+        record = _to_record(model) if model else None
+    if record is None:
+        return compile_price_book(DEFAULT_RATES)
+    with _compiled_lock:
+        book = _compiled.get(record.id)
+        if book is None:
+            book = CompiledPriceBook(record)
+            _compiled[record.id] = book
+        return book
+
+
+def price_by_plan(
+    rows: Sequence[Tuple[str, str, str, str, float]],
+    books: Dict[str, CompiledPriceBook],
+) -> Dict[str, float]:
+    """Total cost per company for ``(company_id, plan_id, event_type, unit, quantity)`` rows."""
+    grouped: Dict[str, List[Tuple[str, str, str, float]]] = defaultdict(list)
+    for company_id, plan_id, event_type, unit, quantity in rows:
+        grouped[plan_id].append((company_id, event_type, unit, quantity))
+    totals: Dict[str, float] = defaultdict(float)
+    for plan_id, plan_rows in grouped.items():
+        book = books.get(plan_id)
+        if book is None:
+            continue
+        companies = np.array([row[0] for row in plan_rows])
+        amounts = book.price([(row[1], row[2]) for row in plan_rows], [row[3] for row in plan_rows])
+        names, inverse = np.unique(companies, return_inverse=True)
+        for company_id, total in zip(names, np.bincount(inverse, weights=amounts)):
+            totals[str(company_id)] = round(float(total), 2)
+    return dict(totals)
+
+
+def reset_price_books() -> None:
+    with session_scope() as session:
+        session.query(PriceBookModel).delete()
+    with _compiled_lock:
+        _compiled.clear()
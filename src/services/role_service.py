@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Dict, List
 
 from common.errors import SaturnError
+from common.rbac import compile_permissions, invalidate_roles, role_patterns
 from db.session import session_scope
 from models.core import Role as RoleModel
 from models.core import UserRole as UserRoleModel
@@ -18,6 +19,7 @@ class RoleRecord:
 
 
 def create_role(company_id: str, name: str, permissions: Dict) -> RoleRecord:
+    compile_permissions(role_patterns(permissions))
     role_id = str(uuid.uuid4())
     with session_scope() as session:
         session.add(
@@ -29,9 +31,39 @@ def create_role(company_id: str, name: str, permissions: Dict) -> RoleRecord:
                 created_at=datetime.utcnow(),
             )
         )
+    invalidate_roles(company_id)
     return get_role(company_id, role_id)
 
 
+def update_role(company_id: str, role_id: str, permissions: Dict) -> RoleRecord:
+    compile_permissions(role_patterns(permissions))
+    with session_scope() as session:
+        updated = (
+            session.query(RoleModel)
+            .filter(RoleModel.company_id == company_id, RoleModel.id == role_id)
+            .update({"permissions": permissions})
+        )
+    if not updated:
+        raise SaturnError("NOT_FOUND", "Role not found")
+    invalidate_roles(company_id)
+    return get_role(company_id, role_id)
+
+
+def delete_role(company_id: str, role_id: str) -> None:
+    with session_scope() as session:
+        session.query(UserRoleModel).filter(
+            UserRoleModel.company_id == company_id, UserRoleModel.role_id == role_id
+        ).delete()
+        deleted = (
+            session.query(RoleModel)
+            .filter(RoleModel.company_id == company_id, RoleModel.id == role_id)
+            .delete()
+        )
+    if not deleted:
+        raise SaturnError("NOT_FOUND", "Role not found")
+    invalidate_roles(company_id)
+
+
 def get_role(company_id: str, role_id: str) -> RoleRecord:
     with session_scope() as session:
         row = (
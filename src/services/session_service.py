@@ -3,9 +3,11 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import List, Optional
 
+from sqlalchemy import Select, select
+
 from common.errors import SaturnError
 from common.logging import get_logger
-from db.session import session_scope
+from db.session import retry_on_locked, session_scope
 from models.core import ChatSession as ChatSessionModel
 from models.core import Message as MessageModel
 
@@ -38,100 +40,114 @@ def _now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _session_model(
+    company_id: str, agent_id: str, user_external_id: Optional[str], channel: str
+) -> ChatSessionModel:
+    return ChatSessionModel(
+        id=str(uuid.uuid4()),
+        company_id=company_id,
+        agent_id=agent_id,
+        user_external_id=user_external_id,
+        channel=channel,
+        state="open",
+        started_at=_now(),
+    )
+
+
+def _session_query(company_id: str, session_id: str, agent_id: Optional[str]) -> Select:
+    query = select(ChatSessionModel).where(
+        ChatSessionModel.company_id == company_id,
+        ChatSessionModel.id == session_id,
+    )
+    if agent_id:
+        query = query.where(ChatSessionModel.agent_id == agent_id)
+    return query
+
+
+def _to_session(row: Optional[ChatSessionModel]) -> ChatSession:
+    if not row:
+        raise SaturnError("SESSION_NOT_FOUND")
+    return ChatSession(
+        id=row.id,
+        company_id=row.company_id,
+        agent_id=row.agent_id,
+        user_external_id=row.user_external_id,
+        channel=row.channel,
+        state=row.state,
+        started_at=row.started_at.isoformat(),
+        ended_at=row.ended_at.isoformat() if row.ended_at else None,
+    )
+
+
+def _message_model(company_id: str, session_id: str, role: str, content: str) -> MessageModel:
+    return MessageModel(
+        id=str(uuid.uuid4()),
+        company_id=company_id,
+        session_id=session_id,
+        role=role,
+        content=content,
+        created_at=_now(),
+    )
+
+
+def _messages_query(company_id: str, session_id: str, limit: int) -> Select:
+    return (
+        select(MessageModel)
+        .where(
+            MessageModel.company_id == company_id,
+            MessageModel.session_id == session_id,
+        )
+        .order_by(MessageModel.created_at.desc())
+        .limit(limit)
+    )
+
+
+def _to_message(row: MessageModel) -> Message:
+    return Message(
+        id=row.id,
+        company_id=row.company_id,
+        session_id=row.session_id,
+        role=row.role,
+        content=row.content or "",
+        created_at=row.created_at.isoformat(),
+    )
+
+
 def create_session(
     company_id: str,
     agent_id: str,
     user_external_id: Optional[str],
     channel: str,
 ) -> ChatSession:
-    session_id = str(uuid.uuid4())
+    model = _session_model(company_id, agent_id, user_external_id, channel)
     with session_scope() as session:
-        session.add(
-            ChatSessionModel(
-                id=session_id,
-                company_id=company_id,
-                agent_id=agent_id,
-                user_external_id=user_external_id,
-                channel=channel,
-                state="open",
-                started_at=_now(),
-            )
-        )
-    logger.info("session_created %s", session_id)
-    return get_session(company_id, session_id)
+        session.add(model)
+    logger.info("session_created %s", model.id)
+    return get_session(company_id, model.id)
+
 
 
 def get_session(company_id: str, session_id: str, agent_id: Optional[str] = None) -> ChatSession:
     with session_scope() as session:
-        query = session.query(ChatSessionModel).filter(
-            ChatSessionModel.company_id == company_id,
-            ChatSessionModel.id == session_id,
-        )
-        if agent_id:
-            query = query.filter(ChatSessionModel.agent_id == agent_id)
-        row = query.first()
-        if not row:
-            raise SaturnError("SESSION_NOT_FOUND")
-        return ChatSession(
-            id=row.id,
-            company_id=row.company_id,
-            agent_id=row.agent_id,
-            user_external_id=row.user_external_id,
-            channel=row.channel,
-            state=row.state,
-            started_at=row.started_at.isoformat(),
-            ended_at=row.ended_at.isoformat() if row.ended_at else None,
-        )
+        return _to_session(session.scalars(_session_query(company_id, session_id, agent_id)).first())
 
 
+
+@retry_on_locked
 def add_message(company_id: str, session_id: str, role: str, content: str) -> Message:
-    message_id = str(uuid.uuid4())
+    model = _message_model(company_id, session_id, role, content)
     with session_scope() as session:
-        session.add(
-            MessageModel(
-                id=message_id,
-                company_id=company_id,
-                session_id=session_id,
-                role=role,
-                content=content,
-                created_at=_now(),
-            )
-        )
+        session.add(model)
     logger.info("message_added %s %s", session_id, role)
-    return Message(
-        id=message_id,
-        company_id=company_id,
-        session_id=session_id,
-        role=role,
-        content=content,
-        created_at=_now().isoformat(),
-    )
+    return _to_message(model)
+
 
 
 def list_messages(company_id: str, session_id: str, limit: int = 20) -> List[Message]:
     with session_scope() as session:
-        rows = (
-            session.query(MessageModel)
-            .filter(
-                MessageModel.company_id == company_id,
-                MessageModel.session_id == session_id,
-            )
-            .order_by(MessageModel.created_at.desc())
-            .limit(limit)
-            .all()
-        )
-    rows.reverse()
-    return [
-        Message(
-            id=row.id,
-            company_id=row.company_id,
-            session_id=row.session_id,
-            role=row.role,
-            content=row.content or "",
-            created_at=row.created_at.isoformat(),
-        )
-        for row in rows
-    ]
+        rows = session.scalars(_messages_query(company_id, session_id, limit)).all()
+    return [_to_message(row) for row in reversed(rows)]
+
 
 
 def reset_sessions() -> None:
@@ -0,0 +1,435 @@
+from dataclasses import dataclass
+from datetime import datetime
+from contextlib import contextmanager
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import Company as CompanyModel
+from models.core import UsageEvent as UsageEventModel
+from services.pricing import CompiledPriceBook, active_price_book
+from services.usage_rollups import rollup_breakdown
+
+logger = get_logger("services.spend_counters")
+
+QUOTA_KEYS = ("tokens", "calls", "seconds", "cost")
+
+CounterKey = Tuple[str, str]
+UsageKey = Tuple[str, str]
+
+# Bound on the ids per ``IN`` lookup, under SQLite's bound-parameter limit.
+_ID_BATCH = 500
+
+
+@dataclass
+class SpendSnapshot:
+    company_id: str
+    period: str
+    tokens: float
+    calls: float
+    seconds: float
+    estimated_cost: float
+    quota: Dict[str, float]
+    remaining: Dict[str, float]
+    reconciled_at: str
+
+
+def period_of(value: datetime) -> str:
+    return f"{value.year}-{value.month:02d}"
+
+
+def _period_bounds(period: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(period, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+class _Counter:
+    """Running usage of one company in one period; guarded by the module lock."""
+
+    def __init__(self, quantities: Dict[Tuple[str, str], float], quota: Dict[str, float], book: CompiledPriceBook):
+        self.quantities = quantities
+        self.quota = quota
+        self.book = book
+        self.reconciled_at = datetime.utcnow()
+        self._cost: Optional[float] = None
+
+    def add(self, event_type: str, unit: str, quantity: float) -> None:
+        key = (event_type, unit)
+        self.quantities[key] = self.quantities.get(key, 0.0) + quantity
+        self._cost = None
+
+    def unit_total(self, unit: str) -> float:
+        return sum(quantity for (_, key_unit), quantity in self.quantities.items() if key_unit == unit)
+
+    def cost(self) -> float:
+        if self._cost is None:
+            keys = list(self.quantities)
+            amounts = self.book.price(keys, [self.quantities[key] for key in keys])
+            self._cost = round(float(amounts.sum()), 2)
+        return self._cost
+
+    def used(self, name: str) -> float:
+        return self.cost() if name == "cost" else self.unit_total(name)
+
+    def unpriced(self) -> List[UsageKey]:
+        return self.book.unpriced(key for key, quantity in self.quantities.items() if quantity > 0)
+
+    def exceeded(self) -> Optional[str]:
+        for name, limit in self.quota.items():
+            if self.used(name) >= limit:
+                return name
+        return None
+
+
+class _CommitGate:
+    """Lets usage inserts commit concurrently, but not while a counter load reads the database.
+
+    A row is registered in ``_pending`` before its insert commits. With commits
+    held off, a load sees every pending row either committed (in the rollups it
+    read) or not, never half-way, so it can add the uncommitted ones back exactly once.
+    """
+
+    def __init__(self):
+        self._condition = Condition()
+        self._committing = 0
+        self._loading = False
+
+    @contextmanager
+    def commit(self) -> Iterator[None]:
+        with self._condition:
+            while self._loading:
+                self._condition.wait()
+            self._committing += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._committing -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def load(self) -> Iterator[None]:
+        with self._condition:
+            while self._loading or self._committing:
+                self._condition.wait()
+            self._loading = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._loading = False
+                self._condition.notify_all()
+
+
+_lock = Lock()
+_counters: Dict[CounterKey, _Counter] = {}
+# Rows counted in memory but not known to be in the rollups: id -> (counter key, usage key, quantity).
+_pending: Dict[str, Tuple[CounterKey, UsageKey, float]] = {}
+_loads_in_progress = 0
+_confirmed_during_load: Set[str] = set()
+_gate = _CommitGate()
+
+
+def usage_commit():
+    """Hold around the commit of usage rows; see ``_CommitGate``."""
+    return _gate.commit()
+
+
+def _read_terms(keys: Set[CounterKey]) -> Dict[CounterKey, Tuple[Dict[str, float], CompiledPriceBook]]:
+    """Quota and price book per counter: one company query per batch, one book per plan and period."""
+    company_ids = sorted({key[0] for key in keys})
+    companies: Dict[str, Tuple[Optional[str], Dict[str, float]]] = {}
+    with session_scope() as session:
+        for offset in range(0, len(company_ids), _ID_BATCH):
+            rows = session.query(CompanyModel.id, CompanyModel.plan_id, CompanyModel.quota_json).filter(
+                CompanyModel.id.in_(company_ids[offset : offset + _ID_BATCH])
+            )
+            companies.update((row.id, (row.plan_id, dict(row.quota_json or {}))) for row in rows)
+    books: Dict[Tuple[Optional[str], str], CompiledPriceBook] = {}
+    terms = {}
+    for company_id, period in keys:
+        plan_id, quota = companies.get(company_id, (None, {}))
+        book = books.get((plan_id, period))
+        if book is None:
+            _, end = _period_bounds(period)
+            book = books[(plan_id, period)] = active_price_book(plan_id, min(end, datetime.utcnow()))
+        terms[(company_id, period)] = (quota, book)
+    return terms
+
+
+def _read_usage(keys: Set[CounterKey]) -> Dict[CounterKey, Dict[UsageKey, float]]:
+    """Rolled-up usage per counter: one grouped rollup query per period, for all its companies."""
+    usage: Dict[CounterKey, Dict[UsageKey, float]] = {key: {} for key in keys}
+    for period in {key[1] for key in keys}:
+        start, end = _period_bounds(period)
+        company_ids = {company_id for company_id, key_period in keys if key_period == period}
+        only = next(iter(company_ids)) if len(company_ids) == 1 else None
+        for company_id, event_type, unit, quantity in rollup_breakdown(start, end, only):
+            quantities = usage.get((company_id, period))
+            if quantities is not None:
+                quantities[(event_type, unit)] = quantity
+    return usage
+
+
+def _stored_ids(ids: List[str]) -> Set[str]:
+    stored: Set[str] = set()
+    with session_scope() as session:
+        for offset in range(0, len(ids), _ID_BATCH):
+            batch = ids[offset : offset + _ID_BATCH]
+            stored.update(row.id for row in session.query(UsageEventModel.id).filter(UsageEventModel.id.in_(batch)))
+    return stored
+
+
+def _load(keys: Iterable[CounterKey], replace: bool = False) -> Dict[CounterKey, _Counter]:
+    """Read counters from the rollups plus the pending rows they do not include yet.
+
+    Quotas and price books are read first; commits are held off only for the
+    grouped rollup read and the pending-id lookup. ``replace`` swaps every held
+    counter for the loaded ones (dropping the rest); otherwise a counter loaded
+    meanwhile by another thread wins.
+    """
+    global _loads_in_progress
+    keys = set(keys)
+    terms = _read_terms(keys)
+    with _lock:
+        _loads_in_progress += 1
+    try:
+        with _gate.load():
+            with _lock:
+                candidates = [row_id for row_id, (key, _, _) in _pending.items() if key in keys]
+            usage = _read_usage(keys)
+            stored = _stored_ids(candidates)
+        loaded = {key: _Counter(usage[key], *terms[key]) for key in keys}
+        with _lock:
+            for row_id, (key, usage_key, quantity) in list(_pending.items()):
+                if key not in keys:
+                    continue
+                if row_id in stored:
+                    del _pending[row_id]
+                else:
+                    loaded[key].add(*usage_key, quantity)
+            if replace:
+                _counters.clear()
+                _counters.update(loaded)
+                return loaded
+            return {key: _counters.setdefault(key, counter) for key, counter in loaded.items()}
+    finally:
+        with _lock:
+            _loads_in_progress -= 1
+            if not _loads_in_progress:
+                # Every finished load has counted these; later loads read them from the rollups.
+                for row_id in _confirmed_during_load:
+                    _pending.pop(row_id, None)
+                _confirmed_during_load.clear()
+
+
+def _counter(company_id: str, period: str) -> _Counter:
+    key = (company_id, period)
+    with _lock:
+        counter = _counters.get(key)
+    if counter is not None:
+        return counter
+    return _load([key])[key]
+
+
+def record_spend(rows: Iterable[Dict[str, Any]]) -> None:
+    """Count usage rows that are about to be committed (or buffered).
+
+    Must run before the rows' commit so a concurrent load can tell whether they
+    are in the rollups it read. Recording the same row twice is a no-op.
+    """
+    with _lock:
+        for row in rows:
+            if row["id"] in _pending:
+                continue
+            key = (row["company_id"], period_of(row["created_at"]))
+            usage_key = (row["event_type"], row["unit"])
+            quantity = float(row["quantity"])
+            _pending[row["id"]] = (key, usage_key, quantity)
+            counter = _counters.get(key)
+            if counter is not None:
+                counter.add(*usage_key, quantity)
+
+
+def confirm_spend(rows: Iterable[Dict[str, Any]]) -> None:
+    """Forget rows whose commit finished; later loads read them from the rollups.
+
+    While a load is running the rows stay pending, so that load still counts
+    them, and are forgotten once the last running load finishes.
+    """
+    with _lock:
+        for row in rows:
+            if _loads_in_progress:
+                _confirmed_during_load.add(row["id"])
+            else:
+                _pending.pop(row["id"], None)
+
+
+def retract_spend(rows: Iterable[Dict[str, Any]]) -> None:
+    """Undo ``record_spend`` for rows whose insert failed or that were already stored."""
+    with _lock:
+        for row in rows:
+            entry = _pending.pop(row["id"], None)
+            if entry is None:
+                continue
+            counter = _counters.get(entry[0])
+            if counter is not None:
+                counter.add(*entry[1], -entry[2])
+
+
+def check_budget(company_id: str, now: Optional[datetime] = None) -> None:
+    """Raise QUOTA_EXCEEDED if the company has used up any limit of its current period.
+
+    Runs against the in-memory counter, so after the first call of a period it
+    costs a dictionary lookup plus, when a cost limit is set and usage changed,
+    one vectorized pricing call. A cost limit cannot be enforced on usage the
+    price book does not cover, so such usage fails the check rather than
+    counting as free.
+    """
+    period = period_of(now or datetime.utcnow())
+    counter = _counter(company_id, period)
+    with _lock:
+        if not counter.quota:
+            return
+        unpriced = counter.unpriced() if "cost" in counter.quota else []
+        if unpriced:
+            raise SaturnError(
+                "QUOTA_EXCEEDED",
+                "Usage without a price cannot be checked against the cost quota",
+                {"period": period, "quota": "cost", "unpriced": [f"{key[0]}:{key[1]}" for key in unpriced]},
+            )
+        exceeded = counter.exceeded()
+        if exceeded is None:
+            return
+        limit, used = counter.quota[exceeded], counter.used(exceeded)
+    raise SaturnError(
+        "QUOTA_EXCEEDED",
+        f"Monthly {exceeded} quota exhausted",
+        {"period": period, "quota": exceeded, "limit": limit, "used": used},
+    )
+
+
+def _snapshot(company_id: str, period: str, counter: _Counter) -> SpendSnapshot:
+    return SpendSnapshot(
+        company_id=company_id,
+        period=period,
+        tokens=counter.unit_total("tokens"),
+        calls=counter.unit_total("calls"),
+        seconds=counter.unit_total("seconds"),
+        estimated_cost=counter.cost(),
+        quota=dict(counter.quota),
+        remaining={name: max(limit - counter.used(name), 0.0) for name, limit in counter.quota.items()},
+        reconciled_at=counter.reconciled_at.isoformat(),
+    )
+
+
+def spend_snapshot(company_id: str, period: Optional[str] = None) -> SpendSnapshot:
+    period = period or period_of(datetime.utcnow())
+    counter = _counter(company_id, period)
+    with _lock:
+        return _snapshot(company_id, period, counter)
+
+
+def spend_snapshots() -> List[SpendSnapshot]:
+    """Every counter held in memory, for cross-tenant dashboards."""
+    with _lock:
+        return [_snapshot(key[0], key[1], counter) for key, counter in sorted(_counters.items())]
+
+
+def update_quota(company_id: str, quota: Dict[str, float]) -> None:
+    with _lock:
+        for (counter_company, _), counter in _counters.items():
+            if counter_company == company_id:
+                counter.quota = dict(quota)
+
+
+def seed_counters(now: Optional[datetime] = None) -> int:
+    """Load the current period's counter of every active company from the rollups."""
+    period = period_of(now or datetime.utcnow())
+    with session_scope() as session:
+        company_ids = [row.id for row in session.query(CompanyModel.id).filter(CompanyModel.status == "active")]
+    loaded = _load((company_id, period) for company_id in company_ids)
+    logger.info("spend_counters_seeded %s %d", period, len(loaded))
+    return len(loaded)
+
+
+def _previous_period(period: str) -> str:
+    start, _ = _period_bounds(period)
+    index = start.year * 12 + start.month - 2
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def reconcile_counters(now: Optional[datetime] = None) -> int:
+    """Replace every counter with the rollups' view and drop periods older than last month.
+
+    Corrects drift from events that reached the database without passing
+    through ``record_spend`` (other workers, rollup rebuilds, crash replays).
+    Rows recorded here but still buffered or being committed are added back, so
+    nothing counted in memory is lost. Returns the counters reconciled.
+    """
+    current = period_of(now or datetime.utcnow())
+    live = (current, _previous_period(current))
+    with _lock:
+        keys = [key for key in _counters if key[1] in live]
+    refreshed = _load(keys, replace=True)
+    with _lock:
+        for row_id, (key, _, _) in list(_pending.items()):
+            if key[1] not in live:
+                del _pending[row_id]
+    logger.info("spend_counters_reconciled %d", len(refreshed))
+    return len(refreshed)
+
+
+class _Reconciler:
+    def __init__(self, interval: float, before: Optional[Callable[[], Any]]):
+        self._interval = interval
+        self._before = before
+        self._stop = Event()
+        self._thread = Thread(target=self._loop, name="saturn-spend-reconcile", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                if self._before is not None:
+                    self._before()
+                reconcile_counters()
+            except Exception as exc:
+                logger.error("spend_counters_reconcile_failed", exc_info=exc)
+
+
+_reconciler: Optional[_Reconciler] = None
+
+
+def start_reconciler(before: Optional[Callable[[], Any]] = None) -> None:
+    """Reconcile every ``spend_reconcile_interval_seconds``; ``before`` runs first (e.g. a buffer flush)."""
+    global _reconciler
+    if _reconciler is not None:
+        return
+    _reconciler = _Reconciler(get_settings().spend_reconcile_interval_seconds, before)
+    _reconciler.start()
+
+
+def stop_reconciler() -> None:
+    global _reconciler
+    if _reconciler is None:
+        return
+    _reconciler.stop()
+    _reconciler = None
+
+
+def reset_spend_counters() -> None:
+    with _lock:
+        _counters.clear()
+        _pending.clear()
+        _confirmed_during_load.clear()
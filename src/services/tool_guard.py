@@ -0,0 +1,263 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from common.metrics import record_tool_latency
+
+logger = get_logger("services.tool_guard")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class GuardPolicy:
+    error_rate_threshold: float
+    latency_threshold_ms: float
+    min_calls: int
+    window_seconds: float
+    open_seconds: float
+    half_open_max_calls: int
+    max_concurrency: int
+    bulkhead_wait_seconds: float
+
+
+def guard_policy(config: Dict[str, Any]) -> GuardPolicy:
+    """Merge a tool's ``config.circuit_breaker`` block over the platform defaults."""
+    settings = get_settings()
+    spec = config.get("circuit_breaker") or {}
+    return GuardPolicy(
+        error_rate_threshold=float(spec.get("error_rate_threshold", settings.tool_breaker_error_rate)),
+        latency_threshold_ms=float(spec.get("latency_threshold_ms", settings.tool_breaker_latency_ms)),
+        min_calls=int(spec.get("min_calls", settings.tool_breaker_min_calls)),
+        window_seconds=float(spec.get("window_seconds", settings.tool_breaker_window_seconds)),
+        open_seconds=float(spec.get("open_seconds", settings.tool_breaker_open_seconds)),
+        half_open_max_calls=int(spec.get("half_open_max_calls", 1)),
+        max_concurrency=int(spec.get("max_concurrency", settings.tool_max_concurrency)),
+        bulkhead_wait_seconds=float(spec.get("bulkhead_wait_seconds", 0)),
+    )
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of call outcomes.
+
+    Calls slower than the latency threshold count as failures. Once the window
+    holds at least ``min_calls`` and the failure rate reaches the threshold the
+    breaker opens; after ``open_seconds`` it lets a few trial calls through and
+    closes again only if they succeed.
+    """
+
+    def __init__(self, policy: GuardPolicy):
+        self.policy = policy
+        self._lock = Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._window: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.policy.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+
+    def _trim(self, now: float) -> None:
+        horizon = now - self.policy.window_seconds
+        while self._window and self._window[0][0] < horizon:
+            _, failed = self._window.popleft()
+            if failed:
+                self._failures -= 1
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._window.clear()
+        self._failures = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            if self._state == OPEN:
+                return False
+            if self._state == HALF_OPEN:
+                if self._trials >= self.policy.half_open_max_calls:
+                    return False
+                self._trials += 1
+            return True
+
+    def cancel(self) -> None:
+        """Give back a half-open trial slot that was granted but never used."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials:
+                self._trials -= 1
+
+    def record(self, success: bool, latency_ms: float) -> None:
+        failed = not success or latency_ms > self.policy.latency_threshold_ms
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._window.clear()
+                    self._failures = 0
+                return
+            if self._state == OPEN:
+                return
+            self._window.append((now, failed))
+            if failed:
+                self._failures += 1
+            self._trim(now)
+            calls = len(self._window)
+            if calls >= self.policy.min_calls and self._failures / calls >= self.policy.error_rate_threshold:
+                self._open(now)
+
+
+class Bulkhead:
+    """A concurrency limit that can be changed while calls hold slots.
+
+    Lowering the limit never interrupts running calls; new calls wait until
+    enough of them have finished.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._in_use = 0
+        self._released = Condition(Lock())
+
+    @property
+    def in_use(self) -> int:
+        with self._released:
+            return self._in_use
+
+    def resize(self, limit: int) -> None:
+        with self._released:
+            self._limit = limit
+            self._released.notify_all()
+
+    def acquire(self, timeout: float = 0) -> bool:
+        with self._released:
+            if timeout > 0:
+                self._released.wait_for(lambda: self._in_use < self._limit, timeout)
+            if self._in_use >= self._limit:
+                return False
+            self._in_use += 1
+            return True
+
+    def release(self) -> None:
+        with self._released:
+            self._in_use -= 1
+            self._released.notify()
+
+
+class ToolGuard:
+    def __init__(self, policy: GuardPolicy):
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy)
+        self.bulkhead = Bulkhead(policy.max_concurrency)
+
+    def update(self, policy: GuardPolicy) -> None:
+        """Apply a changed policy without losing breaker state or bulkhead slots in use."""
+        self.policy = policy
+        self.breaker.policy = policy
+        self.bulkhead.resize(policy.max_concurrency)
+
+
+_lock = Lock()
+_guards: Dict[Tuple[str, str], ToolGuard] = {}
+
+
+def _get_guard(company_id: str, tool_id: str, policy: GuardPolicy) -> ToolGuard:
+    key = (company_id, tool_id)
+    with _lock:
+        guard = _guards.get(key)
+        if guard is None:
+            guard = ToolGuard(policy)
+            _guards[key] = guard
+        elif guard.policy != policy:
+            guard.update(policy)
+        return guard
+
+
+def _is_failure(exc: BaseException) -> bool:
+    return not isinstance(exc, SaturnError) or exc.code == "TOOL_EXECUTION_FAILED"
+
+
+def guarded_call(company_id: str, tool_id: str, config: Dict[str, Any], call: Callable[[], Any]) -> Any:
+    """Run ``call`` behind the tool's bulkhead and circuit breaker."""
+    policy = guard_policy(config)
+    guard = _get_guard(company_id, tool_id, policy)
+    wait = policy.bulkhead_wait_seconds
+    if not guard.bulkhead.acquire(timeout=wait):
+        raise SaturnError(
+            "TOOL_EXECUTION_FAILED",
+            "Tool concurrency limit reached",
+            {"max_concurrency": policy.max_concurrency},
+        )
+    try:
+        if not guard.breaker.allow():
+            raise SaturnError("TOOL_EXECUTION_FAILED", "Tool circuit is open", {"breaker_state": OPEN})
+        start = time.perf_counter()
+        try:
+            result = call()
+        except BaseException as exc:
+            latency_ms = (time.perf_counter() - start) * 1000
+            record_tool_latency(tool_id, latency_ms)
+            if _is_failure(exc):
+                guard.breaker.record(False, latency_ms)
+            else:
+                guard.breaker.cancel()
+            raise
+        latency_ms = (time.perf_counter() - start) * 1000
+        record_tool_latency(tool_id, latency_ms)
+        before = guard.breaker.state
+        guard.breaker.record(True, latency_ms)
+        if before != CLOSED or guard.breaker.state != CLOSED:
+            logger.info("tool_breaker %s %s", tool_id, guard.breaker.state)
+        return result
+    finally:
+        guard.bulkhead.release()
+
+
+def breaker_state(company_id: str, tool_id: str) -> Optional[str]:
+    with _lock:
+        guard = _guards.get((company_id, tool_id))
+    return guard.breaker.state if guard else None
+
+
+def breaker_states() -> Dict[str, Dict[str, str]]:
+    """Per-tool breaker states across tenants; for platform admins only."""
+    with _lock:
+        guards = list(_guards.items())
+    return {
+        tool_id: {"company_id": company_id, "state": guard.breaker.state} for (company_id, tool_id), guard in guards
+    }
+
+
+def breaker_state_counts() -> Dict[str, int]:
+    """How many tool breakers are in each state, without naming tenants or tools."""
+    counts = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+    with _lock:
+        guards = list(_guards.values())
+    for guard in guards:
+        counts[guard.breaker.state] += 1
+    return counts
+
+
+def reset_tool_guards() -> None:
+    with _lock:
+        _guards.clear()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from common.errors import SaturnError
+from services.tool_schema import Validator
+
+ManifestKey = Tuple[str, str]
+
+_MAX_MANIFESTS = 1024
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    tool_id: str
+    tool_version: int
+    name: str
+    function_name: str
+    policy: Optional[Dict[str, Any]]
+    spec: Dict[str, Any]
+    validate: Validator
+
+
+@dataclass(frozen=True)
+class ToolManifest:
+    """Everything a turn needs about an agent's tools, built once per attachment set."""
+
+    company_id: str
+    agent_id: str
+    agent_version: int
+    fingerprint: str
+    entries: Tuple[ManifestEntry, ...]
+    functions: List[Dict[str, Any]]
+    # Every attached tool, inactive ones included, so re-enabling one invalidates the manifest.
+    attached_tool_ids: FrozenSet[str]
+    _by_function: Dict[str, ManifestEntry] = field(repr=False)
+
+    def entry(self, function_name: str) -> Optional[ManifestEntry]:
+        return self._by_function.get(function_name)
+
+    def tool_ids(self) -> List[str]:
+        return [entry.tool_id for entry in self.entries]
+
+
+def function_name(tool_name: str) -> str:
+    """Provider function names only allow ``[a-zA-Z0-9_-]`` up to 64 characters."""
+    return _INVALID_NAME_CHARS.sub("_", tool_name)[:64]
+
+
+def check_function_names(tools: Iterable[Tuple[str, str]]) -> None:
+    """Reject ``(tool_id, tool_name)`` pairs whose names map to the same function name.
+
+    The model calls tools by function name, so two such tools on one agent
+    would make one of them unreachable.
+    """
+    owners: Dict[str, str] = {}
+    for tool_id, tool_name in tools:
+        name = function_name(tool_name)
+        other = owners.setdefault(name, tool_id)
+        if other != tool_id:
+            raise SaturnError(
+                "BAD_REQUEST",
+                "Attached tools must have distinct function names",
+                {"function_name": name, "tool_ids": sorted([other, tool_id])},
+            )
+
+
+def function_spec(name: str, description: str, input_schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "function": {"name": name, "description": description, "parameters": input_schema},
+    }
+
+
+def build_manifest(
+    company_id: str,
+    agent_id: str,
+    agent_version: int,
+    entries: List[ManifestEntry],
+    attached_tool_ids: Iterable[str] = (),
+) -> ToolManifest:
+    check_function_names((entry.tool_id, entry.name) for entry in entries)
+    entries = sorted(entries, key=lambda entry: entry.function_name)
+    stamp = [[entry.tool_id, entry.tool_version, entry.policy] for entry in entries]
+    fingerprint = hashlib.sha256(json.dumps(stamp, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return ToolManifest(
+        company_id=company_id,
+        agent_id=agent_id,
+        agent_version=agent_version,
+        fingerprint=fingerprint[:16],
+        entries=tuple(entries),
+        functions=[entry.spec for entry in entries],
+        attached_tool_ids=frozenset(attached_tool_ids) | {entry.tool_id for entry in entries},
+        _by_function={entry.function_name: entry for entry in entries},
+    )
+
+
+_lock = Lock()
+_manifests: "OrderedDict[ManifestKey, ToolManifest]" = OrderedDict()
+
+
+def cached_manifest(company_id: str, agent_id: str, agent_version: int) -> Optional[ToolManifest]:
+    key = (company_id, agent_id)
+    with _lock:
+        manifest = _manifests.get(key)
+        if manifest is None or manifest.agent_version != agent_version:
+            return None
+        _manifests.move_to_end(key)
+        return manifest
+
+
+def store_manifest(manifest: ToolManifest) -> None:
+    with _lock:
+        _manifests[(manifest.company_id, manifest.agent_id)] = manifest
+        _manifests.move_to_end((manifest.company_id, manifest.agent_id))
+        while len(_manifests) > _MAX_MANIFESTS:
+            _manifests.popitem(last=False)
+
+
+def invalidate_agent_manifest(company_id: str, agent_id: str) -> None:
+    with _lock:
+        _manifests.pop((company_id, agent_id), None)
+
+
+def invalidate_tool_manifests(company_id: str, tool_id: str) -> None:
+    """Drop every manifest of ``company_id`` for an agent ``tool_id`` is attached to, active or not."""
+    with _lock:
+        stale = [
+            key
+            for key, manifest in _manifests.items()
+            if key[0] == company_id and tool_id in manifest.attached_tool_ids
+        ]
+        for key in stale:
+            del _manifests[key]
+
+
+def reset_tool_manifests() -> None:
+    with _lock:
+        _manifests.clear()
@@ -0,0 +1,114 @@
+import copy
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.metrics import record_tool_cache
+
+CacheKey = Tuple[str, int, str]
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl_seconds: float
+    key_fields: Optional[List[str]]
+
+
+_lock = Lock()
+_entries: Dict[str, "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]"] = {}
+_total_entries = 0
+
+
+def cache_policy(config: Dict[str, Any]) -> Optional[CachePolicy]:
+    """Read the ``cache`` block of a tool config, e.g. ``{"ttl_seconds": 60, "key_fields": ["sku"]}``."""
+    spec = config.get("cache")
+    if not spec:
+        return None
+    try:
+        ttl = float(spec.get("ttl_seconds", 0))
+    except (TypeError, ValueError, AttributeError) as exc:
+        raise SaturnError("TOOL_EXECUTION_FAILED", "Invalid tool cache config") from exc
+    if ttl <= 0:
+        return None
+    key_fields = spec.get("key_fields")
+    return CachePolicy(ttl_seconds=ttl, key_fields=list(key_fields) if key_fields is not None else None)
+
+
+def cache_key(tool_id: str, tool_version: int, policy: CachePolicy, tool_input: Dict[str, Any]) -> CacheKey:
+    if policy.key_fields is not None:
+        tool_input = {field: tool_input.get(field) for field in policy.key_fields}
+    canonical = json.dumps(tool_input, sort_keys=True, separators=(",", ":"), default=str)
+    return tool_id, tool_version, canonical
+
+
+def lookup(company_id: str, key: CacheKey) -> Optional[Dict[str, Any]]:
+    global _total_entries
+    now = time.monotonic()
+    with _lock:
+        bucket = _entries.get(company_id)
+        entry = bucket.get(key) if bucket else None
+        if entry is not None and entry[0] <= now:
+            del bucket[key]
+            _total_entries -= 1
+            entry = None
+        if entry is not None:
+            bucket.move_to_end(key)
+    record_tool_cache(entry is not None)
+    return copy.deepcopy(entry[1]) if entry is not None else None
+
+
+def _evict_oldest(company_id: str) -> None:
+    global _total_entries
+    bucket = _entries[company_id]
+    bucket.popitem(last=False)
+    _total_entries -= 1
+    if not bucket:
+        del _entries[company_id]
+
+
+def store(company_id: str, key: CacheKey, result: Dict[str, Any], ttl_seconds: float) -> None:
+    global _total_entries
+    settings = get_settings()
+    value = copy.deepcopy(result)
+    with _lock:
+        bucket = _entries.setdefault(company_id, OrderedDict())
+        if key in bucket:
+            _total_entries -= 1
+        bucket[key] = (time.monotonic() + ttl_seconds, value)
+        bucket.move_to_end(key)
+        _total_entries += 1
+        while len(bucket) > settings.tool_cache_max_entries_per_company:
+            _evict_oldest(company_id)
+        while _total_entries > settings.tool_cache_max_entries:
+            largest = max(_entries, key=lambda company: len(_entries[company]))
+            _evict_oldest(largest)
+
+
+def invalidate_tool(company_id: str, tool_id: str) -> None:
+    global _total_entries
+    with _lock:
+        bucket = _entries.get(company_id)
+        if not bucket:
+            return
+        for key in [key for key in bucket if key[0] == tool_id]:
+            del bucket[key]
+            _total_entries -= 1
+
+
+def cache_size(company_id: Optional[str] = None) -> int:
+    with _lock:
+        if company_id is None:
+            return _total_entries
+        return len(_entries.get(company_id, ()))
+
+
+def reset_tool_result_cache() -> None:
+    global _total_entries
+    with _lock:
+        _entries.clear()
+        _total_entries = 0
@@ -0,0 +1,395 @@
+import math
+import re
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from urllib.parse import urlsplit
+
+from common.errors import SaturnError
+
+Check = Callable[[Any, str], None]
+Validator = Callable[[Any], None]
+
+ROOT_PATH = "$"
+
+_CACHE_SIZE = 1024
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+_cache_lock = Lock()
+_cache: "OrderedDict[Hashable, Validator]" = OrderedDict()
+
+
+def _fail(path: str, keyword: str, message: str) -> None:
+    raise SaturnError("TOOL_SCHEMA_INVALID", message, {"path": path, "keyword": keyword})
+
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda value: isinstance(value, str),
+    "integer": _is_integer,
+    "number": _is_number,
+    "boolean": lambda value: isinstance(value, bool),
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "null": lambda value: value is None,
+}
+
+
+def _valid_datetime(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    return "T" in value or " " in value
+
+
+def _valid_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _valid_uri(value: str) -> bool:
+    parts = urlsplit(value)
+    return bool(parts.scheme and (parts.netloc or parts.path))
+
+
+def _valid_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+_FORMAT_CHECKS: Dict[str, Callable[[str], bool]] = {
+    "date-time": _valid_datetime,
+    "date": _valid_date,
+    "email": lambda value: bool(_EMAIL.match(value)),
+    "uri": _valid_uri,
+    "uuid": _valid_uuid,
+}
+
+
+def _accept(value: Any, path: str) -> None:
+    return None
+
+
+def _reject(value: Any, path: str) -> None:
+    _fail(path, "false", f"Value not allowed at: {path}")
+
+
+class _Compiler:
+    """Turns one schema document into a tree of check closures."""
+
+    def __init__(self, root: Dict[str, Any]):
+        self._root = root
+        self._refs: Dict[str, Check] = {}
+
+    def compile(self, schema: Any) -> Check:
+        if schema is True:
+            return _accept
+        if schema is False:
+            return _reject
+        if not isinstance(schema, dict):
+            raise SaturnError("TOOL_SCHEMA_INVALID", "Schema must be an object")
+        if "$ref" in schema:
+            return self._compile_ref(schema["$ref"])
+        checks: List[Check] = []
+        if "type" in schema:
+            checks.append(self._compile_type(schema["type"]))
+        if "enum" in schema:
+            checks.append(self._compile_enum(schema["enum"]))
+        if "const" in schema:
+            checks.append(self._compile_const(schema["const"]))
+        checks.extend(self._compile_string(schema))
+        checks.extend(self._compile_number(schema))
+        checks.extend(self._compile_object(schema))
+        checks.extend(self._compile_array(schema))
+        checks.extend(self._compile_combinators(schema))
+        if not checks:
+            return _accept
+        if len(checks) == 1:
+            return checks[0]
+        checks_tuple = tuple(checks)
+
+        def _all(value: Any, path: str) -> None:
+            for check in checks_tuple:
+                check(value, path)
+
+        return _all
+
+    def _compile_ref(self, ref: str) -> Check:
+        if ref in self._refs:
+            return self._refs[ref]
+        if not ref.startswith("#/"):
+            raise SaturnError("TOOL_SCHEMA_INVALID", f"Unsupported $ref: {ref}")
+        target: Any = self._root
+        for part in ref[2:].split("/"):
+            if not isinstance(target, dict) or part not in target:
+                raise SaturnError("TOOL_SCHEMA_INVALID", f"Unresolvable $ref: {ref}")
+            target = target[part]
+        resolved: List[Check] = []
+
+        def _deferred(value: Any, path: str) -> None:
+            resolved[0](value, path)
+
+        self._refs[ref] = _deferred
+        resolved.append(self.compile(target))
+        return _deferred
+
+    def _compile_type(self, schema_type: Any) -> Check:
+        names = [schema_type] if isinstance(schema_type, str) else list(schema_type)
+        for name in names:
+            if name not in _TYPE_CHECKS:
+                raise SaturnError("TOOL_SCHEMA_INVALID", f"Unknown schema type: {name}")
+        if len(names) == 1:
+            predicate = _TYPE_CHECKS[names[0]]
+
+            def _type(value: Any, path: str) -> None:
+                if not predicate(value):
+                    _fail(path, "type", f"Invalid type for field: {path}")
+
+            return _type
+        predicates = tuple(_TYPE_CHECKS[name] for name in names)
+
+        def _types(value: Any, path: str) -> None:
+            if not any(predicate(value) for predicate in predicates):
+                _fail(path, "type", f"Invalid type for field: {path}")
+
+        return _types
+
+    def _compile_enum(self, options: List[Any]) -> Check:
+        allowed = tuple(options)
+
+        def _enum(value: Any, path: str) -> None:
+            for option in allowed:
+                if value == option and isinstance(value, bool) == isinstance(option, bool):
+                    return
+            _fail(path, "enum", f"Value not in enum for field: {path}")
+
+        return _enum
+
+    def _compile_const(self, expected: Any) -> Check:
+        def _const(value: Any, path: str) -> None:
+            if value != expected or isinstance(value, bool) != isinstance(expected, bool):
+                _fail(path, "const", f"Value does not match const for field: {path}")
+
+        return _const
+
+    def _compile_string(self, schema: Dict[str, Any]) -> List[Check]:
+        checks: List[Check] = []
+        min_length = schema.get("minLength")
+        max_length = schema.get("maxLength")
+        if min_length is not None or max_length is not None:
+            low = min_length or 0
+            high = max_length if max_length is not None else math.inf
+
+            def _length(value: Any, path: str) -> None:
+                if isinstance(value, str) and not (low <= len(value) <= high):
+                    _fail(path, "minLength" if len(value) < low else "maxLength", f"Invalid length for field: {path}")
+
+            checks.append(_length)
+        if "pattern" in schema:
+            try:
+                pattern = re.compile(schema["pattern"])
+            except re.error as exc:
+                raise SaturnError("TOOL_SCHEMA_INVALID", f"Invalid pattern: {schema['pattern']}") from exc
+
+            def _pattern(value: Any, path: str) -> None:
+                if isinstance(value, str) and not pattern.search(value):
+                    _fail(path, "pattern", f"Value does not match pattern for field: {path}")
+
+            checks.append(_pattern)
+        format_check = _FORMAT_CHECKS.get(schema.get("format", ""))
+        if format_check:
+            format_name = schema["format"]
+
+            def _format(value: Any, path: str) -> None:
+                if isinstance(value, str) and not format_check(value):
+                    _fail(path, "format", f"Invalid {format_name} for field: {path}")
+
+            checks.append(_format)
+        return checks
+
+    def _compile_number(self, schema: Dict[str, Any]) -> List[Check]:
+        bounds = []
+        if "minimum" in schema:
+            bounds.append(("minimum", schema["minimum"], lambda value, limit: value >= limit))
+        if "maximum" in schema:
+            bounds.append(("maximum", schema["maximum"], lambda value, limit: value <= limit))
+        if "exclusiveMinimum" in schema:
+            bounds.append(("exclusiveMinimum", schema["exclusiveMinimum"], lambda value, limit: value > limit))
+        if "exclusiveMaximum" in schema:
+            bounds.append(("exclusiveMaximum", schema["exclusiveMaximum"], lambda value, limit: value < limit))
+        if "multipleOf" in schema:
+            step = schema["multipleOf"]
+            bounds.append(("multipleOf", step, lambda value, limit: math.isclose(value / limit, round(value / limit))))
+        if not bounds:
+            return []
+        bounds_tuple = tuple(bounds)
+
+        def _number(value: Any, path: str) -> None:
+            if not _is_number(value):
+                return
+            for keyword, limit, predicate in bounds_tuple:
+                if not predicate(value, limit):
+                    _fail(path, keyword, f"Value out of range for field: {path}")
+
+        return [_number]
+
+    def _compile_object(self, schema: Dict[str, Any]) -> List[Check]:
+        properties = {key: self.compile(sub) for key, sub in (schema.get("properties") or {}).items()}
+        required = tuple(schema.get("required") or ())
+        additional = schema.get("additionalProperties", True)
+        additional_check: Optional[Check] = None if additional is True else self.compile(additional)
+        if not properties and not required and additional_check is None:
+            return []
+
+        def _object(value: Any, path: str) -> None:
+            if not isinstance(value, dict):
+                return
+            for field in required:
+                if field not in value:
+                    _fail(f"{path}.{field}", "required", f"Missing required field: {path}.{field}")
+            for key, item in value.items():
+                check = properties.get(key)
+                if check is not None:
+                    check(item, f"{path}.{key}")
+                elif additional_check is not None:
+                    if additional is False:
+                        _fail(f"{path}.{key}", "additionalProperties", f"Unexpected field: {path}.{key}")
+                    additional_check(item, f"{path}.{key}")
+
+        return [_object]
+
+    def _compile_array(self, schema: Dict[str, Any]) -> List[Check]:
+        checks: List[Check] = []
+        if "items" in schema:
+            item_check = self.compile(schema["items"])
+
+            def _items(value: Any, path: str) -> None:
+                if isinstance(value, list):
+                    for index, item in enumerate(value):
+                        item_check(item, f"{path}[{index}]")
+
+            checks.append(_items)
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+        if min_items is not None or max_items is not None:
+            low = min_items or 0
+            high = max_items if max_items is not None else math.inf
+
+            def _size(value: Any, path: str) -> None:
+                if isinstance(value, list) and not (low <= len(value) <= high):
+                    _fail(path, "minItems" if len(value) < low else "maxItems", f"Invalid item count for field: {path}")
+
+            checks.append(_size)
+        if schema.get("uniqueItems"):
+
+            def _unique(value: Any, path: str) -> None:
+                if isinstance(value, list):
+                    seen: List[Any] = []
+                    for item in value:
+                        if item in seen:
+                            _fail(path, "uniqueItems", f"Duplicate items in field: {path}")
+                        seen.append(item)
+
+            checks.append(_unique)
+        return checks
+
+    def _compile_combinators(self, schema: Dict[str, Any]) -> List[Check]:
+        checks: List[Check] = []
+        if "allOf" in schema:
+            all_checks = tuple(self.compile(sub) for sub in schema["allOf"])
+
+            def _all_of(value: Any, path: str) -> None:
+                for check in all_checks:
+                    check(value, path)
+
+            checks.append(_all_of)
+        if "anyOf" in schema:
+            any_checks = tuple(self.compile(sub) for sub in schema["anyOf"])
+
+            def _any_of(value: Any, path: str) -> None:
+                if _count_matches(any_checks, value, path, stop_at=1) == 0:
+                    _fail(path, "anyOf", f"Value matches no allowed schema for field: {path}")
+
+            checks.append(_any_of)
+        if "oneOf" in schema:
+            one_checks = tuple(self.compile(sub) for sub in schema["oneOf"])
+
+            def _one_of(value: Any, path: str) -> None:
+                if _count_matches(one_checks, value, path, stop_at=2) != 1:
+                    _fail(path, "oneOf", f"Value must match exactly one schema for field: {path}")
+
+            checks.append(_one_of)
+        if "not" in schema:
+            not_check = self.compile(schema["not"])
+
+            def _not(value: Any, path: str) -> None:
+                if _count_matches((not_check,), value, path, stop_at=1):
+                    _fail(path, "not", f"Value matches a disallowed schema for field: {path}")
+
+            checks.append(_not)
+        return checks
+
+
+def _count_matches(checks: tuple, value: Any, path: str, stop_at: int) -> int:
+    matches = 0
+    for check in checks:
+        try:
+            check(value, path)
+        except SaturnError:
+            continue
+        matches += 1
+        if matches >= stop_at:
+            break
+    return matches
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile ``schema`` into a validator raising ``TOOL_SCHEMA_INVALID`` with the failing path."""
+    check = _Compiler(schema).compile(schema)
+
+    def _validate(value: Any) -> None:
+        check(value, ROOT_PATH)
+
+    return _validate
+
+
+def get_validator(cache_key: Hashable, schema: Dict[str, Any]) -> Validator:
+    with _cache_lock:
+        validator = _cache.get(cache_key)
+        if validator is not None:
+            _cache.move_to_end(cache_key)
+            return validator
+    validator = compile_schema(schema)
+    with _cache_lock:
+        _cache[cache_key] = validator
+        _cache.move_to_end(cache_key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return validator
+
+
+def invalidate_validators(predicate: Callable[[Hashable], bool]) -> None:
+    with _cache_lock:
+        for key in [key for key in _cache if predicate(key)]:
+            del _cache[key]
+
+
+def reset_validator_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
@@ -10,6 +10,32 @@ from db.session import session_scope
 from models.core import AgentTool as AgentToolModel
 from models.core import Tool as ToolModel
 from services.audit_service import record_audit_log
+from services.builtin_tools import execute_builtin
+from services.http_tool_runtime import execute_http_tool
+from services.job_service import enqueue_job
+from services.tool_guard import guarded_call, reset_tool_guards
+from services.tool_manifest import (
+    ManifestEntry,
+    ToolManifest,
+    build_manifest,
+    cached_manifest,
+    check_function_names,
+    function_name,
+    function_spec,
+    invalidate_agent_manifest,
+    invalidate_tool_manifests,
+    reset_tool_manifests,
+    store_manifest,
+)
+from services.tool_result_cache import (
+    cache_key,
+    cache_policy,
+    invalidate_tool,
+    lookup,
+    reset_tool_result_cache,
+    store,
+)
+from services.tool_schema import Validator, compile_schema, get_validator, reset_validator_cache
 
 logger = get_logger("services.tools")
 
@@ -25,6 +51,7 @@ class ToolRecord:
     output_schema: Optional[Dict[str, Any]]
     config: Dict[str, Any]
     status: str
+    version: int
 
 
 @dataclass
@@ -46,43 +73,44 @@ def _to_record(model: ToolModel) -> ToolRecord:
         output_schema=model.output_schema_json,
         config=model.config_json,
         status=model.status,
+        version=model.version or 1,
     )
 
 
-def _validate_type(schema_type: str, value: Any) -> bool:
-    if schema_type == "string":
-        return isinstance(value, str)
-    if schema_type == "number":
-        return isinstance(value, (int, float))
-    if schema_type == "integer":
-        return isinstance(value, int)
-    if schema_type == "boolean":
-        return isinstance(value, bool)
-    if schema_type == "object":
-        return isinstance(value, dict)
-    if schema_type == "array":
-        return isinstance(value, list)
-    return False
+def _require_object_schema(schema: Dict[str, Any]) -> None:
+    if schema.get("type") != "object":
+        raise SaturnError("TOOL_SCHEMA_INVALID", "Only object schema supported")
 
 
 def validate_input_schema(schema: Dict[str, Any], payload: Dict[str, Any]) -> None:
-    if schema.get("type") != "object":
-        raise SaturnError("TOOL_SCHEMA_INVALID", "Only object schema supported")
-    required = schema.get("required", [])
-    properties = schema.get("properties", {})
-    for field in required:
-        if field not in payload:
-            raise SaturnError("TOOL_SCHEMA_INVALID", f"Missing required field: {field}")
-    for key, value in payload.items():
-        prop_schema = properties.get(key)
-        if not prop_schema:
-            continue
-        prop_type = prop_schema.get("type")
-        if prop_type and not _validate_type(prop_type, value):
-            raise SaturnError("TOOL_SCHEMA_INVALID", f"Invalid type for field: {key}")
+    _require_object_schema(schema)
+    compile_schema(schema)(payload)
+
+
+def _input_validator(tool: ToolRecord) -> Validator:
+    _require_object_schema(tool.input_schema)
+    return get_validator((tool.company_id, tool.id, tool.version, "input"), tool.input_schema)
+
+
+def _validate_output(tool: ToolRecord, output: Any) -> None:
+    if not tool.output_schema:
+        return
+    validator = get_validator((tool.company_id, tool.id, tool.version, "output"), tool.output_schema)
+    try:
+        validator(output)
+    except SaturnError as exc:
+        raise SaturnError(
+            "TOOL_EXECUTION_FAILED",
+            "Tool output does not match output schema",
+            {"reason": exc.message, **exc.details},
+        ) from exc
 
 
 def create_tool(company_id: str, payload: Dict[str, Any], actor: AuthContext) -> ToolRecord:
+    _require_object_schema(payload["input_schema"])
+    compile_schema(payload["input_schema"])
+    if payload.get("output_schema"):
+        compile_schema(payload["output_schema"])
     tool_id = str(uuid.uuid4())
     with session_scope() as session:
         model = ToolModel(
@@ -95,6 +123,7 @@ def create_tool(company_id: str, payload: Dict[str, Any], actor: AuthContext) ->
             output_schema_json=payload.get("output_schema"),
             config_json=payload.get("config", {}),
             status=payload.get("status", "active"),
+            version=1,
         )
         session.add(model)
     record_audit_log(
@@ -127,6 +156,58 @@ def get_tool(company_id: str, tool_id: str) -> ToolRecord:
         return _to_record(model)
 
 
+def update_tool(company_id: str, tool_id: str, payload: Dict[str, Any], actor: AuthContext) -> ToolRecord:
+    if payload.get("input_schema") is not None:
+        _require_object_schema(payload["input_schema"])
+        compile_schema(payload["input_schema"])
+    if payload.get("output_schema") is not None:
+        compile_schema(payload["output_schema"])
+    columns = {
+        "description": "description",
+        "input_schema": "input_schema_json",
+        "output_schema": "output_schema_json",
+        "config": "config_json",
+        "status": "status",
+    }
+    with session_scope() as session:
+        model = (
+            session.query(ToolModel)
+            .filter(ToolModel.company_id == company_id, ToolModel.id == tool_id)
+            .first()
+        )
+        if not model:
+            raise SaturnError("TOOL_NOT_ALLOWED")
+        for key, column in columns.items():
+            if payload.get(key) is not None:
+                setattr(model, column, payload[key])
+        model.version = (model.version or 1) + 1
+        new_version = model.version
+    invalidate_tool_manifests(company_id, tool_id)
+    invalidate_tool(company_id, tool_id)
+    record_audit_log(
+        company_id=company_id,
+        actor_id=actor.user_id or actor.auth_type,
+        action="tool_updated",
+        resource_type="tool",
+        resource_id=tool_id,
+        metadata={"version": str(new_version)},
+    )
+    logger.info("tool_updated %s", tool_id)
+    return get_tool(company_id, tool_id)
+
+
+def _check_attached_names(session, company_id: str, agent_id: str, extra_tool_ids: List[str]) -> None:
+    """Fail before committing an attachment set with two tools sharing a function name."""
+    attached = session.query(AgentToolModel.tool_id).filter(
+        AgentToolModel.company_id == company_id, AgentToolModel.agent_id == agent_id
+    )
+    tool_ids = {row.tool_id for row in attached} | set(extra_tool_ids)
+    tools = session.query(ToolModel.id, ToolModel.name).filter(
+        ToolModel.company_id == company_id, ToolModel.id.in_(tool_ids)
+    )
+    check_function_names((row.id, row.name) for row in tools)
+
+
 def attach_tool(company_id: str, agent_id: str, tool_id: str, policy: Optional[Dict[str, Any]]) -> None:
     get_tool(company_id, tool_id)
     with session_scope() as session:
@@ -141,6 +222,7 @@ def attach_tool(company_id: str, agent_id: str, tool_id: str, policy: Optional[D
         )
         if existing:
             return
+        _check_attached_names(session, company_id, agent_id, [tool_id])
         session.add(
             AgentToolModel(
                 company_id=company_id,
@@ -149,6 +231,7 @@ def attach_tool(company_id: str, agent_id: str, tool_id: str, policy: Optional[D
                 policy_json=policy,
             )
         )
+    invalidate_agent_manifest(company_id, agent_id)
     logger.info("tool_attached %s %s", agent_id, tool_id)
 
 
@@ -159,9 +242,61 @@ def detach_tool(company_id: str, agent_id: str, tool_id: str) -> None:
             AgentToolModel.agent_id == agent_id,
             AgentToolModel.tool_id == tool_id,
         ).delete()
+    invalidate_agent_manifest(company_id, agent_id)
     logger.info("tool_detached %s %s", agent_id, tool_id)
 
 
+def update_attachments(
+    company_id: str,
+    agent_id: str,
+    attach: List[Dict[str, Any]],
+    detach: List[str],
+) -> List[str]:
+    """Attach and detach many tools in one transaction; returns the resulting tool ids.
+
+    Attaching an already attached tool replaces its policy. Unknown tool ids fail
+    the whole batch.
+    """
+    policies = {item["tool_id"]: item.get("policy") for item in attach}
+    with session_scope() as session:
+        if policies:
+            found = {
+                row.id
+                for row in session.query(ToolModel.id).filter(
+                    ToolModel.company_id == company_id, ToolModel.id.in_(list(policies))
+                )
+            }
+            missing = sorted(set(policies) - found)
+            if missing:
+                raise SaturnError("TOOL_NOT_ALLOWED", details={"tool_ids": missing})
+        if detach:
+            session.query(AgentToolModel).filter(
+                AgentToolModel.company_id == company_id,
+                AgentToolModel.agent_id == agent_id,
+                AgentToolModel.tool_id.in_(detach),
+            ).delete(synchronize_session=False)
+        rows = (
+            session.query(AgentToolModel)
+            .filter(AgentToolModel.company_id == company_id, AgentToolModel.agent_id == agent_id)
+            .all()
+        )
+        attached = {row.tool_id: row for row in rows}
+        for tool_id, policy in policies.items():
+            if tool_id in attached:
+                attached[tool_id].policy_json = policy
+            else:
+                attached[tool_id] = AgentToolModel(
+                    company_id=company_id, agent_id=agent_id, tool_id=tool_id, policy_json=policy
+                )
+                session.add(attached[tool_id])
+        session.flush()
+        _check_attached_names(session, company_id, agent_id, [])
+        tool_ids = sorted(attached)
+    invalidate_agent_manifest(company_id, agent_id)
+    logger.info("tools_batch_updated %s attach=%d detach=%d", agent_id, len(policies), len(detach))
+    return tool_ids
+
+
 def list_agent_tool_ids(company_id: str, agent_id: str) -> List[str]:
     with session_scope() as session:
         rows = (
@@ -175,20 +310,83 @@ def list_agent_tool_ids(company_id: str, agent_id: str) -> List[str]:
     return [row.tool_id for row in rows]
 
 
+def get_tool_manifest(company_id: str, agent_id: str, agent_version: int) -> ToolManifest:
+    """Return the compiled manifest of the agent's active tools, building it on a cache miss.
+
+    A miss costs one joined query for all attachments; hits touch no database.
+    """
+    manifest = cached_manifest(company_id, agent_id, agent_version)
+    if manifest is not None:
+        return manifest
+    with session_scope() as session:
+        rows = (
+            session.query(ToolModel, AgentToolModel.policy_json)
+            .join(
+                AgentToolModel,
+                (AgentToolModel.company_id == ToolModel.company_id) & (AgentToolModel.tool_id == ToolModel.id),
+            )
+            .filter(AgentToolModel.company_id == company_id, AgentToolModel.agent_id == agent_id)
+            .all()
+        )
+        attachments = [(_to_record(model), policy) for model, policy in rows]
+    entries = []
+    for tool, policy in attachments:
+        if tool.status != "active":
+            continue
+        name = function_name(tool.name)
+        entries.append(
+            ManifestEntry(
+                tool_id=tool.id,
+                tool_version=tool.version,
+                name=tool.name,
+                function_name=name,
+                policy=policy,
+                spec=function_spec(name, tool.description, tool.input_schema),
+                validate=_input_validator(tool),
+            )
+        )
+    attached_tool_ids = [tool.id for tool, _ in attachments]
+    manifest = build_manifest(company_id, agent_id, agent_version, entries, attached_tool_ids)
+    store_manifest(manifest)
+    logger.info("tool_manifest_built %s %s", agent_id, manifest.fingerprint)
+    return manifest
+
+
+def _run_tool(tool: ToolRecord, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    if tool.type == "http":
+        result = execute_http_tool(tool.config, tool_input)
+        _validate_output(tool, result["body"])
+        return result
+    if tool.type == "builtin":
+        result = execute_builtin(tool.config, tool_input)
+        _validate_output(tool, result)
+        return result
+    if tool.type == "workflow":
+        job = enqueue_job(tool.company_id, tool.id, tool_input, tool.config.get("max_attempts"))
+        return {"status": "queued", "job_id": job.id}
+    raise SaturnError("TOOL_EXECUTION_FAILED", "Unknown tool type")
+
+
 def execute_tool(company_id: str, tool_id: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
     try:
         tool = get_tool(company_id, tool_id)
-        validate_input_schema(tool.input_schema, tool_input)
+        _input_validator(tool)(tool_input)
         if tool.status != "active":
             raise SaturnError("TOOL_NOT_ALLOWED")
-        if tool.type == "http":
-            result = {"status": "ok", "echo": tool_input}
-        elif tool.type == "builtin":
-            result = {"status": "ok", "echo": tool_input}
-        elif tool.type == "workflow":
-            result = {"status": "queued", "job_id": str(uuid.uuid4())}
+        policy = cache_policy(tool.config) if tool.type != "workflow" else None
+        if policy:
+            key = cache_key(tool.id, tool.version, policy, tool_input)
+            cached = lookup(company_id, key)
+            if cached is not None:
+                record_tool_call(True)
+                logger.info("tool_cache_hit %s", tool_id)
+                return cached
+        if tool.type == "workflow":
+            result = _run_tool(tool, tool_input)
         else:
-            raise SaturnError("TOOL_EXECUTION_FAILED", "Unknown tool type")
+            result = guarded_call(company_id, tool.id, tool.config, lambda: _run_tool(tool, tool_input))
+        if policy:
+            store(company_id, key, result, policy.ttl_seconds)
         record_tool_call(True)
         logger.info("tool_executed %s", tool_id)
         return result
@@ -201,3 +399,7 @@ def reset_tools() -> None:
     with session_scope() as session:
         session.query(AgentToolModel).delete()
         session.query(ToolModel).delete()
+    reset_validator_cache()
+    reset_tool_result_cache()
+    reset_tool_guards()
+    reset_tool_manifests()
@@ -0,0 +1,235 @@
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from common.logging import get_logger
+from common.metrics import record_usage_dropped, record_usage_flush, record_usage_spilled, set_usage_buffer_depth
+
+logger = get_logger("services.usage_buffer")
+
+UsageRow = Dict[str, Any]
+UsageSink = Callable[[List[UsageRow]], None]
+
+
+def _encode(row: UsageRow) -> str:
+    return json.dumps({**row, "created_at": row["created_at"].isoformat()}, separators=(",", ":"))
+
+
+def _decode(line: str) -> UsageRow:
+    row = json.loads(line)
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+class UsageBuffer:
+    """Write-behind queue for usage rows.
+
+    Rows are flushed to ``sink`` in bulk once ``batch_size`` rows are waiting or
+    ``flush_interval`` seconds have passed, and on ``stop``. A batch the sink
+    rejects, or a row arriving while the queue is full, is appended to
+    ``spill_path`` (fsync'd once per batch) and replayed on later flushes, so a
+    short database outage loses nothing.
+    """
+
+    def __init__(
+        self,
+        sink: UsageSink,
+        spill_path: str,
+        replay_sink: Optional[UsageSink] = None,
+        batch_size: int = 500,
+        max_events: int = 10000,
+        flush_interval: float = 1.0,
+        max_replay_attempts: int = 5,
+    ):
+        self._sink = sink
+        self._replay_sink = replay_sink or sink
+        self._spill_path = spill_path
+        self._batch_size = batch_size
+        self._max_events = max_events
+        self._flush_interval = flush_interval
+        self._max_replay_attempts = max_replay_attempts
+        self._replay_failures = 0
+        self._queue: Deque[UsageRow] = deque()
+        self._ready = Condition()
+        self._flush_lock = Lock()
+        self._spill_lock = Lock()
+        self._running = False
+        self._thread: Optional[Thread] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = Thread(target=self._run, name="saturn-usage-flush", daemon=True)
+        self._thread.start()
+        logger.info("usage_buffer_started")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._ready:
+            self._running = False
+            self._ready.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        logger.info("usage_buffer_stopped")
+
+    def add(self, row: UsageRow) -> None:
+        with self._ready:
+            if len(self._queue) < self._max_events:
+                self._queue.append(row)
+                depth = len(self._queue)
+                if depth >= self._batch_size:
+                    self._ready.notify()
+                row = None
+        if row is not None:
+            self._spill([row])
+            return
+        set_usage_buffer_depth(depth)
+
+    def _drain(self) -> List[UsageRow]:
+        with self._ready:
+            batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+            set_usage_buffer_depth(len(self._queue))
+        return batch
+
+    def flush(self) -> int:
+        """Write every queued row (and any spilled rows) to the sink; returns rows written.
+
+        Live rows go to the sink even when the spill replay failed, so a spilled
+        batch the database keeps rejecting cannot hold up new usage. Once a live
+        write fails (the database is down) the rest of the queue is spilled.
+        """
+        written = 0
+        with self._flush_lock:
+            self._replay_spill()
+            failed = False
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                if failed or not self._write(batch):
+                    self._spill(batch)
+                    failed = True
+                    continue
+                written += len(batch)
+        return written
+
+    def _write(self, batch: List[UsageRow], sink: Optional[UsageSink] = None) -> bool:
+        start = time.perf_counter()
+        try:
+            (sink or self._sink)(batch)
+        except Exception as exc:
+            logger.error("usage_flush_failed %d", len(batch), exc_info=exc)
+            return False
+        record_usage_flush((time.perf_counter() - start) * 1000, len(batch))
+        return True
+
+    def _append(self, path: str, lines: Iterable[str]) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write("".join(line if line.endswith("\n") else line + "\n" for line in lines))
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def _spill(self, rows: List[UsageRow]) -> None:
+        try:
+            with self._spill_lock:
+                self._append(self._spill_path, (_encode(row) for row in rows))
+        except OSError as exc:
+            logger.error("usage_spill_failed %d", len(rows), exc_info=exc)
+            record_usage_dropped(len(rows))
+            return
+        record_usage_spilled(len(rows))
+        logger.info("usage_spilled %d", len(rows))
+
+    def _quarantine(self, lines: List[str], reason: str) -> None:
+        """Set aside spilled lines that cannot be replayed, for an operator to inspect."""
+        try:
+            with self._spill_lock:
+                self._append(self._spill_path + ".bad", lines)
+        except OSError as exc:
+            logger.error("usage_quarantine_failed %d", len(lines), exc_info=exc)
+            record_usage_dropped(len(lines))
+            return
+        logger.error("usage_spill_quarantined %s %d", reason, len(lines))
+
+    def _replay_batches(self, handle: TextIO) -> Iterator[List[Tuple[str, UsageRow]]]:
+        batch: List[Tuple[str, UsageRow]] = []
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                batch.append((line, _decode(line)))
+            except (ValueError, KeyError, TypeError):
+                # A torn line from a crash mid-append.
+                self._quarantine([line], "undecodable")
+                continue
+            if len(batch) >= self._batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _replay_spill(self) -> Optional[bool]:
+        """Push spilled rows to the sink in batches; ``None`` if there was nothing to replay.
+
+        A ``.replay`` file left behind by a crash mid-replay is picked up first;
+        the replay sink must skip rows that already made it to the database. A
+        batch rejected ``max_replay_attempts`` flushes in a row is quarantined to
+        ``<spill_path>.bad`` so it cannot block the file forever.
+        """
+        replaying = self._spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(replaying):
+                if not os.path.exists(self._spill_path):
+                    return None
+                os.replace(self._spill_path, replaying)
+        replayed = 0
+        with open(replaying, encoding="utf-8") as handle:
+            for batch in self._replay_batches(handle):
+                if self._write([row for _, row in batch], self._replay_sink):
+                    self._replay_failures = 0
+                    replayed += len(batch)
+                    continue
+                self._replay_failures += 1
+                if self._replay_failures >= self._max_replay_attempts:
+                    self._quarantine([line for line, _ in batch], "rejected")
+                    self._replay_failures = 0
+                    continue
+                self._keep_for_replay(replaying, [line for line, _ in batch], handle)
+                return False
+        os.remove(replaying)
+        logger.info("usage_spill_replayed %d", replayed)
+        return True
+
+    def _keep_for_replay(self, replaying: str, batch: List[str], rest: TextIO) -> None:
+        """Rewrite the replay file as the failed batch plus the lines not read yet."""
+        remainder = replaying + ".tmp"
+        with open(remainder, "w", encoding="utf-8") as handle:
+            handle.writelines(batch)
+            for line in rest:
+                handle.write(line)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(remainder, replaying)
+
+    def _run(self) -> None:
+        while True:
+            with self._ready:
+                if self._running and len(self._queue) < self._batch_size:
+                    self._ready.wait(self._flush_interval)
+                if not self._running:
+                    return
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.error("usage_flush_loop_failed", exc_info=exc)
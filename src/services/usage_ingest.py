@@ -0,0 +1,156 @@
+import json
+import math
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy.exc import IntegrityError
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import Agent as AgentModel
+from services.usage_service import insert_usage_rows
+
+logger = get_logger("services.usage_ingest")
+
+USAGE_UNITS = {"tokens", "calls", "seconds"}
+
+_ID_NAMESPACE = uuid.UUID("5b0b5a43-8a3e-4d1c-9a57-2f0f6f0c1e11")
+
+
+@dataclass
+class BatchResult:
+    batch: int
+    received: int
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def event_id(company_id: str, client_id: str) -> str:
+    """Stable row id for a client-supplied event id, scoped to the company."""
+    return str(uuid.uuid5(_ID_NAMESPACE, f"{company_id}:{client_id}"))
+
+
+def _string(event: Dict[str, Any], key: str, max_length: int, required: bool = True) -> Optional[str]:
+    value = event.get(key)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value or len(value) > max_length:
+        raise ValueError(f"{key} must be a non-empty string of at most {max_length} characters")
+    return value
+
+
+def _row(company_id: str, event: Any, now: datetime) -> Dict[str, Any]:
+    if not isinstance(event, dict):
+        raise ValueError("event must be a JSON object")
+    client_id = _string(event, "id", 128)
+    unit = _string(event, "unit", 20)
+    if unit not in USAGE_UNITS:
+        raise ValueError(f"unit must be one of {', '.join(sorted(USAGE_UNITS))}")
+    quantity = event.get("quantity")
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, float)):
+        raise ValueError("quantity must be a number")
+    if not math.isfinite(quantity) or quantity < 0:
+        raise ValueError("quantity must be finite and non-negative")
+    metadata = event.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata must be an object")
+    created_at = now
+    if event.get("created_at") is not None:
+        try:
+            created_at = datetime.fromisoformat(event["created_at"])
+        except (TypeError, ValueError):
+            raise ValueError("created_at must be an ISO 8601 timestamp") from None
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "id": event_id(company_id, client_id),
+        "company_id": company_id,
+        "agent_id": _string(event, "agent_id", 36),
+        "session_id": _string(event, "session_id", 36, required=False),
+        "event_type": _string(event, "event_type", 50),
+        "quantity": quantity,
+        "unit": unit,
+        "metadata_json": {**metadata, "client_event_id": client_id},
+        "created_at": created_at,
+    }
+
+
+def _known_agents(company_id: str, agent_ids: Set[str]) -> Set[str]:
+    with session_scope() as session:
+        rows = session.query(AgentModel.id).filter(
+            AgentModel.company_id == company_id, AgentModel.id.in_(agent_ids)
+        )
+        return {row.id for row in rows}
+
+
+def _ingest_batch(company_id: str, index: int, lines: List[bytes], first_line: int) -> BatchResult:
+    now = datetime.utcnow()
+    result = BatchResult(batch=index, received=0)
+    rows: Dict[str, Dict[str, Any]] = {}
+    line_numbers: Dict[str, int] = {}
+    for number, line in enumerate(lines, start=first_line):
+        if not line.strip():
+            continue
+        result.received += 1
+        try:
+            row = _row(company_id, json.loads(line), now)
+        except ValueError as exc:
+            result.rejected.append({"line": number, "error": str(exc)})
+            continue
+        if row["id"] in rows:
+            result.duplicates += 1
+            continue
+        rows[row["id"]] = row
+        line_numbers[row["id"]] = number
+    if rows:
+        known = _known_agents(company_id, {row["agent_id"] for row in rows.values()})
+        for row_id in [row_id for row_id, row in rows.items() if row["agent_id"] not in known]:
+            result.rejected.append({"line": line_numbers[row_id], "error": "agent_id not found"})
+            del rows[row_id]
+    batch = list(rows.values())
+    try:
+        inserted = insert_usage_rows(batch, skip_existing=True)
+    except IntegrityError:
+        # A concurrent retry of the same batch won the race; the second pass skips its rows.
+        inserted = insert_usage_rows(batch, skip_existing=True)
+    result.accepted = inserted
+    result.duplicates += len(batch) - inserted
+    result.rejected.sort(key=lambda item: item["line"])
+    return result
+
+
+def ingest_usage_ndjson(company_id: str, body: bytes) -> List[BatchResult]:
+    """Validate and store an NDJSON body of usage events reported by a channel adapter.
+
+    Each line is one event with a client-supplied ``id``; resending an event is
+    a no-op, so adapters can retry whole requests. Lines are processed in
+    batches of ``usage_ingest_batch_size``, each validated in plain Python and
+    written with a single bulk insert; invalid lines are reported per batch
+    without failing the rest.
+    """
+    settings = get_settings()
+    lines = body.splitlines()
+    if len(lines) > settings.usage_ingest_max_events:
+        raise SaturnError(
+            "BAD_REQUEST",
+            f"At most {settings.usage_ingest_max_events} events per request",
+            {"received": len(lines)},
+        )
+    size = settings.usage_ingest_batch_size
+    results = [
+        _ingest_batch(company_id, index, lines[start : start + size], start + 1)
+        for index, start in enumerate(range(0, len(lines), size))
+    ]
+    logger.info(
+        "usage_ingested %s accepted=%d duplicates=%d rejected=%d",
+        company_id,
+        sum(result.accepted for result in results),
+        sum(result.duplicates for result in results),
+        sum(len(result.rejected) for result in results),
+    )
+    return results
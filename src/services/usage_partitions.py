@@ -0,0 +1,350 @@
+import argparse
+import gzip
+import json
+import os
+from collections import defaultdict
+from itertools import islice
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import Session
+
+from common.config import get_settings
+from common.errors import SaturnError
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import UsageEvent as UsageEventModel
+from services.usage_rollups import replace_rollups
+
+logger = get_logger("services.usage_partitions")
+
+_COLUMNS = (
+    "id",
+    "company_id",
+    "agent_id",
+    "session_id",
+    "event_type",
+    "quantity",
+    "unit",
+    "cost",
+    "metadata_json",
+    "created_at",
+)
+
+# Bound on the ids per DELETE, under SQLite's bound-parameter limit.
+_DELETE_BATCH = 500
+# Exported rows per delete transaction; each page is deleted by its (created_at, id) range.
+_ARCHIVE_PAGE = 5000
+
+# (first (created_at, id), last (created_at, id), rows) of one exported page.
+_Page = Tuple[Tuple[datetime, str], Tuple[datetime, str], int]
+
+
+def month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """``[start, end)`` of a ``YYYY-MM`` month as naive UTC datetimes."""
+    try:
+        start = datetime.strptime(month, "%Y-%m")
+    except ValueError as exc:
+        raise SaturnError("BAD_REQUEST", "Month must be YYYY-MM") from exc
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def _month_of(value: datetime) -> str:
+    return f"{value.year}-{value.month:02d}"
+
+
+def _shift(month: str, months: int) -> str:
+    start, _ = month_bounds(month)
+    index = start.year * 12 + start.month - 1 + months
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def _partition_name(month: str) -> str:
+    return "p" + month.replace("-", "")
+
+
+def _is_mysql(session: Session) -> bool:
+    return session.get_bind().dialect.name == "mysql"
+
+
+def _mysql_partitions(session: Session) -> List[str]:
+    rows = session.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'usage_events' AND PARTITION_NAME IS NOT NULL"
+        )
+    )
+    return [row[0] for row in rows]
+
+
+def _partition_clause(months: List[str]) -> str:
+    parts = [
+        f"PARTITION {_partition_name(month)} VALUES LESS THAN (TO_DAYS('{month_bounds(month)[1].date()}'))"
+        for month in months
+    ]
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return ", ".join(parts)
+
+
+def ensure_partitions(months_ahead: int = 2, now: Optional[datetime] = None) -> List[str]:
+    """Make sure ``usage_events`` has a partition per month up to ``months_ahead`` from now.
+
+    MySQL only: migration 0014 partitions the table by
+    ``RANGE (TO_DAYS(created_at))``; this splits new months off ``pmax``.
+    SQLite has no partitioning; there the hot table is kept small by
+    ``archive_month`` deleting whole months by range instead.
+    Returns the partitions added.
+    """
+    current = _month_of(now or datetime.utcnow())
+    with session_scope() as session:
+        if not _is_mysql(session):
+            return []
+        existing = _mysql_partitions(session)
+        if not existing:
+            logger.warning("usage_partitions_missing run alembic upgrade to partition usage_events")
+            return []
+        wanted = [_shift(current, offset) for offset in range(months_ahead + 1)]
+        added = [month for month in wanted if _partition_name(month) not in existing]
+        if added:
+            session.execute(
+                text(f"ALTER TABLE usage_events REORGANIZE PARTITION pmax INTO ({_partition_clause(added)})")
+            )
+    if added:
+        logger.info("usage_partitions_added %s", ",".join(added))
+    return added
+
+
+def hot_months() -> List[str]:
+    """Months that still have rows in ``usage_events``, oldest first."""
+    with session_scope() as session:
+        oldest, newest = session.query(
+            func.min(UsageEventModel.created_at), func.max(UsageEventModel.created_at)
+        ).one()
+    if oldest is None:
+        return []
+    months = [_month_of(oldest)]
+    while months[-1] < _month_of(newest):
+        months.append(_shift(months[-1], 1))
+    return months
+
+
+def _archive_dir(archive_dir: Optional[str]) -> Path:
+    return Path(archive_dir or get_settings().usage_archive_dir)
+
+
+def _archive_files(month: str, archive_dir: Optional[str] = None) -> List[Path]:
+    return sorted(_archive_dir(archive_dir).glob(f"usage-{month}*.ndjson.gz"))
+
+
+def _next_archive_path(month: str, archive_dir: Optional[str]) -> Path:
+    directory = _archive_dir(archive_dir)
+    path = directory / f"usage-{month}.ndjson.gz"
+    part = 1
+    while path.exists():
+        path = directory / f"usage-{month}.{part}.ndjson.gz"
+        part += 1
+    return path
+
+
+def _serialize(row: Any) -> str:
+    record = {name: getattr(row, name) for name in _COLUMNS}
+    record["created_at"] = record["created_at"].isoformat()
+    return json.dumps(record, separators=(",", ":"))
+
+
+def _in_key_range(first: Tuple[datetime, str], last: Tuple[datetime, str]) -> Tuple[Any, Any]:
+    model = UsageEventModel
+    return (
+        or_(model.created_at > first[0], and_(model.created_at == first[0], model.id >= first[1])),
+        or_(model.created_at < last[0], and_(model.created_at == last[0], model.id <= last[1])),
+    )
+
+
+def _archived_lines(path: Path) -> Iterator[str]:
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        yield from handle
+
+
+def _delete_archived(month: str, pages: List[_Page], path: Path) -> None:
+    """Remove exactly the exported events from the hot table, one page per transaction.
+
+    Each page is deleted by its ``(created_at, id)`` range; when the range no
+    longer holds exactly the exported rows (an event arrived for the month
+    during the export) that page is rolled back and deleted by the ids read
+    back from the archive file instead. On MySQL the whole partition is
+    dropped when its row count still equals the number exported.
+    """
+    start, end = month_bounds(month)
+    exported = sum(page[2] for page in pages)
+    with session_scope() as session:
+        if _is_mysql(session) and _partition_name(month) in _mysql_partitions(session):
+            partition = _partition_name(month)
+            count = session.execute(text(f"SELECT COUNT(*) FROM usage_events PARTITION ({partition})")).scalar()
+            if count == exported:
+                session.execute(text(f"ALTER TABLE usage_events DROP PARTITION {partition}"))
+                return
+            logger.warning("usage_partition_changed %s %d %d", month, count, exported)
+    lines: Optional[Iterator[str]] = None
+    position = offset = 0
+    for first, last, size in pages:
+        with session_scope() as session:
+            in_month = (UsageEventModel.created_at >= start, UsageEventModel.created_at < end)
+            deleted = (
+                session.query(UsageEventModel)
+                .filter(*in_month, *_in_key_range(first, last))
+                .delete(synchronize_session=False)
+            )
+            if deleted != size:
+                session.rollback()
+                logger.warning("usage_archive_page_changed %s %d %d", month, deleted, size)
+                if lines is None:
+                    lines = _archived_lines(path)
+                page = list(islice(lines, offset - position, offset - position + size))
+                position = offset + size
+                ids = [json.loads(line)["id"] for line in page]
+                for batch in range(0, len(ids), _DELETE_BATCH):
+                    session.query(UsageEventModel).filter(
+                        UsageEventModel.id.in_(ids[batch : batch + _DELETE_BATCH])
+                    ).delete(synchronize_session=False)
+        offset += size
+
+
+def archive_month(month: str, archive_dir: Optional[str] = None) -> int:
+    """Export one month of ``usage_events`` to gzip NDJSON, then remove it from the hot table.
+
+    The file is written under a temporary name, fsync'd and renamed before any
+    row is dropped, so a crash never loses events. Only the exported events
+    are removed, by the ``(created_at, id)`` boundaries of each exported page,
+    so memory stays flat however large the month; late events that arrive
+    meanwhile stay hot and go out with the next run. Rollups are left in
+    place, so invoices and summaries for the month keep working. A month
+    archived twice gets an extra ``usage-YYYY-MM.N.ndjson.gz`` part. Returns
+    the number of events archived.
+    """
+    start, end = month_bounds(month)
+    path = _next_archive_path(month, archive_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + ".tmp")
+    pages: List[_Page] = []
+    events = 0
+    with session_scope() as session:
+        query = (
+            session.query(*(getattr(UsageEventModel, name) for name in _COLUMNS))
+            .filter(UsageEventModel.created_at >= start, UsageEventModel.created_at < end)
+            .order_by(UsageEventModel.created_at, UsageEventModel.id)
+            .yield_per(_ARCHIVE_PAGE)
+        )
+        with open(temp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as handle:
+                first: Optional[Tuple[datetime, str]] = None
+                size = 0
+                for row in query:
+                    handle.write((_serialize(row) + "\n").encode("utf-8"))
+                    key = (row.created_at, row.id)
+                    first = first or key
+                    size += 1
+                    events += 1
+                    if size == _ARCHIVE_PAGE:
+                        pages.append((first, key, size))
+                        first, size = None, 0
+                if size:
+                    pages.append((first, key, size))
+            raw.flush()
+            os.fsync(raw.fileno())
+    if not events:
+        temp.unlink()
+        return 0
+    os.replace(temp, path)
+    _delete_archived(month, pages, path)
+    logger.info("usage_month_archived %s %d %s", month, events, path)
+    return events
+
+
+def archive_expired(
+    retention_months: Optional[int] = None, archive_dir: Optional[str] = None, now: Optional[datetime] = None
+) -> Dict[str, int]:
+    """Archive every hot month older than the retention window; returns events per month."""
+    retention = get_settings().usage_retention_months if retention_months is None else retention_months
+    cutoff = _shift(_month_of(now or datetime.utcnow()), -retention)
+    archived = {}
+    for month in hot_months():
+        if month >= cutoff:
+            break
+        events = archive_month(month, archive_dir)
+        if events:
+            archived[month] = events
+    return archived
+
+
+def archived_months(archive_dir: Optional[str] = None) -> List[str]:
+    directory = _archive_dir(archive_dir)
+    if not directory.exists():
+        return []
+    return sorted({path.name[len("usage-") : len("usage-YYYY-MM")] for path in directory.glob("usage-*.ndjson.gz")})
+
+
+def read_archived_events(
+    month: str, company_id: Optional[str] = None, archive_dir: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream the archived events of ``month``, optionally for one company."""
+    for path in _archive_files(month, archive_dir):
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                record = json.loads(line)
+                if company_id and record["company_id"] != company_id:
+                    continue
+                record["created_at"] = datetime.fromisoformat(record["created_at"])
+                yield record
+
+
+def aggregate_archived_month(
+    month: str, company_id: Optional[str] = None, archive_dir: Optional[str] = None
+) -> List[Tuple[str, str, str, float]]:
+    """``(company_id, event_type, unit, quantity)`` groups of an archived month, shaped like
+    ``usage_rollups.rollup_breakdown`` so billing can reprice it."""
+    totals: Dict[Tuple[str, str, str], float] = defaultdict(float)
+    for record in read_archived_events(month, company_id, archive_dir):
+        totals[(record["company_id"], record["event_type"], record["unit"])] += float(record["quantity"])
+    return [(key[0], key[1], key[2], quantity) for key, quantity in sorted(totals.items())]
+
+
+def restore_archived_rollups(month: str, company_id: Optional[str] = None, archive_dir: Optional[str] = None) -> int:
+    """Rebuild a month's rollups from its archive files; returns the events folded in."""
+    start, end = month_bounds(month)
+    with session_scope() as session:
+        events = replace_rollups(session, start, end, read_archived_events(month, company_id, archive_dir), company_id)
+        if not events:
+            raise SaturnError("NOT_FOUND", f"No archived usage for {month}")
+    logger.info("usage_rollups_restored %s %s %d", month, company_id or "*", events)
+    return events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Partition and archive usage events")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="create upcoming monthly partitions (MySQL)")
+    ensure.add_argument("--months-ahead", type=int, default=2)
+    archive = commands.add_parser("archive", help="archive months past the retention window")
+    archive.add_argument("--retention-months", type=int)
+    archive.add_argument("--month", help="archive one YYYY-MM month regardless of retention")
+    restore = commands.add_parser("restore-rollups", help="rebuild a month's rollups from its archive")
+    restore.add_argument("--month", required=True)
+    restore.add_argument("--company-id")
+    args = parser.parse_args()
+    if args.command == "ensure":
+        print(json.dumps({"added": ensure_partitions(args.months_ahead)}))
+    elif args.command == "archive":
+        if args.month:
+            result = {args.month: archive_month(args.month)}
+        else:
+            result = archive_expired(args.retention_months)
+        print(json.dumps({"archived": result}))
+    else:
+        print(json.dumps({"restored": restore_archived_rollups(args.month, args.company_id)}))
+
+
+if __name__ == "__main__":
+    main()
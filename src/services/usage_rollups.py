@@ -0,0 +1,229 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from common.logging import get_logger
+from db.session import session_scope
+from models.core import UsageEvent as UsageEventModel
+from models.core import UsageRollupDaily, UsageRollupHourly
+
+logger = get_logger("services.usage_rollups")
+
+HOUR = "hour"
+DAY = "day"
+ROLLUP_MODELS = {HOUR: UsageRollupHourly, DAY: UsageRollupDaily}
+
+RollupKey = Tuple[str, str, str, str, datetime]
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    value = _naive_utc(value).replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == DAY else value
+
+
+def _aggregate(rows: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Dict[RollupKey, List[float]]], int]:
+    """Fold ``rows`` into per-granularity totals in one pass; returns the totals and the rows seen.
+
+    Only the totals are kept, so ``rows`` can be a stream of any length.
+    """
+    totals: Dict[str, Dict[RollupKey, List[float]]] = {
+        granularity: defaultdict(lambda: [0.0, 0]) for granularity in ROLLUP_MODELS
+    }
+    seen = 0
+    for row in rows:
+        seen += 1
+        for granularity, grouped in totals.items():
+            key = (
+                row["company_id"],
+                row["agent_id"],
+                row["event_type"],
+                row["unit"],
+                bucket_start(row["created_at"], granularity),
+            )
+            grouped[key][0] += float(row["quantity"])
+            grouped[key][1] += 1
+    return totals, seen
+
+
+def _values(totals: Dict[RollupKey, List[float]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "company_id": company_id,
+            "agent_id": agent_id,
+            "event_type": event_type,
+            "unit": unit,
+            "bucket_start": bucket,
+            "quantity": quantity,
+            "event_count": count,
+        }
+        for (company_id, agent_id, event_type, unit, bucket), (quantity, count) in totals.items()
+    ]
+
+
+def _upsert(session: Session, model, values: List[Dict[str, Any]]) -> None:
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql_insert(model).values(values)
+        statement = statement.on_duplicate_key_update(
+            quantity=model.quantity + statement.inserted.quantity,
+            event_count=model.event_count + statement.inserted.event_count,
+        )
+        session.execute(statement)
+        return
+    if dialect == "sqlite":
+        statement = sqlite_insert(model).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=["company_id", "agent_id", "event_type", "unit", "bucket_start"],
+            set_={
+                "quantity": model.quantity + statement.excluded.quantity,
+                "event_count": model.event_count + statement.excluded.event_count,
+            },
+        )
+        session.execute(statement)
+        return
+    for value in values:
+        key = {name: value[name] for name in ("company_id", "agent_id", "event_type", "unit", "bucket_start")}
+        row = session.get(model, key)
+        if row is None:
+            session.add(model(**value))
+        else:
+            row.quantity += value["quantity"]
+            row.event_count += value["event_count"]
+
+
+def apply_rollups(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """Fold freshly inserted usage rows into the hourly and daily rollups of ``session``'s transaction."""
+    if not rows:
+        return
+    totals, _ = _aggregate(rows)
+    for granularity, model in ROLLUP_MODELS.items():
+        _upsert(session, model, _values(totals[granularity]))
+
+
+def _day_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    start = bucket_start(start, DAY)
+    end = _naive_utc(end)
+    if end != bucket_start(end, DAY):
+        end = bucket_start(end, DAY) + timedelta(days=1)
+    return start, end
+
+
+def replace_rollups(
+    session: Session,
+    start: datetime,
+    end: datetime,
+    rows: Iterable[Dict[str, Any]],
+    company_id: Optional[str] = None,
+) -> int:
+    """Overwrite the rollups of whole days in ``[start, end)`` with aggregates of ``rows``.
+
+    ``rows`` is consumed once, as a stream; returns how many it held.
+    """
+    totals, seen = _aggregate(rows)
+    for model in ROLLUP_MODELS.values():
+        query = session.query(model).filter(model.bucket_start >= start, model.bucket_start < end)
+        if company_id:
+            query = query.filter(model.company_id == company_id)
+        query.delete(synchronize_session=False)
+    for granularity, model in ROLLUP_MODELS.items():
+        values = _values(totals[granularity])
+        if values:
+            session.execute(model.__table__.insert(), values)
+    return seen
+
+
+def rebuild_rollups(start: datetime, end: datetime, company_id: Optional[str] = None) -> int:
+    """Recompute rollups from raw events for whole days overlapping ``[start, end)``.
+
+    Returns the number of raw events folded in. Months already archived out of
+    ``usage_events`` must be restored with ``usage_partitions.restore_archived_rollups``.
+    """
+    start, end = _day_range(start, end)
+    with session_scope() as session:
+        query = session.query(
+            UsageEventModel.company_id,
+            UsageEventModel.agent_id,
+            UsageEventModel.event_type,
+            UsageEventModel.unit,
+            UsageEventModel.quantity,
+            UsageEventModel.created_at,
+        ).filter(UsageEventModel.created_at >= start, UsageEventModel.created_at < end)
+        if company_id:
+            query = query.filter(UsageEventModel.company_id == company_id)
+        events = replace_rollups(session, start, end, (row._asdict() for row in query.yield_per(1000)), company_id)
+    logger.info("usage_rollups_rebuilt %s %s %s %d", company_id or "*", start.isoformat(), end.isoformat(), events)
+    return events
+
+
+def _totals_query(
+    company_id: str, group_by: str, start: Optional[datetime], end: Optional[datetime]
+) -> Select:
+    column = getattr(UsageRollupDaily, group_by)
+    query = select(column, func.sum(UsageRollupDaily.quantity)).where(UsageRollupDaily.company_id == company_id)
+    if start is not None:
+        query = query.where(UsageRollupDaily.bucket_start >= _naive_utc(start))
+    if end is not None:
+        query = query.where(UsageRollupDaily.bucket_start < _naive_utc(end))
+    return query.group_by(column)
+
+
+def rollup_totals(
+    company_id: str,
+    group_by: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, float]:
+    """Sum daily rollup quantities grouped by ``event_type`` or ``unit``."""
+    with session_scope() as session:
+        rows = session.execute(_totals_query(company_id, group_by, start, end)).all()
+    return {key: float(total or 0) for key, total in rows}
+
+
+
+def rollup_breakdown(
+    start: datetime, end: datetime, company_id: Optional[str] = None
+) -> List[Tuple[str, str, str, float]]:
+    """``(company_id, event_type, unit, quantity)`` per group of daily rollups in ``[start, end)``."""
+    model = UsageRollupDaily
+    with session_scope() as session:
+        query = session.query(model.company_id, model.event_type, model.unit, func.sum(model.quantity)).filter(
+            model.bucket_start >= _naive_utc(start), model.bucket_start < _naive_utc(end)
+        )
+        if company_id:
+            query = query.filter(model.company_id == company_id)
+        rows = query.group_by(model.company_id, model.event_type, model.unit).all()
+    return [(row[0], row[1], row[2], float(row[3] or 0)) for row in rows]
+
+
+def reset_usage_rollups() -> None:
+    with session_scope() as session:
+        session.query(UsageRollupHourly).delete()
+        session.query(UsageRollupDaily).delete()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild usage rollups from raw events")
+    parser.add_argument("--start", required=True, help="ISO date or datetime (inclusive)")
+    parser.add_argument("--end", required=True, help="ISO date or datetime (exclusive)")
+    parser.add_argument("--company-id")
+    args = parser.parse_args()
+    events = rebuild_rollups(
+        datetime.fromisoformat(args.start), datetime.fromisoformat(args.end), args.company_id
+    )
+    print(f"rebuilt rollups from {events} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 import uuid
 from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import insert, select
+
+from common.config import get_settings
+from common.errors import SaturnError
 from common.logging import get_logger
-from db.session import session_scope
+from db.session import retry_on_locked, session_scope
 from models.core import UsageEvent as UsageEventModel
+from services.cost_estimate_cache import invalidate_estimates
+from services.spend_counters import confirm_spend, record_spend, reset_spend_counters, retract_spend, usage_commit
+from services.usage_buffer import UsageBuffer
+from services.usage_rollups import apply_rollups, reset_usage_rollups, rollup_totals
 
 logger = get_logger("services.usage")
 
@@ -26,6 +34,78 @@ def _now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+@retry_on_locked
+def insert_usage_rows(
+    rows: List[Dict[str, Any]], skip_existing: bool = False, track_spend: bool = True
+) -> int:
+    """Bulk insert usage rows and fold them into the rollups in a single transaction.
+
+    ``skip_existing`` drops rows whose id is already stored, which makes
+    replaying a spill file or a client retry safe. Rows are added to the spend
+    counters before they commit; ``track_spend=False`` is for rows already
+    added when they were buffered.
+    Returns the rows inserted.
+    """
+    if not rows:
+        return 0
+    if track_spend:
+        record_spend(rows)
+    try:
+        with usage_commit(), session_scope() as session:
+            inserted = rows
+            if skip_existing:
+                ids = [row["id"] for row in rows]
+                existing = {
+                    row.id for row in session.query(UsageEventModel.id).filter(UsageEventModel.id.in_(ids))
+                }
+                inserted = [row for row in rows if row["id"] not in existing]
+            if inserted:
+                session.execute(insert(UsageEventModel), inserted)
+                apply_rollups(session, inserted)
+    except Exception:
+        if track_spend:
+            retract_spend(rows)
+        raise
+    if track_spend and len(inserted) < len(rows):
+        retract_spend(row for row in rows if row["id"] in existing)
+    confirm_spend(inserted)
+    for company_id in {row["company_id"] for row in inserted}:
+        invalidate_estimates(company_id)
+    return len(inserted)
+
+
+_buffer: Optional[UsageBuffer] = None
+
+
+def start_usage_buffer() -> None:
+    """Route ``record_usage_event`` through a write-behind buffer until stopped."""
+    global _buffer
+    if _buffer is not None:
+        return
+    settings = get_settings()
+    _buffer = UsageBuffer(
+        lambda rows: insert_usage_rows(rows, track_spend=False),
+        settings.usage_spill_path,
+        replay_sink=lambda rows: insert_usage_rows(rows, skip_existing=True, track_spend=False),
+        batch_size=settings.usage_buffer_batch_size,
+        max_events=settings.usage_buffer_max_events,
+        flush_interval=settings.usage_buffer_flush_interval_seconds,
+        max_replay_attempts=settings.usage_spill_max_replay_attempts,
+    )
+    _buffer.start()
+
+
+def stop_usage_buffer() -> None:
+    global _buffer
+    buffer, _buffer = _buffer, None
+    if buffer is not None:
+        buffer.stop()
+
+
+def flush_usage_buffer() -> int:
+    return _buffer.flush() if _buffer is not None else 0
+
+
 def record_usage_event(
     company_id: str,
     agent_id: str,
@@ -34,71 +114,126 @@ def record_usage_event(
     quantity: int,
     unit: str,
 ) -> UsageEvent:
-    event_id = str(uuid.uuid4())
-    with session_scope() as session:
-        session.add(
-            UsageEventModel(
-                id=event_id,
-                company_id=company_id,
-                agent_id=agent_id,
-                session_id=session_id,
-                event_type=event_type,
-                quantity=quantity,
-                unit=unit,
-                created_at=_now(),
-            )
-        )
+    created_at = _now()
+    row = {
+        "id": str(uuid.uuid4()),
+        "company_id": company_id,
+        "agent_id": agent_id,
+        "session_id": session_id,
+        "event_type": event_type,
+        "quantity": quantity,
+        "unit": unit,
+        "created_at": created_at,
+    }
+    buffer = _buffer
+    if buffer is not None:
+        record_spend([row])
+        buffer.add(row)
+    else:
+        insert_usage_rows([row])
     logger.info("usage_event %s %s", event_type, quantity)
     return UsageEvent(
-        id=event_id,
+        id=row["id"],
         company_id=company_id,
         agent_id=agent_id,
         session_id=session_id,
         event_type=event_type,
         quantity=quantity,
         unit=unit,
-        created_at=_now().isoformat(),
+        created_at=created_at.isoformat(),
+    )
+
+
+def _to_event(row: UsageEventModel) -> UsageEvent:
+    return UsageEvent(
+        id=row.id,
+        company_id=row.company_id,
+        agent_id=row.agent_id,
+        session_id=row.session_id,
+        event_type=row.event_type,
+        quantity=int(row.quantity),
+        unit=row.unit,
+        created_at=row.created_at.isoformat(),
     )
 
 
 def list_usage_events(company_id: str) -> List[UsageEvent]:
     with session_scope() as session:
-        rows = (
-            session.query(UsageEventModel)
-            .filter(UsageEventModel.company_id == company_id)
-            .all()
-        )
-    return [
-        UsageEvent(
-            id=row.id,
-            company_id=row.company_id,
-            agent_id=row.agent_id,
-            session_id=row.session_id,
-            event_type=row.event_type,
-            quantity=int(row.quantity),
-            unit=row.unit,
-            created_at=row.created_at.isoformat(),
-        )
-        for row in rows
-    ]
-
-
-def summarize_usage(company_id: str) -> Dict[str, int]:
+        rows = session.scalars(select(UsageEventModel).where(UsageEventModel.company_id == company_id)).all()
+    return [_to_event(row) for row in rows]
+
+
+
+def apply_event_costs(
+    company_id: str, start: datetime, end: datetime, unit_costs: Dict[Tuple[str, str], float]
+) -> None:
+    """Set ``cost`` on the period's raw events from per-unit costs keyed by ``(event_type, unit)``.
+
+    One set-based UPDATE per key, so allowances and tiers are spread evenly over
+    the events that consumed them. Costs are deliberately deferred to invoicing:
+    tiers and allowances depend on the whole period's volume, so an event's
+    share is unknown at insert time. Until then, and for usage no rate covers,
+    ``cost`` stays NULL.
+    """
+    with session_scope() as session:
+        for (event_type, unit), unit_cost in unit_costs.items():
+            session.query(UsageEventModel).filter(
+                UsageEventModel.company_id == company_id,
+                UsageEventModel.created_at >= start,
+                UsageEventModel.created_at < end,
+                UsageEventModel.event_type == event_type,
+                UsageEventModel.unit == unit,
+            ).update({"cost": UsageEventModel.quantity * unit_cost}, synchronize_session=False)
+
+
+_SUMMARY_FIELDS = {
+    "llm_tokens_in": "tokens_in",
+    "llm_tokens_out": "tokens_out",
+    "tool_call": "tool_calls",
+    "kb_query": "kb_queries",
+    "audio_seconds": "audio_seconds",
+}
+
+
+def parse_period(period: str) -> Tuple[date, date]:
+    """Return the ``[start, end)`` dates of a ``YYYY-MM`` billing period."""
+    try:
+        year, month = period.split("-")
+        start = date(int(year), int(month), 1)
+    except ValueError as exc:
+        raise SaturnError("BAD_REQUEST", "Invalid period format, expected YYYY-MM") from exc
+    if start.month == 12:
+        end = date(start.year + 1, 1, 1)
+    else:
+        end = date(start.year, start.month + 1, 1)
+    return start, end
+
+
+def _period_range(period: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    if not period:
+        return None, None
+    period_start, period_end = parse_period(period)
+    return datetime.combine(period_start, time.min), datetime.combine(period_end, time.min)
+
+
+def _summary(totals_by_event_type: Dict[str, float]) -> Dict[str, int]:
     totals = {"tokens_in": 0, "tokens_out": 0, "tool_calls": 0, "kb_queries": 0, "audio_seconds": 0}
-    for event in list_usage_events(company_id):
-        if event.event_type == "llm_tokens_in":
-            totals["tokens_in"] += event.quantity
-        elif event.event_type == "llm_tokens_out":
-            totals["tokens_out"] += event.quantity
-        elif event.event_type == "tool_call":
-            totals["tool_calls"] += event.quantity
-        elif event.event_type == "kb_query":
-            totals["kb_queries"] += event.quantity
-        elif event.event_type == "audio_seconds":
-            totals["audio_seconds"] += event.quantity
+    for event_type, quantity in totals_by_event_type.items():
+        field = _SUMMARY_FIELDS.get(event_type)
+        if field:
+            totals[field] += int(quantity)
     return totals
 
 
+def summarize_usage(company_id: str, period: Optional[str] = None) -> Dict[str, int]:
+    """Totals per usage kind for ``period`` (``YYYY-MM``), or all time when omitted."""
+    start, end = _period_range(period)
+    return _summary(rollup_totals(company_id, "event_type", start, end))
+
+
+
 def reset_usage_events() -> None:
     with session_scope() as session:
         session.query(UsageEventModel).delete()
+    reset_usage_rollups()
+    reset_spend_counters()
@@ -1,25 +1,48 @@
+import asyncio
 import os
+import shutil
+import tempfile
 
-os.environ.setdefault("SATURN_DB_URL", "sqlite+pysqlite:///:memory:")
+import pytest
 
-from db.session import init_db, session_scope
+# A file rather than ``:memory:`` so the sync and async engines see the same database.
+# Set before the app is imported, as the engines read it at import; removed by ``_test_database``.
+_DB_DIR = None
+if "SATURN_DB_URL" not in os.environ:
+    _DB_DIR = tempfile.mkdtemp(prefix="saturn-tests-")
+    os.environ["SATURN_DB_URL"] = f"sqlite+pysqlite:///{os.path.join(_DB_DIR, 'saturn.db')}"
+# HTTP tool tests call a local echo server, which tool destination checks refuse by default.
+os.environ.setdefault("SATURN_HTTP_TOOL_ALLOWED_HOSTS", "127.0.0.1")
+
+from common.config import reload_settings
+from common.rbac import reset_rbac_cache
+from db.session import dispose_async_engine, engine, init_db, session_scope
 from models.core import (
     Agent,
     AgentTool,
     ApiKey,
     AuditLog,
+    BillingRun,
+    BillingRunItem,
     ChatSession,
     Company,
+    IdempotencyKey,
     Invoice,
+    Job,
     KbChunk,
     KbDocument,
     Message,
+    PriceBook,
     Role,
     Tool,
     UsageEvent,
+    UsageRollupDaily,
+    UsageRollupHourly,
     User,
     UserRole,
 )
+from services.api_key_cache import reset_api_key_cache
+from tests.helpers import EchoServer
 
 
 def pytest_configure():
@@ -31,19 +54,51 @@ def _truncate_all():
         session.query(Message).delete()
         session.query(ChatSession).delete()
         session.query(UsageEvent).delete()
+        session.query(UsageRollupHourly).delete()
+        session.query(UsageRollupDaily).delete()
+        session.query(Job).delete()
         session.query(AgentTool).delete()
         session.query(Tool).delete()
         session.query(KbChunk).delete()
         session.query(KbDocument).delete()
         session.query(Agent).delete()
         session.query(Invoice).delete()
+        session.query(BillingRunItem).delete()
+        session.query(BillingRun).delete()
+        session.query(PriceBook).delete()
         session.query(AuditLog).delete()
         session.query(ApiKey).delete()
         session.query(UserRole).delete()
         session.query(Role).delete()
         session.query(User).delete()
+        session.query(IdempotencyKey).delete()
         session.query(Company).delete()
 
 
 def pytest_runtest_setup():
     _truncate_all()
+    reset_api_key_cache()
+    reset_rbac_cache()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _test_database():
+    yield
+    asyncio.run(dispose_async_engine())
+    engine.dispose()
+    if _DB_DIR is not None:
+        shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _reload_settings():
+    # Autouse fixtures tear down after ``monkeypatch``, so this sees the restored environment.
+    yield
+    reload_settings()
+
+
+@pytest.fixture(scope="session")
+def http_stub():
+    server = EchoServer().start()
+    yield server
+    server.stop()
@@ -1,9 +1,21 @@
+import json
+import threading
+import time
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
+from common.config import reload_settings
 from db.session import session_scope
 from models.core import Company
 
 
+def set_env(monkeypatch, key: str, value: str) -> None:
+    """Set an environment variable for the test and reload settings so it takes effect."""
+    monkeypatch.setenv(key, value)
+    reload_settings()
+
+
 def ensure_company(company_id: str, name: str = "Test Co") -> None:
     with session_scope() as session:
         existing = session.query(Company).filter(Company.id == company_id).first()
@@ -18,3 +30,94 @@ def ensure_company(company_id: str, name: str = "Test Co") -> None:
                 created_at=datetime.utcnow(),
             )
         )
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        return
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        parsed = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if parsed.path.startswith("/status/"):
+            self._send_json(int(parsed.path.rsplit("/", 1)[1]), {"error": "stub"})
+            return
+        if parsed.path == "/slow":
+            time.sleep(float(parse_qs(parsed.query).get("seconds", ["1"])[0]))
+        if parsed.path == "/large":
+            size = int(parse_qs(parsed.query).get("bytes", ["65536"])[0])
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            chunk = b"x" * 4096
+            sent = 0
+            while sent < size:
+                piece = chunk[: min(len(chunk), size - sent)]
+                self.wfile.write(f"{len(piece):x}\r\n".encode("ascii") + piece + b"\r\n")
+                sent += len(piece)
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        self._send_json(
+            200,
+            {
+                "method": self.command,
+                "path": parsed.path,
+                "query": {key: values[0] for key, values in parse_qs(parsed.query).items()},
+                "headers": {key.lower(): value for key, value in self.headers.items()},
+                "json": json.loads(raw) if raw else None,
+            },
+        )
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_PATCH = _handle
+    do_DELETE = _handle
+
+
+class EchoServer:
+    """Local stand-in for HTTP tool endpoints; echoes each request back as JSON."""
+
+    def __init__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "EchoServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def cpu_sum_squares(payload):
+    return {"status": "ok", "total": sum(i * i for i in range(int(payload["n"])))}
+
+
+def cpu_spin(payload):
+    time.sleep(float(payload.get("seconds", 5)))
+    return {"status": "ok"}
+
+
+def cpu_allocate(payload):
+    blob = bytearray(int(payload["megabytes"]) * 1024 * 1024)
+    return {"status": "ok", "size": len(blob)}
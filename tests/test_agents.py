@@ -1,10 +1,18 @@
+import asyncio
+
 import jwt
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
-from services.agent_service import reset_agents
+from common.auth import AuthContext
+from common.errors import SaturnError
+from db.session import dispose_async_engine
+from services.agent_service import create_agent, get_agent, get_agent_async, list_agents_async, reset_agents
+from services.api_key_service import create_api_key
 from services.audit_service import reset_audit_logs
-from tests.helpers import ensure_company
+from services.auth_service import authenticate_async
+from tests.helpers import ensure_company, set_env
 
 
 def _auth_headers():
@@ -76,3 +84,37 @@ def test_list_agents_by_type():
     assert list_resp.status_code == 200
     agents = list_resp.json()["data"]["agents"]
     assert any(agent["type"] == "voice" for agent in agents)
+
+
+def test_async_service_variants_share_the_sync_database():
+    ensure_company("company-1")
+    actor = AuthContext(auth_type="jwt", company_id="company-1", user_id="user-1", role="admin", scopes=[])
+    agent = create_agent(
+        "company-1",
+        {"name": "Async Agent", "type": "chat", "model_config": {}, "behavior_config": {}},
+        actor,
+    )
+    token = create_api_key("company-1", "async", ["agents:read"])
+
+    async def scenario():
+        assert await get_agent_async("company-1", agent.id) == get_agent("company-1", agent.id)
+        assert [record.id for record in await list_agents_async("company-1", "chat", None)] == [agent.id]
+        with pytest.raises(SaturnError):
+            await get_agent_async("company-2", agent.id)
+        return await authenticate_async(f"Bearer {token}")
+
+    auth = asyncio.run(scenario())
+    assert auth.company_id == "company-1" and auth.auth_type == "api_key"
+
+
+def test_async_variants_fall_back_to_sync_on_in_memory_sqlite(monkeypatch):
+    ensure_company("company-1")
+    headers = _auth_headers()
+    token = create_api_key("company-1", "memory", ["agents:read"])
+    # Only the URL the async engine would use changes; the sync engine keeps the test database.
+    asyncio.run(dispose_async_engine())
+    set_env(monkeypatch, "SATURN_ASYNC_DB_URL", "sqlite+aiosqlite:///:memory:")
+
+    auth = asyncio.run(authenticate_async(f"Bearer {token}"))
+    assert auth.company_id == "company-1"
+    assert TestClient(app).get("/agents", headers=headers).status_code == 200
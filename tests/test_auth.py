@@ -1,19 +1,31 @@
+import asyncio
 import hashlib
+import threading
+import time
+
 import jwt
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
+from app import main
 from app.main import app
-from models.core import ApiKey
-from db.session import session_scope
-from tests.helpers import ensure_company
-
-
-def _set_env(monkeypatch, key, value):
-    monkeypatch.setenv(key, value)
+from common.auth import AuthContext
+from common.config import get_settings
+from common.errors import SaturnError
+from common.metrics import as_dict, reset_metrics
+from common.rbac import invalidate_roles, require_permission
+from models.core import ApiKey, Role
+from db.session import engine, session_scope
+from services import api_key_cache, auth_service
+from services.api_key_service import create_api_key, list_api_keys, revoke_api_key
+from services.auth_service import flush_last_used, verify_api_key, verify_jwt
+from services.role_service import create_role, update_role
+from tests.helpers import ensure_company, set_env
 
 
 def test_auth_me_with_jwt(monkeypatch):
-    _set_env(monkeypatch, "SATURN_JWT_SECRET", "test-secret")
+    set_env(monkeypatch, "SATURN_JWT_SECRET", "test-secret")
     ensure_company("company-1")
     token = jwt.encode(
         {"company_id": "company-1", "user_id": "user-1", "role": "admin"},
@@ -50,3 +62,154 @@ def test_auth_api_key(monkeypatch):
     body = response.json()
     assert body["data"]["company_id"] == "company-2"
     assert "chat:write" in body["data"]["scopes"]
+
+
+def test_api_key_verification_is_cached_until_revoked():
+    ensure_company("company-2")
+    token = create_api_key("company-2", "gateway", ["chat:write"])
+    key_id = list_api_keys("company-2")[0].id
+    assert verify_api_key(token).scopes == ["chat:write"]
+    with session_scope() as session:
+        session.query(ApiKey).filter(ApiKey.id == key_id).update({"scopes": ["usage:write"]})
+        assert session.get(ApiKey, key_id).last_used_at is None
+    assert verify_api_key(token).scopes == ["chat:write"]
+
+    assert flush_last_used() == 1
+    assert flush_last_used() == 0
+    with session_scope() as session:
+        assert session.get(ApiKey, key_id).last_used_at is not None
+
+    revoke_api_key("company-2", key_id)
+    with pytest.raises(SaturnError):
+        verify_api_key(token)
+
+
+def test_last_used_survives_a_failed_flush_and_revocation_forgets_the_key(monkeypatch):
+    ensure_company("company-2")
+    token = create_api_key("company-2", "flaky", ["chat:write"])
+    key_id = next(key.id for key in list_api_keys("company-2") if key.name == "flaky")
+    verify_api_key(token)
+
+    def unavailable():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(auth_service, "session_scope", unavailable)
+    with pytest.raises(RuntimeError):
+        flush_last_used()
+    monkeypatch.undo()
+    assert flush_last_used() == 1
+    with session_scope() as session:
+        assert session.get(ApiKey, key_id).last_used_at is not None
+
+    assert key_id in api_key_cache._last_recorded
+    revoke_api_key("company-2", key_id)
+    assert key_id not in api_key_cache._last_recorded
+
+
+def test_verified_jwts_are_cached_until_exp_and_secret_rotation(monkeypatch):
+    reset_metrics()
+    token = jwt.encode({"company_id": "company-1", "role": "admin", "exp": int(time.time()) + 60}, "change-me")
+    assert verify_jwt(token).company_id == "company-1"
+    assert verify_jwt(token).company_id == "company-1"
+    metrics = as_dict()
+    assert (metrics["jwt_cache_hits"], metrics["jwt_cache_misses"], metrics["jwt_cache_hit_rate"]) == (1, 1, 0.5)
+
+    expired = jwt.encode({"company_id": "company-1", "exp": int(time.time()) - 1}, "change-me")
+    with pytest.raises(SaturnError):
+        verify_jwt(expired)
+    set_env(monkeypatch, "SATURN_JWT_SECRET", "rotated")
+    with pytest.raises(SaturnError):
+        verify_jwt(token)
+
+
+def test_verification_key_follows_the_settings_it_was_built_from(monkeypatch):
+    old_settings = get_settings()
+    old_key = auth_service._verification_key(old_settings)
+    set_env(monkeypatch, "SATURN_JWT_SECRET", "rotated")
+    new_settings = get_settings()
+    # A request that read the old settings before the reload must not pin its key.
+    assert auth_service._verification_key(old_settings) == old_key
+    assert auth_service._verification_key(new_settings) != old_key
+    assert verify_jwt(jwt.encode({"company_id": "company-1"}, "rotated")).company_id == "company-1"
+
+
+def test_reload_signal_is_skipped_off_the_main_thread():
+    errors = []
+
+    async def install():
+        main._install_reload_signal()
+
+    def start_in_thread():
+        try:
+            asyncio.run(install())
+        except Exception as exc:
+            errors.append(exc)
+
+    worker = threading.Thread(target=start_in_thread)
+    worker.start()
+    worker.join()
+    assert errors == []
+
+
+def test_rbac_compiles_company_roles_with_wildcards_and_invalidates():
+    ensure_company("company-1")
+    role = create_role("company-1", "support", ["kb:*", "*:read"])
+    support = AuthContext(auth_type="jwt", company_id="company-1", user_id="u", role="support", scopes=[])
+    require_permission(support, "kb:write")
+    require_permission(support, "agents:read")
+    with pytest.raises(SaturnError):
+        require_permission(support, "agents:write")
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        for _ in range(100):
+            require_permission(support, "kb:read")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+    update_role("company-1", role.id, {"agents:write": True})
+    require_permission(support, "agents:write")
+    with pytest.raises(SaturnError):
+        require_permission(support, "kb:write")
+    with pytest.raises(SaturnError):
+        create_role("company-1", "broken", ["kb"])
+
+
+def test_async_agent_reads_check_company_roles_without_the_sync_engine():
+    ensure_company("company-1")
+    create_role("company-1", "reader", ["agents:read"])
+    create_role("company-1", "nobody", ["kb:read"])
+    client = TestClient(app)
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def headers(role):
+        return {"Authorization": f"Bearer {jwt.encode({'company_id': 'company-1', 'role': role}, 'change-me')}"}
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.get("/agents", headers=headers("reader")).status_code == 200
+        assert client.get("/agents", headers=headers("nobody")).status_code == 403
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+
+def test_invalid_stored_patterns_are_skipped_not_fatal():
+    ensure_company("company-1")
+    role = create_role("company-1", "legacy", ["kb:read"])
+    with session_scope() as session:
+        session.query(Role).filter(Role.id == role.id).update({"permissions": ["kb:read", "kb", 7]})
+    invalidate_roles("company-1")
+    legacy = AuthContext(auth_type="jwt", company_id="company-1", user_id="u", role="legacy", scopes=[])
+    require_permission(legacy, "kb:read")
+    admin = AuthContext(auth_type="jwt", company_id="company-1", user_id="u", role="admin", scopes=[])
+    require_permission(admin, "agents:write")
@@ -1,12 +1,35 @@
-from datetime import datetime, timezone
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
 import jwt
+import pytest
+from alembic import command
+from alembic.config import Config
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
 
 from app.main import app
-from services.billing_service import reset_invoices
-from services.usage_service import record_usage_event, reset_usage_events
-from tests.helpers import ensure_company
+from common.errors import SaturnError
+from db.session import engine, session_scope
+from models.core import BillingRun, BillingRunItem, UsageEvent
+from services import spend_counters
+from services.billing_run import claim_run, create_run, execute_run, get_run, reset_billing_runs, run_billing
+from services.billing_service import generate_invoice, list_invoices, preview_repricing, reset_invoices
+from services.cost_estimate_cache import lookup_estimate, reset_cost_estimates, store_estimate
+from services.pricing import compile_price_book, create_price_book, reset_price_books
+from services.spend_counters import check_budget, reconcile_counters, seed_counters, spend_snapshot
+from services.usage_rollups import reset_usage_rollups
+from services.usage_service import (
+    insert_usage_rows,
+    record_usage_event,
+    reset_usage_events,
+    start_usage_buffer,
+    stop_usage_buffer,
+)
+from tests.helpers import ensure_company, set_env
 
 
 def _auth_headers():
@@ -57,3 +80,368 @@ def test_generate_invoice_and_summary():
     fetch = client.get(f"/invoices/{invoice_id}", headers=_auth_headers())
     assert fetch.status_code == 200
     assert fetch.json()["data"]["status"] == "draft"
+
+
+def test_summary_and_invoice_are_bounded_to_the_period():
+    reset_invoices()
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    rows = [
+        ("2025-11-30T23:59:00", 40),
+        ("2025-12-01T00:00:00", 100),
+        ("2025-12-31T23:59:00", 50),
+        ("2026-01-01T00:00:00", 7),
+    ]
+    insert_usage_rows(
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "company_id": "company-1",
+                "agent_id": agent_id,
+                "session_id": None,
+                "event_type": "llm_tokens_in",
+                "quantity": quantity,
+                "unit": "tokens",
+                "created_at": datetime.fromisoformat(created_at),
+            }
+            for created_at, quantity in rows
+        ]
+    )
+    summary = client.get("/usage/summary?period=2025-12", headers=_auth_headers())
+    assert summary.json()["data"]["tokens_in"] == 150
+    generate = client.post("/invoices/generate?period=2025-12", headers=_auth_headers())
+    invoice_id = generate.json()["data"]["invoice_id"]
+    invoice = client.get(f"/invoices/{invoice_id}", headers=_auth_headers()).json()["data"]
+    assert invoice["line_items"][0]["quantity"] == "150"
+    bad = client.get("/usage/summary?period=december", headers=_auth_headers())
+    assert bad.status_code == 400
+
+
+def test_summary_is_read_only_and_invoice_generation_is_idempotent():
+    reset_invoices()
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    period = _current_period()
+    record_usage_event("company-1", agent_id, None, "tool_call", 3, "calls")
+    for _ in range(3):
+        summary = client.get(f"/usage/summary?period={period}", headers=_auth_headers())
+        assert summary.json()["data"]["estimated_cost"] == 0.03
+    assert list_invoices("company-1") == []
+
+    record_usage_event("company-1", agent_id, None, "tool_call", 2, "calls")
+    summary = client.get(f"/usage/summary?period={period}", headers=_auth_headers())
+    assert summary.json()["data"]["estimated_cost"] == 0.05
+
+    first = client.post(f"/invoices/generate?period={period}", headers=_auth_headers()).json()["data"]
+    record_usage_event("company-1", agent_id, None, "tool_call", 5, "calls")
+    second = client.post(f"/invoices/generate?period={period}", headers=_auth_headers()).json()["data"]
+    assert first["invoice_id"] == second["invoice_id"]
+    assert second["total"] == 0.1
+    assert len(list_invoices("company-1")) == 1
+
+
+def test_cost_estimate_cache_evicts_least_recently_used_entries():
+    reset_cost_estimates()
+    store_estimate("company-1", "2026-01", "january", 60, max_entries=2)
+    store_estimate("company-1", "2026-02", "february", 60, max_entries=2)
+    assert lookup_estimate("company-1", "2026-01") == "january"
+    store_estimate("company-2", "2026-01", "other", 60, max_entries=2)
+    assert lookup_estimate("company-1", "2026-02") is None
+    assert lookup_estimate("company-1", "2026-01") == "january"
+    assert lookup_estimate("company-2", "2026-01") == "other"
+    reset_cost_estimates()
+
+
+def test_billing_run_invoices_all_tenants_and_resumes(monkeypatch):
+    reset_invoices()
+    reset_billing_runs()
+    client = TestClient(app)
+    for company_id in ("company-1", "company-2", "company-3"):
+        ensure_company(company_id)
+    run = create_run("2025-12")
+    with session_scope() as session:
+        session.add(BillingRunItem(run_id=run.id, company_id="company-2", status="succeeded", duration_ms=1.0))
+
+    report = run_billing("2025-12", workers=2)
+    assert report["run_id"] == run.id
+    assert report["resumed_from_checkpoint"] == 1
+    assert report["succeeded"] == 3
+    assert get_run(run.id).status == "succeeded"
+    assert len(list_invoices("company-2")) == 0
+    assert len(list_invoices("company-3")) == 1
+
+    forbidden = client.post("/admin/billing/runs?period=2025-12", headers=_auth_headers())
+    assert forbidden.status_code == 403
+    set_env(monkeypatch, "SATURN_PLATFORM_COMPANY_ID", "company-1")
+    started = client.post("/admin/billing/runs?period=2025-12", headers=_auth_headers())
+    run_id = started.json()["data"]["run_id"]
+    assert run_id != run.id
+    for _ in range(200):
+        data = client.get(f"/admin/billing/runs/{run_id}", headers=_auth_headers()).json()["data"]
+        if data["status"] != "running":
+            break
+        time.sleep(0.05)
+    assert data["status"] == "succeeded"
+    assert len(list_invoices("company-1")) == 1
+
+
+def test_billing_run_held_by_a_live_executor_is_not_resumed():
+    reset_invoices()
+    reset_billing_runs()
+    ensure_company("company-1")
+    run = create_run("2025-11", owner="other-host:1:abcd")
+    assert not claim_run(run.id, "this-host:2:ef01")
+    with pytest.raises(SaturnError) as exc:
+        run_billing("2025-11")
+    assert exc.value.details == {"run_id": run.id}
+
+    # The other executor died: once its lease lapses exactly one claimer takes over.
+    with session_scope() as session:
+        session.query(BillingRun).filter(BillingRun.id == run.id).update(
+            {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+        )
+    assert claim_run(run.id, "this-host:2:ef01")
+    assert not claim_run(run.id, "third-host:3:0000")
+    report = execute_run(run.id, "this-host:2:ef01")
+    assert report["run_id"] == run.id
+    assert get_run(run.id).status == "succeeded"
+
+
+PLAN_RATES = [
+    {"event_type": "llm_tokens_in", "unit": "tokens", "mode": "flat", "price": 0.001, "included": 100},
+    {
+        "unit": "tokens",
+        "mode": "tiered",
+        "tiers": [{"up_to": 1000, "price": 0.01}, {"up_to": None, "price": 0.001}],
+    },
+    {
+        "unit": "calls",
+        "mode": "volume",
+        "tiers": [{"up_to": 10, "price": 1.0}, {"up_to": None, "price": 0.5}],
+    },
+]
+
+
+def test_price_book_tiers_volume_allowances_and_event_type_rates():
+    book = compile_price_book(PLAN_RATES)
+    amounts = book.price(
+        [("llm_tokens_in", "tokens"), ("llm_tokens_out", "tokens"), ("tool_call", "calls"), ("kb_query", "calls")],
+        [600, 3000, 10, 20],
+    )
+    assert amounts.tolist() == pytest.approx([0.5, 12.0, 10.0, 10.0])
+    with pytest.raises(SaturnError):
+        compile_price_book([{"unit": "calls", "mode": "tiered", "tiers": [{"up_to": 5, "price": 1}]}])
+
+
+def test_invoice_uses_plan_price_book_and_sets_event_costs():
+    reset_invoices()
+    reset_usage_events()
+    reset_price_books()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    for company_id in ("company-1", "company-2"):
+        ensure_company(company_id)
+    create_price_book("starter", PLAN_RATES, effective_from=datetime(2025, 1, 1))
+    rows = [("company-1", 400), ("company-1", 200), ("company-2", 50)]
+    insert_usage_rows(
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "company_id": company_id,
+                "agent_id": agent_id,
+                "session_id": None,
+                "event_type": "llm_tokens_in",
+                "quantity": quantity,
+                "unit": "tokens",
+                "created_at": datetime(2025, 12, 10),
+            }
+            for company_id, quantity in rows
+        ]
+    )
+    invoice = generate_invoice("company-1", "2025-12")
+    assert invoice.total == 0.5
+    assert invoice.line_items[0]["amount"] == "0.5"
+    with session_scope() as session:
+        costs = sorted(
+            row.cost for row in session.query(UsageEvent).filter(UsageEvent.company_id == "company-1")
+        )
+    assert costs == pytest.approx([200 * 0.5 / 600, 400 * 0.5 / 600])
+
+    proposed_rates = [{"unit": "tokens", "mode": "flat", "price": 0.01}]
+    preview = preview_repricing("2025-12", "starter", proposed_rates)
+    assert preview["company-1"] == {"current": 0.5, "proposed": 6.0}
+    assert preview["company-2"] == {"current": 0.0, "proposed": 0.5}
+
+
+def test_unpriced_usage_is_flagged_not_billed_as_free():
+    reset_invoices()
+    reset_usage_events()
+    reset_price_books()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    create_price_book("starter", PLAN_RATES, effective_from=datetime(2025, 1, 1))
+    insert_usage_rows(
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "company_id": "company-1",
+                "agent_id": agent_id,
+                "session_id": None,
+                "event_type": event_type,
+                "quantity": quantity,
+                "unit": unit,
+                "created_at": datetime(2025, 12, 10),
+            }
+            for event_type, quantity, unit in [("llm_tokens_in", 600, "tokens"), ("audio_seconds", 30, "seconds")]
+        ]
+    )
+    invoice = generate_invoice("company-1", "2025-12")
+    assert invoice.total == 0.5
+    assert invoice.unpriced_usage == [{"item": "audio_seconds", "unit": "seconds", "quantity": "30"}]
+    with session_scope() as session:
+        audio = session.query(UsageEvent).filter(UsageEvent.event_type == "audio_seconds").one()
+    assert audio.cost is None
+
+    with pytest.raises(SaturnError) as exc:
+        preview_repricing("2025-12", "starter", [{"unit": "tokens", "mode": "flat", "price": 0.01}])
+    assert exc.value.details == {"unpriced": ["audio_seconds:seconds"]}
+
+
+def test_spend_counters_track_usage_and_block_over_quota_turns(monkeypatch):
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    set_env(monkeypatch, "SATURN_PLATFORM_COMPANY_ID", "company-1")
+    record_usage_event("company-1", agent_id, None, "tool_call", 3, "calls")
+
+    counters = client.get("/usage/counters", headers=_auth_headers()).json()["data"]
+    assert (counters["calls"], counters["estimated_cost"], counters["quota"]) == (3, 0.03, {})
+    record_usage_event("company-1", agent_id, None, "llm_tokens_in", 500, "tokens")
+    counters = client.get("/usage/counters", headers=_auth_headers()).json()["data"]
+    assert (counters["tokens"], counters["estimated_cost"]) == (500, 0.03)
+
+    quota = client.put("/admin/companies/company-1/quota", json={"calls": 5}, headers=_auth_headers())
+    assert quota.json()["data"]["quota"] == {"calls": 5}
+    chat = client.post(f"/agents/{agent_id}/chat", json={"message": "hi"}, headers=_auth_headers())
+    assert chat.status_code == 200
+    record_usage_event("company-1", agent_id, None, "tool_call", 2, "calls")
+    blocked = client.post(f"/agents/{agent_id}/chat", json={"message": "hi"}, headers=_auth_headers())
+    assert blocked.status_code == 402
+    assert blocked.json()["error"]["code"] == "QUOTA_EXCEEDED"
+
+    with session_scope() as session:
+        session.query(UsageEvent).filter(UsageEvent.event_type == "tool_call").delete()
+    reset_usage_rollups()
+    assert reconcile_counters() == 1
+    assert spend_snapshot("company-1").remaining == {"calls": 5}
+    assert client.post(f"/agents/{agent_id}/chat", json={"message": "hi"}, headers=_auth_headers()).status_code == 200
+
+
+def test_reconcile_keeps_buffered_and_concurrent_usage(monkeypatch):
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    record_usage_event("company-1", agent_id, None, "tool_call", 1, "calls")
+    assert spend_snapshot("company-1").calls == 1
+
+    set_env(monkeypatch, "SATURN_USAGE_BUFFER_FLUSH_INTERVAL_SECONDS", "3600")
+    start_usage_buffer()
+    try:
+        record_usage_event("company-1", agent_id, None, "tool_call", 2, "calls")
+        assert reconcile_counters() == 1
+        assert spend_snapshot("company-1").calls == 3
+    finally:
+        stop_usage_buffer()
+
+    read = spend_counters._read_usage
+    writers = []
+
+    def read_while_another_worker_thread_commits(keys):
+        writer = threading.Thread(
+            target=record_usage_event, args=("company-1", agent_id, None, "tool_call", 4, "calls")
+        )
+        writer.start()
+        writers.append(writer)
+        return read(keys)
+
+    monkeypatch.setattr(spend_counters, "_read_usage", read_while_another_worker_thread_commits)
+    reconcile_counters()
+    writers[0].join()
+    monkeypatch.undo()
+    assert spend_snapshot("company-1").calls == 7
+    reconcile_counters()
+    assert spend_snapshot("company-1").calls == 7
+
+
+def test_seeding_counters_reads_all_companies_in_a_fixed_number_of_queries():
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    for company_id in ("company-2", "company-3", "company-4"):
+        ensure_company(company_id)
+    record_usage_event("company-1", agent_id, None, "tool_call", 2, "calls")
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert seed_counters() == 4
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert len(statements) <= 5
+    assert spend_snapshot("company-1").calls == 2
+    assert spend_snapshot("company-3").calls == 0
+
+
+def test_cost_quota_rejects_usage_without_a_price(monkeypatch):
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    set_env(monkeypatch, "SATURN_PLATFORM_COMPANY_ID", "company-1")
+    client.put("/admin/companies/company-1/quota", json={"cost": 100.0}, headers=_auth_headers())
+    try:
+        check_budget("company-1")
+        record_usage_event("company-1", agent_id, None, "video_frames", 10, "frames")
+        with pytest.raises(SaturnError) as exc:
+            check_budget("company-1")
+        assert exc.value.code == "QUOTA_EXCEEDED"
+        assert exc.value.details["unpriced"] == ["video_frames:frames"]
+    finally:
+        client.put("/admin/companies/company-1/quota", json={}, headers=_auth_headers())
+
+
+def test_unique_period_migration_keeps_one_invoice_per_period(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'saturn.db'}"
+    set_env(monkeypatch, "SATURN_DB_URL", url)
+    config = Config(str(Path(__file__).resolve().parents[1] / "alembic.ini"))
+    command.upgrade(config, "0006")
+
+    rows = [
+        ("old-draft", "2026-03-01", "draft", "2026-03-01 10:00:00"),
+        ("new-draft", "2026-03-01", "draft", "2026-03-05 10:00:00"),
+        ("april-draft", "2026-04-01", "draft", "2026-04-02 10:00:00"),
+        ("april-issued", "2026-04-01", "issued", "2026-04-01 10:00:00"),
+        ("may-draft", "2026-05-01", "draft", "2026-05-02 10:00:00"),
+    ]
+    migrated = create_engine(url)
+    with migrated.begin() as connection:
+        connection.execute(text("INSERT INTO companies (id, name, status) VALUES ('company-1', 'Test Co', 'active')"))
+        for invoice_id, start, status, created_at in rows:
+            connection.execute(
+                text(
+                    "INSERT INTO invoices (id, company_id, period_start, period_end, currency, subtotal, tax, total,"
+                    " status, line_items_json, created_at) VALUES (:id, 'company-1', :start, :start, 'USD',"
+                    " 0, 0, 0, :status, '[]', :created_at)"
+                ),
+                {"id": invoice_id, "start": start, "status": status, "created_at": created_at},
+            )
+    command.upgrade(config, "head")
+
+    with migrated.connect() as connection:
+        kept = connection.execute(text("SELECT id FROM invoices ORDER BY period_start")).scalars().all()
+    migrated.dispose()
+    assert kept == ["new-draft", "april-issued", "may-draft"]
@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+from fastapi.testclient import TestClient
+
+from app.main import app
+from common.metrics import reset_metrics
+from services.builtin_tools import close_builtin_pool, register_builtin, unregister_builtin
+from services.tool_service import reset_tools
+from tests.helpers import cpu_allocate, cpu_spin, cpu_sum_squares, ensure_company, set_env
+
+
+def _auth_headers():
+    ensure_company("company-1")
+    token = jwt.encode(
+        {"company_id": "company-1", "user_id": "user-1", "role": "admin"},
+        "change-me",
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _create_builtin(client, builtin):
+    payload = {
+        "name": f"builtin.{builtin}",
+        "type": "builtin",
+        "description": "Builtin tool",
+        "input_schema": {"type": "object", "properties": {}, "required": []},
+        "config": {"builtin": builtin},
+    }
+    return client.post("/tools", json=payload, headers=_auth_headers()).json()["data"]["tool_id"]
+
+
+def test_builtin_defaults_to_echo():
+    reset_tools()
+    client = TestClient(app)
+    payload = {
+        "name": "builtin.echo",
+        "type": "builtin",
+        "description": "Echo",
+        "input_schema": {"type": "object", "properties": {}, "required": []},
+        "config": {},
+    }
+    tool_id = client.post("/tools", json=payload, headers=_auth_headers()).json()["data"]["tool_id"]
+    resp = client.post(f"/tools/{tool_id}/test", json={"input": {"a": 1}}, headers=_auth_headers())
+    assert resp.json()["data"]["result"] == {"status": "ok", "echo": {"a": 1}}
+
+
+def test_cpu_bound_builtin_runs_in_process_pool(monkeypatch):
+    set_env(monkeypatch, "SATURN_BUILTIN_POOL_WORKERS", "1")
+    set_env(monkeypatch, "SATURN_BUILTIN_MEMORY_LIMIT_MB", "256")
+    close_builtin_pool()
+    reset_tools()
+    reset_metrics()
+    register_builtin("test.sum", cpu_sum_squares, cpu_bound=True)
+    register_builtin("test.spin", cpu_spin, cpu_bound=True, timeout_seconds=0.5)
+    register_builtin("test.allocate", cpu_allocate, cpu_bound=True)
+    client = TestClient(app)
+    try:
+        sum_tool = _create_builtin(client, "test.sum")
+        resp = client.post(f"/tools/{sum_tool}/test", json={"input": {"n": 1000}}, headers=_auth_headers())
+        assert resp.status_code == 200
+        assert resp.json()["data"]["result"]["total"] == sum(i * i for i in range(1000))
+        assert client.get("/metrics").json()["data"]["builtin_pool_workers"] == 1
+
+        spin_tool = _create_builtin(client, "test.spin")
+        resp = client.post(f"/tools/{spin_tool}/test", json={"input": {"seconds": 30}}, headers=_auth_headers())
+        assert resp.status_code == 500
+        assert resp.json()["error"]["message"] == "Builtin tool timed out"
+
+        alloc_tool = _create_builtin(client, "test.allocate")
+        resp = client.post(
+            f"/tools/{alloc_tool}/test", json={"input": {"megabytes": 1024}}, headers=_auth_headers()
+        )
+        assert resp.status_code == 500
+        assert resp.json()["error"]["code"] == "TOOL_EXECUTION_FAILED"
+
+        resp = client.post(f"/tools/{sum_tool}/test", json={"input": {"n": 10}}, headers=_auth_headers())
+        assert resp.json()["data"]["result"]["total"] == 285
+    finally:
+        for name in ("test.sum", "test.spin", "test.allocate"):
+            unregister_builtin(name)
+        close_builtin_pool()
+
+
+def test_timeout_kills_only_the_worker_running_the_call(monkeypatch):
+    set_env(monkeypatch, "SATURN_BUILTIN_POOL_WORKERS", "2")
+    close_builtin_pool()
+    reset_tools()
+    reset_metrics()
+    register_builtin("test.spin", cpu_spin, cpu_bound=True, timeout_seconds=0.5)
+    register_builtin("test.slow", cpu_spin, cpu_bound=True, timeout_seconds=10)
+    client = TestClient(app)
+    try:
+        spin_tool = _create_builtin(client, "test.spin")
+        slow_tool = _create_builtin(client, "test.slow")
+
+        def call(tool_id, seconds):
+            return client.post(
+                f"/tools/{tool_id}/test", json={"input": {"seconds": seconds}}, headers=_auth_headers()
+            )
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            slow = executor.submit(call, slow_tool, 2)
+            stuck = executor.submit(call, spin_tool, 30)
+            assert stuck.result().json()["error"]["message"] == "Builtin tool timed out"
+            assert slow.result().json()["data"]["result"] == {"status": "ok"}
+        assert call(spin_tool, 0).json()["data"]["result"] == {"status": "ok"}
+
+        reset_metrics()
+        assert client.get("/metrics").json()["data"]["builtin_pool_workers"] == 0
+    finally:
+        for name in ("test.spin", "test.slow"):
+            unregister_builtin(name)
+        close_builtin_pool()
+
+
+def test_unknown_builtin_fails():
+    reset_tools()
+    client = TestClient(app)
+    tool_id = _create_builtin(client, "missing.builtin")
+    resp = client.post(f"/tools/{tool_id}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 500
+    assert resp.json()["error"]["code"] == "TOOL_EXECUTION_FAILED"
@@ -10,3 +10,21 @@ def test_health_includes_request_id():
     body = response.json()
     assert body["data"]["status"] == "ok"
     assert "request_id" in body["meta"]
+
+
+def test_request_id_is_echoed_and_public_paths_skip_auth():
+    client = TestClient(app)
+    response = client.get("/health", headers={"X-Request-Id": "req-123", "Authorization": "Bearer not-a-token"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-Id"] == "req-123"
+    assert response.json()["meta"]["request_id"] == "req-123"
+
+
+def test_invalid_credentials_get_the_error_envelope():
+    client = TestClient(app)
+    response = client.get("/agents", headers={"X-Request-Id": "req-456", "Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+    assert response.headers["X-Request-Id"] == "req-456"
+    body = response.json()
+    assert body["error"]["code"] == "AUTH_INVALID"
+    assert body["meta"]["request_id"] == "req-456"
@@ -0,0 +1,172 @@
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from fastapi.testclient import TestClient
+
+from app.main import app
+from db.session import session_scope
+from models.core import IdempotencyKey
+from schemas.chat import ChatRequest
+from services.agent_service import reset_agents
+from services.audit_service import reset_audit_logs
+from services.idempotency_service import (
+    request_fingerprint,
+    reset_idempotency_keys,
+    start_key_purger,
+    stop_key_purger,
+)
+from services.session_service import reset_sessions
+from services.tool_service import list_tools, reset_tools
+from services.usage_service import list_usage_events, reset_usage_events
+from tests.helpers import ensure_company, set_env
+
+
+def _auth_headers(idempotency_key=None):
+    ensure_company("company-1")
+    token = jwt.encode(
+        {"company_id": "company-1", "user_id": "user-1", "role": "admin"},
+        "change-me",
+        algorithm="HS256",
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    return headers
+
+
+def _create_agent(client):
+    payload = {
+        "name": "Idempotent Agent",
+        "type": "chat",
+        "status": "active",
+        "model_config": {"provider": "openai", "model": "gpt-test"},
+        "behavior_config": {"system_prompt": "hi"},
+    }
+    response = client.post("/agents", json=payload, headers=_auth_headers())
+    return response.json()["data"]["agent_id"]
+
+
+def test_chat_retry_with_same_key_replays_response():
+    reset_agents()
+    reset_audit_logs()
+    reset_sessions()
+    reset_usage_events()
+    reset_idempotency_keys()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+
+    first = client.post(
+        f"/agents/{agent_id}/chat",
+        json={"message": "hello"},
+        headers=_auth_headers("turn-1"),
+    )
+    second = client.post(
+        f"/agents/{agent_id}/chat",
+        json={"message": "hello"},
+        headers=_auth_headers("turn-1"),
+    )
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json()["data"] == first.json()["data"]
+    events = list_usage_events("company-1")
+    assert len([event for event in events if event.event_type == "llm_tokens_in"]) == 1
+
+
+def test_key_reuse_with_different_payload_conflicts():
+    reset_agents()
+    reset_audit_logs()
+    reset_sessions()
+    reset_usage_events()
+    reset_idempotency_keys()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+
+    client.post(
+        f"/agents/{agent_id}/chat",
+        json={"message": "hello"},
+        headers=_auth_headers("turn-2"),
+    )
+    conflict = client.post(
+        f"/agents/{agent_id}/chat",
+        json={"message": "something else"},
+        headers=_auth_headers("turn-2"),
+    )
+    assert conflict.status_code == 409
+    assert conflict.json()["error"]["code"] == "IDEMPOTENCY_CONFLICT"
+
+
+def test_tool_create_with_same_key_creates_once():
+    reset_audit_logs()
+    reset_tools()
+    reset_idempotency_keys()
+    client = TestClient(app)
+    payload = {
+        "name": "crm.create_lead",
+        "type": "http",
+        "description": "Create a lead",
+        "input_schema": {"type": "object", "properties": {}, "required": []},
+        "config": {"method": "POST", "url": "https://example.test"},
+    }
+    first = client.post("/tools", json=payload, headers=_auth_headers("tool-1"))
+    second = client.post("/tools", json=payload, headers=_auth_headers("tool-1"))
+    assert first.json()["data"]["tool_id"] == second.json()["data"]["tool_id"]
+    assert len(list_tools("company-1")) == 1
+
+
+def test_retry_takes_over_a_key_whose_owner_crashed():
+    reset_agents()
+    reset_audit_logs()
+    reset_sessions()
+    reset_usage_events()
+    reset_idempotency_keys()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    payload = {"message": "hello"}
+    fingerprint = request_fingerprint("POST", f"/agents/{agent_id}/chat", ChatRequest(**payload).model_dump())
+    now = datetime.utcnow()
+    with session_scope() as session:
+        session.add(
+            IdempotencyKey(
+                company_id="company-1",
+                key="turn-crashed",
+                request_hash=fingerprint,
+                status="in_progress",
+                created_at=now - timedelta(minutes=10),
+                expires_at=now + timedelta(hours=1),
+                locked_until=now - timedelta(seconds=1),
+            )
+        )
+
+    retry = client.post(f"/agents/{agent_id}/chat", json=payload, headers=_auth_headers("turn-crashed"))
+    assert retry.status_code == 200
+    replay = client.post(f"/agents/{agent_id}/chat", json=payload, headers=_auth_headers("turn-crashed"))
+    assert replay.json()["data"] == retry.json()["data"]
+
+
+def test_expired_keys_are_purged_in_the_background(monkeypatch):
+    reset_idempotency_keys()
+    set_env(monkeypatch, "SATURN_IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "0.01")
+    now = datetime.utcnow()
+    with session_scope() as session:
+        session.add(
+            IdempotencyKey(
+                company_id="company-1",
+                key="old",
+                request_hash="x",
+                status="completed",
+                expires_at=now - timedelta(seconds=1),
+            )
+        )
+    start_key_purger()
+    try:
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            with session_scope() as session:
+                if not session.query(IdempotencyKey).count():
+                    break
+            time.sleep(0.01)
+    finally:
+        stop_key_purger()
+    with session_scope() as session:
+        assert session.query(IdempotencyKey).count() == 0
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+import jwt
+from fastapi.testclient import TestClient
+
+from app.main import app
+from db.session import session_scope
+from models.core import Job
+from services.job_service import claim_jobs, complete_job, reset_jobs
+from services.job_worker import JobWorker, register_workflow, unregister_workflow
+from services.tool_service import reset_tools
+from tests.helpers import ensure_company
+
+
+def _auth_headers():
+    ensure_company("company-1")
+    token = jwt.encode(
+        {"company_id": "company-1", "user_id": "user-1", "role": "admin"},
+        "change-me",
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _create_workflow_tool(client, config):
+    payload = {
+        "name": "quotes.compute",
+        "type": "workflow",
+        "description": "Compute a quote",
+        "input_schema": {"type": "object", "properties": {"a": {"type": "integer"}}, "required": []},
+        "config": config,
+    }
+    response = client.post("/tools", json=payload, headers=_auth_headers())
+    return response.json()["data"]["tool_id"]
+
+
+def _enqueue(client, tool_id, tool_input):
+    response = client.post(f"/tools/{tool_id}/test", json={"input": tool_input}, headers=_auth_headers())
+    assert response.status_code == 200
+    result = response.json()["data"]["result"]
+    assert result["status"] == "queued"
+    return result["job_id"]
+
+
+def _make_runnable(job_id):
+    with session_scope() as session:
+        session.query(Job).filter(Job.id == job_id).update({"run_after": datetime.utcnow() - timedelta(seconds=1)})
+
+
+def test_workflow_job_runs_and_result_is_pollable():
+    reset_tools()
+    reset_jobs()
+    register_workflow("test.double", lambda job_input, config: {"value": job_input["a"] * 2})
+    client = TestClient(app)
+    tool_id = _create_workflow_tool(client, {"workflow": "test.double"})
+    job_id = _enqueue(client, tool_id, {"a": 21})
+
+    pending = client.get(f"/jobs/{job_id}", headers=_auth_headers())
+    assert pending.json()["data"]["status"] == "queued"
+
+    assert JobWorker(worker_id="worker-1").run_once() == 1
+    done = client.get(f"/jobs/{job_id}?wait=1", headers=_auth_headers())
+    assert done.json()["data"]["status"] == "succeeded"
+    assert done.json()["data"]["result"] == {"value": 42}
+    assert done.json()["data"]["attempts"] == 1
+    unregister_workflow("test.double")
+
+
+def test_failing_job_is_retried_then_dead_lettered():
+    reset_tools()
+    reset_jobs()
+
+    def _boom(job_input, config):
+        raise RuntimeError("downstream unavailable")
+
+    register_workflow("test.boom", _boom)
+    client = TestClient(app)
+    tool_id = _create_workflow_tool(client, {"workflow": "test.boom", "max_attempts": 2})
+    job_id = _enqueue(client, tool_id, {})
+    worker = JobWorker(worker_id="worker-1")
+
+    assert worker.run_once() == 1
+    retry = client.get(f"/jobs/{job_id}", headers=_auth_headers()).json()["data"]
+    assert retry["status"] == "queued"
+    assert retry["error_message"] == "downstream unavailable"
+    assert worker.run_once() == 0
+
+    _make_runnable(job_id)
+    assert worker.run_once() == 1
+    dead = client.get(f"/jobs/{job_id}", headers=_auth_headers()).json()["data"]
+    assert dead["status"] == "dead"
+    assert dead["attempts"] == 2
+    unregister_workflow("test.boom")
+
+
+def test_expired_lease_is_reclaimed_by_another_worker():
+    reset_tools()
+    reset_jobs()
+    client = TestClient(app)
+    tool_id = _create_workflow_tool(client, {"workflow": "test.noop"})
+    job_id = _enqueue(client, tool_id, {})
+
+    assert [job.id for job in claim_jobs("worker-a", 10)] == [job_id]
+    assert claim_jobs("worker-b", 10) == []
+    with session_scope() as session:
+        session.query(Job).filter(Job.id == job_id).update(
+            {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+        )
+    reclaimed = claim_jobs("worker-b", 10)
+    assert [job.id for job in reclaimed] == [job_id]
+    assert reclaimed[0].attempts == 2
+
+    assert complete_job(job_id, "worker-a", {"late": True}) is False
+    running = client.get(f"/jobs/{job_id}", headers=_auth_headers()).json()["data"]
+    assert running["status"] == "running"
+    assert complete_job(job_id, "worker-b", {"done": True}) is True
+    assert client.get(f"/jobs/{job_id}", headers=_auth_headers()).json()["data"]["status"] == "succeeded"
+
+
+def test_expired_lease_on_the_last_attempt_is_dead_lettered():
+    reset_tools()
+    reset_jobs()
+    client = TestClient(app)
+    tool_id = _create_workflow_tool(client, {"workflow": "test.noop"})
+    job_id = _enqueue(client, tool_id, {})
+    with session_scope() as session:
+        session.query(Job).filter(Job.id == job_id).update({"max_attempts": 1})
+
+    assert [job.id for job in claim_jobs("worker-a", 10)] == [job_id]
+    with session_scope() as session:
+        session.query(Job).filter(Job.id == job_id).update(
+            {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+        )
+    assert claim_jobs("worker-b", 10) == []
+    dead = client.get(f"/jobs/{job_id}", headers=_auth_headers()).json()["data"]
+    assert dead["status"] == "dead"
+    assert dead["attempts"] == 1
+
+
+def test_job_is_isolated_between_companies():
+    reset_tools()
+    reset_jobs()
+    client = TestClient(app)
+    tool_id = _create_workflow_tool(client, {"workflow": "test.noop"})
+    job_id = _enqueue(client, tool_id, {})
+    ensure_company("company-2")
+    other = jwt.encode({"company_id": "company-2", "user_id": "u", "role": "admin"}, "change-me", algorithm="HS256")
+    response = client.get(f"/jobs/{job_id}", headers={"Authorization": f"Bearer {other}"})
+    assert response.status_code == 404
@@ -2,7 +2,7 @@ import jwt
 from fastapi.testclient import TestClient
 
 from app.main import app
-from common.metrics import reset_metrics
+from common.metrics import reset_metrics, set_usage_buffer_depth, snapshot
 from services.agent_service import reset_agents
 from services.audit_service import reset_audit_logs
 from tests.helpers import ensure_company
@@ -37,3 +37,9 @@ def test_metrics_counts_requests_and_llm_calls():
     data = metrics.json()["data"]
     assert data["request_count"] >= 2
     assert "avg_latency_ms" in data
+
+
+def test_reset_clears_gauges():
+    set_usage_buffer_depth(7)
+    reset_metrics()
+    assert snapshot().usage_buffer_depth == 0
@@ -0,0 +1,113 @@
+import re
+from pathlib import Path
+
+import jwt
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+
+from app.main import app
+from common.rbac import permission_set
+from db.session import engine, get_async_engine
+from models.base import Base
+from services.api_key_service import create_api_key
+from services.auth_service import verify_api_key
+from services.idempotency_service import purge_expired_keys
+from services.job_service import claim_jobs, list_dead_jobs
+from services.role_service import create_role
+from tests.helpers import ensure_company, set_env
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# A plain "SCAN <table>" reads every row; "SCAN <table> USING INDEX ..." does not.
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+
+
+def _auth_headers():
+    ensure_company("company-1")
+    token = jwt.encode(
+        {"company_id": "company-1", "user_id": "user-1", "role": "admin"},
+        "change-me",
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _exercise_hot_paths():
+    client = TestClient(app)
+    headers = _auth_headers()
+    agent = client.post(
+        "/agents",
+        json={
+            "name": "Plan Agent",
+            "type": "chat",
+            "status": "active",
+            "model_config": {"provider": "openai", "model": "gpt-test"},
+            "behavior_config": {"system_prompt": "hi"},
+            "rag_config": {"enabled": True, "top_k": 1},
+        },
+        headers=headers,
+    )
+    agent_id = agent.json()["data"]["agent_id"]
+    client.get("/agents", headers=headers)
+    client.post(
+        f"/agents/{agent_id}/kb/upload", json={"filename": "notes.txt", "content": "hello world"}, headers=headers
+    )
+    client.get(f"/agents/{agent_id}/kb", headers=headers)
+    first = client.post(f"/agents/{agent_id}/chat", json={"message": "hello"}, headers=headers)
+    session_id = first.json()["data"]["session_id"]
+    client.post(f"/agents/{agent_id}/chat", json={"message": "again", "session_id": session_id}, headers=headers)
+    client.get("/usage/summary", headers=headers)
+    client.get("/audit-logs/export", headers=headers)
+
+    create_role("company-1", "auditor", ["audit:read"])
+    permission_set("company-1", "auditor")
+    token = create_api_key("company-1", "plans", ["agents:read"])
+    verify_api_key(token)
+    claim_jobs("worker-1", 5)
+    list_dead_jobs("company-1")
+    purge_expired_keys()
+
+
+def test_core_service_queries_use_indexes():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(" ", 1)[0] in ("SELECT", "UPDATE", "DELETE"):
+            statements.append((statement, parameters))
+
+    engines = (engine, get_async_engine().sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", capture)
+    try:
+        _exercise_hot_paths()
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", capture)
+
+    assert len(statements) > 20
+    full_scans = []
+    with engine.connect() as connection:
+        for statement, parameters in dict.fromkeys(statements):
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for row in plan:
+                match = _FULL_SCAN.match(row[-1])
+                if match:
+                    full_scans.append((match.group(1), statement))
+    assert full_scans == []
+
+
+def test_migrations_build_the_model_schema(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'saturn.db'}"
+    set_env(monkeypatch, "SATURN_DB_URL", url)
+    command.upgrade(Config(str(ROOT / "alembic.ini")), "head")
+
+    migrated = create_engine(url)
+    with migrated.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+        indexes = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    migrated.dispose()
+    assert {"ix_api_keys_key_hash", "ix_messages_company_session_created", "ix_kb_chunks_doc"} <= indexes
@@ -0,0 +1,90 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from db import session as db_session
+from db.session import engine, retry_on_locked, session_scope
+from models.core import Company
+from tests.helpers import ensure_company, set_env
+
+
+def _locked() -> OperationalError:
+    return OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+
+
+def test_file_database_uses_a_pool_and_wal_pragmas():
+    assert isinstance(engine.pool, QueuePool)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -64 * 1024
+
+
+def test_in_memory_database_keeps_a_single_shared_connection(monkeypatch):
+    set_env(monkeypatch, "SATURN_DB_URL", "sqlite+pysqlite:///:memory:")
+    memory_engine = db_session._create_engine()
+    try:
+        assert isinstance(memory_engine.pool, StaticPool)
+    finally:
+        memory_engine.dispose()
+
+
+def test_open_readers_do_not_block_writers():
+    ensure_company("company-1")
+    query = "SELECT name FROM companies WHERE id = 'company-1'"
+    reader = engine.raw_connection()
+    try:
+        cursor = reader.cursor()
+        # pysqlite does not open a transaction for reads; hold a read snapshot explicitly.
+        cursor.execute("BEGIN")
+        assert cursor.execute(query).fetchone()[0] == "Test Co"
+        start = time.perf_counter()
+        with session_scope() as session:
+            session.query(Company).filter(Company.id == "company-1").update({"name": "Renamed"})
+        assert time.perf_counter() - start < 1
+        assert cursor.execute(query).fetchone()[0] == "Test Co"
+        reader.rollback()
+        assert cursor.execute(query).fetchone()[0] == "Renamed"
+    finally:
+        reader.close()
+
+
+def test_locked_errors_are_retried_with_backoff(monkeypatch):
+    set_env(monkeypatch, "SATURN_SQLITE_LOCK_RETRY_DELAY_SECONDS", "0")
+    calls = []
+
+    @retry_on_locked
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _locked()
+        return "done"
+
+    assert flaky() == "done"
+    assert len(calls) == 3
+
+    @retry_on_locked
+    async def always_locked():
+        calls.append(1)
+        raise _locked()
+
+    set_env(monkeypatch, "SATURN_SQLITE_LOCK_RETRIES", "2")
+    calls.clear()
+    with pytest.raises(OperationalError):
+        asyncio.run(always_locked())
+    assert len(calls) == 3
+
+    @retry_on_locked
+    def broken():
+        calls.append(1)
+        raise OperationalError("SELECT", {}, sqlite3.OperationalError("no such table: nope"))
+
+    calls.clear()
+    with pytest.raises(OperationalError):
+        broken()
+    assert len(calls) == 1
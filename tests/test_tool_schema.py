@@ -0,0 +1,99 @@
+import pytest
+
+from common.errors import SaturnError
+from services.tool_schema import compile_schema, get_validator, reset_validator_cache
+
+ORDER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "customer": {
+            "type": "object",
+            "properties": {
+                "email": {"type": "string", "format": "email"},
+                "tier": {"enum": ["gold", "silver"]},
+            },
+            "required": ["email"],
+        },
+        "items": {
+            "type": "array",
+            "minItems": 1,
+            "items": {"$ref": "#/$defs/item"},
+        },
+    },
+    "required": ["customer", "items"],
+    "additionalProperties": False,
+    "$defs": {
+        "item": {
+            "type": "object",
+            "properties": {
+                "sku": {"type": "string", "pattern": "^[A-Z]{3}-\\d+$"},
+                "qty": {"type": "integer", "minimum": 1},
+            },
+            "required": ["sku", "qty"],
+        }
+    },
+}
+
+
+def _error(validator, payload):
+    with pytest.raises(SaturnError) as excinfo:
+        validator(payload)
+    assert excinfo.value.code == "TOOL_SCHEMA_INVALID"
+    return excinfo.value.details
+
+
+def test_nested_payload_passes():
+    validate = compile_schema(ORDER_SCHEMA)
+    validate(
+        {
+            "customer": {"email": "a@b.co", "tier": "gold"},
+            "items": [{"sku": "ABC-1", "qty": 2}, {"sku": "XYZ-22", "qty": 1}],
+        }
+    )
+
+
+def test_errors_report_precise_paths():
+    validate = compile_schema(ORDER_SCHEMA)
+    base = {"customer": {"email": "a@b.co"}, "items": [{"sku": "ABC-1", "qty": 1}]}
+
+    details = _error(validate, {**base, "items": [{"sku": "ABC-1", "qty": 1}, {"sku": "ABC-2", "qty": True}]})
+    assert details == {"path": "$.items[1].qty", "keyword": "type"}
+
+    details = _error(validate, {**base, "customer": {"email": "nope"}})
+    assert details == {"path": "$.customer.email", "keyword": "format"}
+
+    details = _error(validate, {**base, "customer": {"email": "a@b.co", "tier": "bronze"}})
+    assert details == {"path": "$.customer.tier", "keyword": "enum"}
+
+    details = _error(validate, {**base, "items": [{"sku": "bad", "qty": 1}]})
+    assert details == {"path": "$.items[0].sku", "keyword": "pattern"}
+
+    details = _error(validate, {**base, "items": []})
+    assert details == {"path": "$.items", "keyword": "minItems"}
+
+    details = _error(validate, {**base, "extra": 1})
+    assert details == {"path": "$.extra", "keyword": "additionalProperties"}
+
+    details = _error(validate, {"items": base["items"]})
+    assert details == {"path": "$.customer", "keyword": "required"}
+
+
+def test_combinators():
+    validate = compile_schema({"oneOf": [{"type": "string"}, {"type": "integer", "maximum": 5}]})
+    validate("x")
+    validate(3)
+    assert _error(validate, 9)["keyword"] == "oneOf"
+
+
+def test_invalid_schema_is_rejected():
+    with pytest.raises(SaturnError):
+        compile_schema({"type": "object", "properties": {"a": {"type": "decimal"}}})
+
+
+def test_validators_are_cached_per_key():
+    reset_validator_cache()
+    first = get_validator(("company-1", "tool-1", 1, "input"), ORDER_SCHEMA)
+    again = get_validator(("company-1", "tool-1", 1, "input"), ORDER_SCHEMA)
+    bumped = get_validator(("company-1", "tool-1", 2, "input"), ORDER_SCHEMA)
+    assert first is again
+    assert bumped is not first
@@ -1,11 +1,18 @@
+import threading
+import time
+
 import jwt
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from common.errors import SaturnError
+from common.metrics import reset_metrics
 from services.agent_service import reset_agents
 from services.audit_service import reset_audit_logs
-from services.tool_service import reset_tools
-from tests.helpers import ensure_company
+from services.tool_guard import breaker_state, guarded_call
+from services.tool_service import get_tool_manifest, reset_tools
+from tests.helpers import ensure_company, set_env
 
 
 def _auth_headers():
@@ -30,19 +37,20 @@ def _create_agent(client):
     return response.json()["data"]["agent_id"]
 
 
-def _create_tool(client, schema):
+def _create_tool(client, schema, config=None, output_schema=None):
     payload = {
         "name": "crm.create_lead",
         "type": "http",
         "description": "Create a lead",
         "input_schema": schema,
-        "config": {"method": "POST", "url": "https://example.test"},
+        "output_schema": output_schema,
+        "config": config or {"method": "POST", "url": "https://example.test"},
     }
     response = client.post("/tools", json=payload, headers=_auth_headers())
     return response.json()["data"]["tool_id"]
 
 
-def test_attach_and_test_tool():
+def test_attach_and_test_tool(http_stub):
     reset_agents()
     reset_audit_logs()
     reset_tools()
@@ -55,6 +63,7 @@ def test_attach_and_test_tool():
             "properties": {"name": {"type": "string"}},
             "required": ["name"],
         },
+        config={"method": "POST", "url": f"{http_stub.base_url}/leads"},
     )
     attach_resp = client.post(
         f"/agents/{agent_id}/tools/attach",
@@ -69,7 +78,9 @@ def test_attach_and_test_tool():
         headers=_auth_headers(),
     )
     assert test_resp.status_code == 200
-    assert test_resp.json()["data"]["result"]["status"] == "ok"
+    result = test_resp.json()["data"]["result"]
+    assert result["status"] == "ok"
+    assert result["body"]["json"] == {"name": "Alice"}
 
 
 def test_tool_schema_validation_error():
@@ -91,3 +102,290 @@ def test_tool_schema_validation_error():
         headers=_auth_headers(),
     )
     assert test_resp.status_code == 400
+
+
+def test_http_tool_renders_url_headers_and_query(http_stub):
+    reset_tools()
+    client = TestClient(app)
+    tool_id = _create_tool(
+        client,
+        {"type": "object", "properties": {"sku": {"type": "string"}}, "required": ["sku"]},
+        config={
+            "method": "GET",
+            "url": f"{http_stub.base_url}/stock/{{sku}}",
+            "headers": {"X-Sku": "{sku}"},
+            "query": {"warehouse": "main"},
+        },
+    )
+    test_resp = client.post(
+        f"/tools/{tool_id}/test",
+        json={"input": {"sku": "a b"}},
+        headers=_auth_headers(),
+    )
+    assert test_resp.status_code == 200
+    body = test_resp.json()["data"]["result"]["body"]
+    assert body["method"] == "GET"
+    assert body["path"] == "/stock/a%20b"
+    assert body["headers"]["x-sku"] == "a b"
+    assert body["query"] == {"warehouse": "main"}
+
+
+def test_http_tool_upstream_error_and_size_cap(http_stub):
+    reset_tools()
+    client = TestClient(app)
+    schema = {"type": "object", "properties": {}, "required": []}
+    failing = _create_tool(client, schema, config={"url": f"{http_stub.base_url}/status/503"})
+    resp = client.post(f"/tools/{failing}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 500
+    assert resp.json()["error"]["code"] == "TOOL_EXECUTION_FAILED"
+    assert resp.json()["error"]["details"]["status_code"] == 503
+
+    large = _create_tool(
+        client,
+        schema,
+        config={"method": "GET", "url": f"{http_stub.base_url}/large?bytes=200000", "max_response_bytes": 1024},
+    )
+    resp = client.post(f"/tools/{large}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 500
+    assert resp.json()["error"]["details"]["max_response_bytes"] == 1024
+
+
+def test_http_tool_timeout_and_output_schema(http_stub):
+    reset_tools()
+    client = TestClient(app)
+    schema = {"type": "object", "properties": {}, "required": []}
+    slow = _create_tool(
+        client,
+        schema,
+        config={"method": "GET", "url": f"{http_stub.base_url}/slow?seconds=1", "timeout_seconds": 0.1},
+    )
+    resp = client.post(f"/tools/{slow}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 500
+    assert resp.json()["error"]["message"] == "HTTP tool timed out"
+
+    mismatched = _create_tool(
+        client,
+        schema,
+        config={"url": f"{http_stub.base_url}/echo"},
+        output_schema={"type": "object", "properties": {}, "required": ["lead_id"]},
+    )
+    resp = client.post(f"/tools/{mismatched}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 500
+    assert resp.json()["error"]["message"] == "Tool output does not match output schema"
+
+
+def test_cacheable_tool_serves_repeat_calls_from_cache(http_stub):
+    reset_tools()
+    reset_metrics()
+    client = TestClient(app)
+    tool_id = _create_tool(
+        client,
+        {"type": "object", "properties": {"sku": {"type": "string"}}, "required": ["sku"]},
+        config={
+            "method": "GET",
+            "url": f"{http_stub.base_url}/stock",
+            "cache": {"ttl_seconds": 60, "key_fields": ["sku"]},
+        },
+    )
+    first = client.post(
+        f"/tools/{tool_id}/test", json={"input": {"sku": "A1", "note": "x"}}, headers=_auth_headers()
+    )
+    second = client.post(
+        f"/tools/{tool_id}/test", json={"input": {"sku": "A1", "note": "y"}}, headers=_auth_headers()
+    )
+    other = client.post(f"/tools/{tool_id}/test", json={"input": {"sku": "B2"}}, headers=_auth_headers())
+    assert first.json()["data"]["result"] == second.json()["data"]["result"]
+    assert other.json()["data"]["result"]["body"]["query"]["sku"] == "B2"
+    data = client.get("/metrics").json()["data"]
+    assert data["tool_cache_hits"] == 1
+    assert data["tool_cache_misses"] == 2
+
+
+def test_circuit_breaker_opens_on_upstream_errors_and_recovers(http_stub, monkeypatch):
+    reset_tools()
+    reset_metrics()
+    client = TestClient(app)
+    breaker = {"min_calls": 2, "error_rate_threshold": 0.5, "open_seconds": 0.2}
+    tool_id = _create_tool(
+        client,
+        {"type": "object", "properties": {}, "required": []},
+        config={"method": "GET", "url": f"{http_stub.base_url}/status/503", "circuit_breaker": breaker},
+    )
+    for _ in range(2):
+        resp = client.post(f"/tools/{tool_id}/test", json={"input": {}}, headers=_auth_headers())
+        assert resp.json()["error"]["details"]["status_code"] == 503
+    resp = client.post(f"/tools/{tool_id}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 500
+    assert resp.json()["error"]["message"] == "Tool circuit is open"
+    data = client.get("/metrics").json()["data"]
+    assert data["tool_breakers"] == {"closed": 0, "open": 1, "half_open": 0}
+    assert data["tool_latency_ms"]["count"] == 2
+    assert tool_id not in str(data)
+    assert client.get("/admin/metrics/tools", headers=_auth_headers()).status_code == 403
+    set_env(monkeypatch, "SATURN_PLATFORM_COMPANY_ID", "company-1")
+    data = client.get("/admin/metrics/tools", headers=_auth_headers()).json()["data"]
+    assert data["tool_breakers"][tool_id] == {"company_id": "company-1", "state": "open"}
+    assert data["tool_latency_ms"][tool_id]["count"] == 2
+
+    time.sleep(0.25)
+    assert breaker_state("company-1", tool_id) == "half_open"
+    assert guarded_call("company-1", tool_id, {"circuit_breaker": breaker}, lambda: {"status": "ok"})
+    assert breaker_state("company-1", tool_id) == "closed"
+
+
+def test_bulkhead_rejects_calls_beyond_max_concurrency():
+    reset_tools()
+    config = {"circuit_breaker": {"max_concurrency": 1}}
+    entered = threading.Event()
+    release = threading.Event()
+
+    def _slow_call():
+        entered.set()
+        release.wait(5)
+        return {"status": "ok"}
+
+    worker = threading.Thread(target=guarded_call, args=("company-1", "tool-1", config, _slow_call))
+    worker.start()
+    entered.wait(5)
+    with pytest.raises(SaturnError) as exc:
+        guarded_call("company-1", "tool-1", config, lambda: {"status": "ok"})
+    assert exc.value.message == "Tool concurrency limit reached"
+    release.set()
+    worker.join(5)
+    assert guarded_call("company-1", "tool-1", config, lambda: {"status": "ok"}) == {"status": "ok"}
+
+
+def test_policy_change_keeps_bulkhead_slots_and_breaker_state():
+    reset_tools()
+    entered = threading.Event()
+    release = threading.Event()
+
+    def _slow_call():
+        entered.set()
+        release.wait(5)
+        return {"status": "ok"}
+
+    config = {"circuit_breaker": {"max_concurrency": 2, "min_calls": 1, "open_seconds": 60}}
+    with pytest.raises(ZeroDivisionError):
+        guarded_call("company-1", "tool-1", config, lambda: 1 / 0)
+    assert breaker_state("company-1", "tool-1") == "open"
+
+    config = {"circuit_breaker": {"max_concurrency": 2, "min_calls": 1, "open_seconds": 0}}
+    worker = threading.Thread(target=guarded_call, args=("company-1", "tool-1", config, _slow_call))
+    worker.start()
+    entered.wait(5)
+    # Lowering the limit while a call holds a slot must count that call.
+    config = {"circuit_breaker": {"max_concurrency": 1, "min_calls": 1, "open_seconds": 0}}
+    with pytest.raises(SaturnError) as exc:
+        guarded_call("company-1", "tool-1", config, lambda: {"status": "ok"})
+    assert exc.value.message == "Tool concurrency limit reached"
+    release.set()
+    worker.join(5)
+    assert guarded_call("company-1", "tool-1", config, lambda: {"status": "ok"}) == {"status": "ok"}
+
+
+def test_batch_attach_and_tool_manifest_invalidation():
+    reset_agents()
+    reset_tools()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    schema = {"type": "object", "properties": {"name": {"type": "string"}}, "required": ["name"]}
+    first = _create_tool(client, schema)
+    payload = {
+        "name": "crm.lookup",
+        "type": "builtin",
+        "description": "Look up a lead",
+        "input_schema": schema,
+        "config": {},
+    }
+    second = client.post("/tools", json=payload, headers=_auth_headers()).json()["data"]["tool_id"]
+
+    resp = client.post(
+        f"/agents/{agent_id}/tools/batch",
+        json={"attach": [{"tool_id": first}, {"tool_id": second, "policy": {"max_calls": 2}}]},
+        headers=_auth_headers(),
+    )
+    assert resp.status_code == 200
+    assert resp.json()["data"]["tool_ids"] == sorted([first, second])
+
+    manifest = get_tool_manifest("company-1", agent_id, 1)
+    assert [spec["function"]["name"] for spec in manifest.functions] == ["crm_create_lead", "crm_lookup"]
+    assert manifest.entry("crm_lookup").policy == {"max_calls": 2}
+    with pytest.raises(SaturnError):
+        manifest.entry("crm_create_lead").validate({})
+    assert get_tool_manifest("company-1", agent_id, 1) is manifest
+
+    resp = client.patch(f"/tools/{second}", json={"description": "Find a lead"}, headers=_auth_headers())
+    assert resp.json()["data"]["version"] == 2
+    updated = get_tool_manifest("company-1", agent_id, 1)
+    assert updated is not manifest
+    assert updated.entry("crm_lookup").spec["function"]["description"] == "Find a lead"
+
+    resp = client.post(
+        f"/agents/{agent_id}/tools/batch",
+        json={"attach": [{"tool_id": "missing"}], "detach": [first]},
+        headers=_auth_headers(),
+    )
+    assert resp.status_code == 403
+    assert get_tool_manifest("company-1", agent_id, 1) is updated
+
+    client.post(f"/agents/{agent_id}/tools/detach", json={"tool_id": first}, headers=_auth_headers())
+    assert get_tool_manifest("company-1", agent_id, 1).tool_ids() == [second]
+
+
+def test_reenabled_tool_rejoins_cached_manifest_and_name_collisions_are_rejected():
+    reset_agents()
+    reset_tools()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    schema = {"type": "object", "properties": {}, "required": []}
+    tool_id = _create_tool(client, schema)
+    client.post(f"/agents/{agent_id}/tools/attach", json={"tool_id": tool_id}, headers=_auth_headers())
+
+    client.patch(f"/tools/{tool_id}", json={"status": "disabled"}, headers=_auth_headers())
+    assert get_tool_manifest("company-1", agent_id, 1).tool_ids() == []
+    client.patch(f"/tools/{tool_id}", json={"status": "active"}, headers=_auth_headers())
+    assert get_tool_manifest("company-1", agent_id, 1).tool_ids() == [tool_id]
+
+    payload = {
+        "name": "crm_create_lead",
+        "type": "builtin",
+        "description": "Same function name as crm.create_lead",
+        "input_schema": schema,
+        "config": {},
+    }
+    clash = client.post("/tools", json=payload, headers=_auth_headers()).json()["data"]["tool_id"]
+    resp = client.post(f"/agents/{agent_id}/tools/attach", json={"tool_id": clash}, headers=_auth_headers())
+    assert resp.status_code == 400
+    assert resp.json()["error"]["details"]["function_name"] == "crm_create_lead"
+    resp = client.post(
+        f"/agents/{agent_id}/tools/batch", json={"attach": [{"tool_id": clash}]}, headers=_auth_headers()
+    )
+    assert resp.status_code == 400
+    assert get_tool_manifest("company-1", agent_id, 1).tool_ids() == [tool_id]
+
+
+def test_http_tool_refuses_internal_destinations(http_stub, monkeypatch):
+    reset_tools()
+    set_env(monkeypatch, "SATURN_HTTP_TOOL_ALLOWED_HOSTS", "")
+    client = TestClient(app)
+    schema = {"type": "object", "properties": {}, "required": []}
+    for url in (
+        f"{http_stub.base_url}/echo",
+        "http://localhost/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.5/",
+        "http://[::ffff:127.0.0.1]/",
+    ):
+        tool_id = _create_tool(client, schema, config={"method": "GET", "url": url})
+        resp = client.post(f"/tools/{tool_id}/test", json={"input": {}}, headers=_auth_headers())
+        assert resp.status_code == 500, url
+        assert resp.json()["error"]["message"] == "HTTP tool host is not allowed", url
+    tool_id = _create_tool(client, schema, config={"method": "GET", "url": "file:///etc/passwd"})
+    resp = client.post(f"/tools/{tool_id}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.json()["error"]["message"] == "HTTP tool url must be an absolute http(s) url"
+
+    set_env(monkeypatch, "SATURN_HTTP_TOOL_ALLOWED_HOSTS", "127.0.0.0/8")
+    tool_id = _create_tool(client, schema, config={"method": "GET", "url": f"{http_stub.base_url}/echo"})
+    resp = client.post(f"/tools/{tool_id}/test", json={"input": {}}, headers=_auth_headers())
+    assert resp.status_code == 200
@@ -1,13 +1,47 @@
+import gzip
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+
 import jwt
+from alembic import command
+from alembic.config import Config
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
 
 from app.main import app
+from common.metrics import reset_metrics
+from db.session import session_scope
+from models.core import ApiKey, UsageRollupDaily, UsageRollupHourly
+from services import usage_partitions, usage_service
 from services.agent_service import reset_agents
 from services.audit_service import reset_audit_logs
 from services.kb_service import reset_kb
 from services.session_service import reset_sessions
-from services.usage_service import list_usage_events, reset_usage_events
-from tests.helpers import ensure_company
+from services.usage_buffer import UsageBuffer
+from services.usage_partitions import (
+    aggregate_archived_month,
+    archive_expired,
+    archived_months,
+    hot_months,
+    restore_archived_rollups,
+)
+from services.usage_rollups import rebuild_rollups
+from services.usage_service import (
+    flush_usage_buffer,
+    insert_usage_rows,
+    list_usage_events,
+    record_usage_event,
+    reset_usage_events,
+    start_usage_buffer,
+    stop_usage_buffer,
+    summarize_usage,
+)
+from tests.helpers import ensure_company, set_env
 
 
 def _auth_headers():
@@ -57,3 +91,285 @@ def test_usage_events_created_for_chat():
     assert "llm_tokens_in" in event_types
     assert "llm_tokens_out" in event_types
     assert "kb_query" in event_types
+
+
+def test_buffered_usage_is_bulk_flushed_and_survives_db_outage(tmp_path, monkeypatch):
+    reset_agents()
+    reset_usage_events()
+    reset_metrics()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    set_env(monkeypatch, "SATURN_USAGE_SPILL_PATH", str(tmp_path / "spill.ndjson"))
+    set_env(monkeypatch, "SATURN_USAGE_BUFFER_FLUSH_INTERVAL_SECONDS", "60")
+    start_usage_buffer()
+    try:
+        for _ in range(3):
+            record_usage_event("company-1", agent_id, None, "tool_call", 1, "calls")
+        assert list_usage_events("company-1") == []
+
+        def _unavailable(rows):
+            raise OperationalError("INSERT", {}, Exception("database is down"))
+
+        monkeypatch.setattr(usage_service._buffer, "_sink", _unavailable)
+        assert flush_usage_buffer() == 0
+        assert (tmp_path / "spill.ndjson").read_text().count("\n") == 3
+
+        monkeypatch.undo()
+        record_usage_event("company-1", agent_id, None, "kb_query", 1, "calls")
+    finally:
+        stop_usage_buffer()
+    assert len(list_usage_events("company-1")) == 4
+    assert not (tmp_path / "spill.ndjson").exists()
+    data = client.get("/metrics").json()["data"]
+    assert data["usage_events_spilled"] == 3
+    assert data["usage_events_flushed"] == 4
+    assert data["usage_buffer_depth"] == 0
+
+
+def _usage_row(agent_id, event_type, quantity, unit, created_at):
+    return {
+        "id": str(uuid.uuid4()),
+        "company_id": "company-1",
+        "agent_id": agent_id,
+        "session_id": None,
+        "event_type": event_type,
+        "quantity": quantity,
+        "unit": unit,
+        "created_at": created_at,
+    }
+
+
+def test_usage_rollups_are_upserted_on_ingest_and_rebuildable():
+    reset_agents()
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    insert_usage_rows(
+        [
+            _usage_row(agent_id, "llm_tokens_in", 10, "tokens", datetime(2025, 12, 1, 9, 5)),
+            _usage_row(agent_id, "llm_tokens_in", 5, "tokens", datetime(2025, 12, 1, 9, 40)),
+        ]
+    )
+    insert_usage_rows([_usage_row(agent_id, "llm_tokens_in", 7, "tokens", datetime(2025, 12, 1, 17, 0))])
+    insert_usage_rows([_usage_row(agent_id, "tool_call", 1, "calls", datetime(2025, 12, 2, 8, 0))])
+
+    with session_scope() as session:
+        hourly = {
+            (row.event_type, row.bucket_start.hour): (row.quantity, row.event_count)
+            for row in session.query(UsageRollupHourly).all()
+        }
+        daily = {
+            (row.event_type, row.bucket_start.day): row.quantity for row in session.query(UsageRollupDaily).all()
+        }
+        session.query(UsageRollupDaily).update({"quantity": 0})
+    assert hourly[("llm_tokens_in", 9)] == (15, 2)
+    assert hourly[("llm_tokens_in", 17)] == (7, 1)
+    assert daily == {("llm_tokens_in", 1): 22, ("tool_call", 2): 1}
+
+    assert summarize_usage("company-1")["tokens_in"] == 0
+    assert rebuild_rollups(datetime(2025, 12, 1, 12), datetime(2025, 12, 2, 1), "company-1") == 4
+    summary = summarize_usage("company-1")
+    assert summary["tokens_in"] == 22
+    assert summary["tool_calls"] == 1
+
+
+def test_poisoned_spill_is_quarantined_without_blocking_live_usage(tmp_path):
+    spill = tmp_path / "spill.ndjson"
+    good = {"id": "good", "created_at": "2025-12-01T10:00:00"}
+    poison = {"id": "poison", "created_at": "2025-12-01T10:00:00"}
+    spill.write_text(json.dumps(good) + "\n" + '{"id": "torn", "crea\n' + json.dumps(poison) + "\n")
+    written = []
+
+    def sink(rows):
+        if any(row["id"] == "poison" for row in rows):
+            raise OperationalError("INSERT", {}, Exception("FOREIGN KEY constraint failed"))
+        written.extend(row["id"] for row in rows)
+
+    buffer = UsageBuffer(sink, str(spill), batch_size=1, max_replay_attempts=2)
+    buffer.add({"id": "live-1", "created_at": datetime(2025, 12, 1)})
+    assert buffer.flush() == 1
+    assert written == ["good", "live-1"]
+    assert spill.with_name("spill.ndjson.replay").read_text().count("\n") == 1
+
+    buffer.add({"id": "live-2", "created_at": datetime(2025, 12, 1)})
+    assert buffer.flush() == 1
+    assert written == ["good", "live-1", "live-2"]
+    assert not spill.with_name("spill.ndjson.replay").exists()
+    quarantined = spill.with_name("spill.ndjson.bad").read_text().splitlines()
+    assert [line[:12] for line in quarantined] == ['{"id": "torn', '{"id": "pois']
+
+
+def test_expired_months_are_archived_out_of_the_hot_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(usage_partitions, "_ARCHIVE_PAGE", 2)
+    reset_agents()
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    insert_usage_rows(
+        [
+            _usage_row(agent_id, "llm_tokens_in", 10, "tokens", datetime(2025, 1, 3, 9)),
+            _usage_row(agent_id, "llm_tokens_in", 5, "tokens", datetime(2025, 1, 31, 23, 59)),
+            _usage_row(agent_id, "tool_call", 2, "calls", datetime(2025, 1, 15)),
+            _usage_row(agent_id, "llm_tokens_in", 7, "tokens", datetime(2026, 1, 2)),
+        ]
+    )
+    archive_dir = str(tmp_path)
+    assert hot_months()[0] == "2025-01"
+    archived = archive_expired(retention_months=6, archive_dir=archive_dir, now=datetime(2026, 1, 20))
+    assert archived == {"2025-01": 3}
+    assert (tmp_path / "usage-2025-01.ndjson.gz").exists()
+    assert hot_months() == ["2026-01"]
+    assert archived_months(archive_dir) == ["2025-01"]
+    assert aggregate_archived_month("2025-01", "company-1", archive_dir) == [
+        ("company-1", "llm_tokens_in", "tokens", 15.0),
+        ("company-1", "tool_call", "calls", 2.0),
+    ]
+    assert summarize_usage("company-1", "2025-01")["tokens_in"] == 15
+
+    with session_scope() as session:
+        session.query(UsageRollupDaily).update({"quantity": 0})
+    assert restore_archived_rollups("2025-01", archive_dir=archive_dir) == 3
+    assert summarize_usage("company-1", "2025-01")["tokens_in"] == 15
+
+
+def test_archive_keeps_events_that_arrive_during_the_export(tmp_path, monkeypatch):
+    reset_agents()
+    reset_usage_events()
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    insert_usage_rows(
+        [
+            _usage_row(agent_id, "llm_tokens_in", 10, "tokens", datetime(2025, 1, 3, 9)),
+            _usage_row(agent_id, "llm_tokens_in", 1, "tokens", datetime(2025, 1, 25)),
+        ]
+    )
+    # Lands inside the exported (created_at, id) range, so that page falls back to ids.
+    late = _usage_row(agent_id, "llm_tokens_in", 4, "tokens", datetime(2025, 1, 20))
+    replace = usage_partitions.os.replace
+
+    def insert_late_then_replace(source, target):
+        insert_usage_rows([late])
+        replace(source, target)
+
+    monkeypatch.setattr(usage_partitions.os, "replace", insert_late_then_replace)
+    assert usage_partitions.archive_month("2025-01", str(tmp_path)) == 2
+    monkeypatch.undo()
+    assert [event.id for event in list_usage_events("company-1")] == [late["id"]]
+
+    assert usage_partitions.archive_month("2025-01", str(tmp_path)) == 1
+    assert aggregate_archived_month("2025-01", "company-1", str(tmp_path)) == [
+        ("company-1", "llm_tokens_in", "tokens", 15.0)
+    ]
+
+
+def test_usage_and_audit_exports_stream_keyset_pages(monkeypatch):
+    reset_agents()
+    reset_usage_events()
+    set_env(monkeypatch, "SATURN_EXPORT_BATCH_SIZE", "2")
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    other_agent_id = _create_agent(client)
+    same_time = datetime(2025, 12, 1, 9)
+    insert_usage_rows(
+        [_usage_row(agent_id, "llm_tokens_in", quantity, "tokens", same_time) for quantity in range(1, 4)]
+        + [
+            _usage_row(agent_id, "tool_call", 1, "calls", datetime(2025, 12, 2)),
+            _usage_row(other_agent_id, "tool_call", 1, "calls", datetime(2025, 12, 2)),
+            _usage_row(agent_id, "tool_call", 1, "calls", datetime(2026, 1, 1)),
+        ]
+    )
+
+    response = client.get(
+        f"/usage/export?start=2025-12-01&end=2026-01-01&agent_id={agent_id}", headers=_auth_headers()
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    rows = [json.loads(line) for line in gzip.decompress(response.content).splitlines()]
+    assert len({row["id"] for row in rows}) == 4
+    assert [(row["created_at"], row["id"]) for row in rows] == sorted((row["created_at"], row["id"]) for row in rows)
+    assert sorted(row["quantity"] for row in rows) == [1, 1, 2, 3]
+
+    csv_export = client.get("/usage/export?format=csv&gzip=false", headers=_auth_headers())
+    lines = csv_export.text.splitlines()
+    assert lines[0].startswith("id,company_id,agent_id")
+    assert len(lines) == 7
+
+    audit = client.get(f"/audit-logs/export?gzip=false&agent_id={agent_id}", headers=_auth_headers())
+    actions = [json.loads(line)["action"] for line in audit.text.splitlines()]
+    assert actions == ["agent_created"]
+    assert client.get("/usage/export?format=xml", headers=_auth_headers()).status_code == 400
+
+
+def test_bulk_ingestion_is_idempotent_and_reports_per_batch(monkeypatch):
+    reset_agents()
+    reset_usage_events()
+    set_env(monkeypatch, "SATURN_USAGE_INGEST_BATCH_SIZE", "3")
+    client = TestClient(app)
+    agent_id = _create_agent(client)
+    token = "sk_voice_gateway"
+    with session_scope() as session:
+        session.add(
+            ApiKey(
+                id=str(uuid.uuid4()),
+                company_id="company-1",
+                name="voice",
+                key_hash=hashlib.sha256(token.encode("utf-8")).hexdigest(),
+                scopes=["usage:write"],
+                status="active",
+            )
+        )
+    events = [
+        {"id": "call-1", "agent_id": agent_id, "event_type": "audio_seconds", "quantity": 42.5, "unit": "seconds"},
+        {"id": "call-2", "agent_id": agent_id, "event_type": "audio_seconds", "quantity": 10, "unit": "seconds"},
+        {"id": "call-1", "agent_id": agent_id, "event_type": "audio_seconds", "quantity": 42.5, "unit": "seconds"},
+        {"id": "msg-1", "agent_id": agent_id, "event_type": "tool_call", "quantity": -1, "unit": "calls"},
+        {"id": "msg-2", "agent_id": "missing", "event_type": "tool_call", "quantity": 1, "unit": "calls"},
+    ]
+    body = "\n".join(json.dumps(event) for event in events) + "\nnot json\n"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"}
+
+    response = client.post("/usage/events/bulk", content=body, headers=headers)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert (data["accepted"], data["duplicates"], data["rejected"]) == (2, 1, 3)
+    assert [batch["accepted"] for batch in data["batches"]] == [2, 0]
+    assert [item["line"] for item in data["batches"][1]["rejected"]] == [4, 5, 6]
+
+    retry = client.post("/usage/events/bulk", content=body, headers=headers).json()["data"]
+    assert (retry["accepted"], retry["duplicates"]) == (0, 3)
+    assert summarize_usage("company-1")["audio_seconds"] == 52
+    assert len(list_usage_events("company-1")) == 2
+
+    viewer = jwt.encode({"company_id": "company-1", "user_id": "user-2", "role": "viewer"}, "change-me")
+    forbidden = client.post("/usage/events/bulk", content=body, headers={"Authorization": f"Bearer {viewer}"})
+    assert forbidden.status_code == 403
+
+
+def test_rollup_migration_backfills_existing_events(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'saturn.db'}"
+    set_env(monkeypatch, "SATURN_DB_URL", url)
+    config = Config(str(Path(__file__).resolve().parents[1] / "alembic.ini"))
+    command.upgrade(config, "0004")
+    migrated = create_engine(url)
+    with migrated.begin() as connection:
+        connection.execute(text("INSERT INTO companies (id, name, status) VALUES ('company-1', 'Test Co', 'active')"))
+        for index, created_at in enumerate(["2025-12-01 10:15:00", "2025-12-01 10:45:00", "2025-12-01 23:00:00"]):
+            connection.execute(
+                text(
+                    "INSERT INTO usage_events (id, company_id, agent_id, event_type, quantity, unit, created_at)"
+                    " VALUES (:id, 'company-1', 'agent-1', 'llm_tokens_in', 10, 'tokens', :created_at)"
+                ),
+                {"id": f"event-{index}", "created_at": created_at},
+            )
+    command.upgrade(config, "head")
+
+    with Session(migrated) as session:
+        hourly = session.query(UsageRollupHourly).order_by(UsageRollupHourly.bucket_start).all()
+        # Range filters must match backfilled buckets exactly like ones written by the app.
+        daily = session.query(UsageRollupDaily).filter(UsageRollupDaily.bucket_start >= datetime(2025, 12, 1)).all()
+    migrated.dispose()
+    assert [(row.bucket_start, row.quantity, row.event_count) for row in hourly] == [
+        (datetime(2025, 12, 1, 10), 20.0, 2),
+        (datetime(2025, 12, 1, 23), 10.0, 1),
+    ]
+    assert [(row.bucket_start, row.event_count) for row in daily] == [(datetime(2025, 12, 1), 3)]